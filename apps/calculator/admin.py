@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CalculationHistory
+from .models import CalculationHistory, CalculationJob
 
 @admin.register(CalculationHistory)
 class CalculationHistoryAdmin(admin.ModelAdmin):
@@ -11,4 +11,13 @@ class CalculationHistoryAdmin(admin.ModelAdmin):
         return False
 
     def has_change_permission(self, request, obj=None):
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(CalculationJob)
+class CalculationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'user', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = [field.name for field in CalculationJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -1,12 +1,49 @@
 from django import forms
+from django.conf import settings
 
-DISTRIBUTION_CHOICES = [
-    ('norm', 'Normal'),
-    ('uniform', 'Uniform'),
-    ('expon', 'Exponential'),
+from .services.distributions import DISTRIBUTIONS, distribution_choices, get_family
+
+# Список семейств и смысл параметров берутся из реестра распределений
+DISTRIBUTION_CHOICES = distribution_choices()
+
+
+def _param_help(position: int) -> str:
+    return '; '.join(f"{family.label}: {family.params[position].label}" for family in DISTRIBUTIONS.values())
+
+TEST_MODE_CHOICES = [
+    ('lr', 'Отношение правдоподобия: f₁(x)/f₀(x) > k'),
+    ('x', 'Порог по наблюдению: x > C'),
 ]
 
-class CalculatorForm(forms.Form):
+class HypothesesForm(forms.Form):
+    """Пара гипотез H0/H1 без уровня значимости (например, для ROC-кривой)."""
+
+    # H0 Hypothesis
+    h0_dist = forms.ChoiceField(choices=DISTRIBUTION_CHOICES, label="H₀ Распределение")
+    h0_param1 = forms.FloatField(label="H₀ Параметр 1", initial=0, help_text=_param_help(0))
+    h0_param2 = forms.FloatField(label="H₀ Параметр 2", initial=1, help_text=_param_help(1))
+
+    # H1 Hypothesis
+    h1_dist = forms.ChoiceField(choices=DISTRIBUTION_CHOICES, label="H₁ Распределение")
+    h1_param1 = forms.FloatField(label="H₁ Параметр 1", initial=1, help_text=_param_help(0))
+    h1_param2 = forms.FloatField(label="H₁ Параметр 2", initial=1, help_text=_param_help(1))
+
+    def clean(self):
+        cleaned = super().clean()
+        # Допустимость параметров определяет семейство распределения (см. services/distributions.py)
+        for prefix in ('h0', 'h1'):
+            dist_name = cleaned.get(f'{prefix}_dist')
+            param1, param2 = cleaned.get(f'{prefix}_param1'), cleaned.get(f'{prefix}_param2')
+            if dist_name is None or param1 is None or param2 is None:
+                continue
+            for position, _, message in get_family(dist_name).validate(param1, param2):
+                self.add_error(f'{prefix}_param{position + 1}', message)
+        return cleaned
+
+
+class CalculatorForm(HypothesesForm):
+    field_order = ['alpha']
+
     alpha = forms.FloatField(
         label="Уровень значимости (α)", 
         min_value=0.0, 
@@ -14,27 +51,48 @@ class CalculatorForm(forms.Form):
         initial=0.05,
         widget=forms.NumberInput(attrs={'step': '0.01'})
     )
-    
-    # H0 Hypothesis
-    h0_dist = forms.ChoiceField(choices=DISTRIBUTION_CHOICES, label="H₀ Распределение")
-    h0_param1 = forms.FloatField(label="H₀ Параметр 1 (loc/μ)", initial=0)
-    h0_param2 = forms.FloatField(
-        label="H₀ Параметр 2 (scale/σ)", initial=1, min_value=0.0000001,
-        error_messages={'min_value': 'Параметр scale/σ должен быть > 0'}
+    # Без поля в запросе (старые клиенты, API) остаётся прежний критерий по X
+    test_mode = forms.ChoiceField(choices=TEST_MODE_CHOICES, label="Критерий", initial='lr', required=False)
+
+    def clean_test_mode(self):
+        return self.cleaned_data.get('test_mode') or 'x'
+
+
+class MonteCarloForm(CalculatorForm):
+    """Параметры эмпирической проверки порога методом Монте-Карло."""
+
+    n_samples = forms.IntegerField(
+        label="Размер выборки", initial=1_000_000, min_value=1000,
+        widget=forms.NumberInput(attrs={'step': '1000'})
     )
+    seed = forms.IntegerField(label="Seed (необязательно)", required=False, min_value=0)
 
-    # H1 Hypothesis
-    h1_dist = forms.ChoiceField(choices=DISTRIBUTION_CHOICES, label="H₁ Распределение")
-    h1_param1 = forms.FloatField(label="H₁ Параметр 1 (loc/μ)", initial=1)
-    h1_param2 = forms.FloatField(
-        label="H₁ Параметр 2 (scale/σ)", initial=1, min_value=0.0000001,
-        error_messages={'min_value': 'Параметр scale/σ должен быть > 0'}
+    def clean_n_samples(self):
+        n_samples = self.cleaned_data['n_samples']
+        max_samples = settings.CALCULATOR_MONTE_CARLO['MAX_SAMPLES']
+        if n_samples > max_samples:
+            raise forms.ValidationError(f'Не больше {max_samples} наблюдений')
+        return n_samples
+
+
+class SampleSizeForm(HypothesesForm):
+    """Планирование объёма выборки: alpha и целевая мощность для пары гипотез одного семейства."""
+    field_order = ['alpha', 'target_power']
+
+    alpha = forms.FloatField(
+        label="Уровень значимости (α)", min_value=0.0000001, max_value=0.9999999, initial=0.05,
+        widget=forms.NumberInput(attrs={'step': '0.01'})
+    )
+    target_power = forms.FloatField(
+        label="Целевая мощность (1-β)", min_value=0.0000001, max_value=0.9999999, initial=0.8,
+        widget=forms.NumberInput(attrs={'step': '0.01'})
     )
 
     def clean(self):
         cleaned = super().clean()
-        for scale_field in ('h0_param2', 'h1_param2'):
-            val = cleaned.get(scale_field)
-            if val is not None and val <= 0:
-                self.add_error(scale_field, 'Параметр scale/σ должен быть > 0')
-        return cleaned
\ No newline at end of file
+        if cleaned.get('h0_dist') and cleaned.get('h1_dist') and cleaned['h0_dist'] != cleaned['h1_dist']:
+            self.add_error('h1_dist', 'H₀ и H₁ должны быть из одного семейства')
+        alpha, target = cleaned.get('alpha'), cleaned.get('target_power')
+        if alpha is not None and target is not None and target <= alpha:
+            self.add_error('target_power', 'Целевая мощность должна быть больше α')
+        return cleaned
@@ -0,0 +1,100 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from apps.calculator.models import CalculationHistory
+from core.pagination import KeysetPaginator
+
+BENCHMARK_USERNAME = 'history-benchmark'
+# email у пользователя уникален: пустой или общий адрес столкнулся бы с существующими учётными записями
+BENCHMARK_EMAIL = 'history-benchmark@example.invalid'
+ORDERING = ('-created_at', '-id')
+
+
+class Command(BaseCommand):
+    help = ("Заполняет историю расчётов тестового пользователя и сравнивает OFFSET-пагинацию "
+            "(COUNT + OFFSET) с keyset-пагинацией на разной глубине страниц.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Сколько строк истории создать')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Размер пачки bulk_create')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого замера (берётся медиана)')
+        parser.add_argument('--explain', action='store_true', help='Показать план запроса keyset-страницы')
+        parser.add_argument('--keep', action='store_true', help='Не удалять тестовые данные после замера')
+
+    def handle(self, *args, **options):
+        if options['rows'] < options['per_page']:
+            raise CommandError('--rows должен быть не меньше --per-page')
+        user, _ = get_user_model().objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'email': BENCHMARK_EMAIL},
+        )
+        try:
+            self._seed(user, options['rows'], options['batch_size'])
+            self._measure(user, options)
+        finally:
+            if not options['keep']:
+                CalculationHistory.objects.filter(user=user).delete()
+                user.delete()
+
+    def _seed(self, user, rows, batch_size):
+        existing = CalculationHistory.objects.filter(user=user).count()
+        started = time.perf_counter()
+        now = timezone.now()
+        for offset in range(existing, rows, batch_size):
+            CalculationHistory.objects.bulk_create([
+                CalculationHistory(
+                    user=user, alpha=0.05,
+                    h0_params={'dist': 'norm', 'param1': 0.0, 'param2': 1.0},
+                    h1_params={'dist': 'norm', 'param1': (i % 100) / 10, 'param2': 1.0},
+                    threshold=1.6449, power=0.5, gamma=0.0,
+                    created_at=now - timedelta(seconds=i),
+                )
+                for i in range(offset, min(offset + batch_size, rows))
+            ])
+        if rows > existing:
+            self.stdout.write(f"Создано строк: {rows - existing} за {time.perf_counter() - started:.1f} с")
+
+    def _timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _measure(self, user, options):
+        queryset = CalculationHistory.objects.filter(user=user)
+        per_page, repeat = options['per_page'], options['repeat']
+        total = queryset.count()
+        last_page = (total + per_page - 1) // per_page
+        offset_paginator = Paginator(queryset.order_by(*ORDERING), per_page)
+        keyset_paginator = KeysetPaginator(queryset, per_page, ORDERING)
+
+        self.stdout.write(f"Строк у пользователя: {total}, страниц по {per_page}: {last_page}")
+        self.stdout.write(f"{'страница':>10} {'offset, мс':>12} {'keyset, мс':>12}")
+        for number in sorted({min(page, last_page) for page in (1, 10, max(1, last_page // 2), last_page)}):
+            # Курсор страницы берётся заранее и в замер keyset не входит — его приносит ссылка «далее»
+            cursor = None
+            if number > 1:
+                previous_last = queryset.order_by(*ORDERING)[(number - 1) * per_page - 1]
+                cursor = keyset_paginator.encode_cursor(previous_last)
+
+            def offset_page():
+                paginator = Paginator(queryset.order_by(*ORDERING), per_page)
+                list(paginator.page(number).object_list)
+
+            offset_ms = self._timed(offset_page, repeat)
+            keyset_ms = self._timed(lambda: keyset_paginator.page(after=cursor), repeat)
+            self.stdout.write(f"{number:>10} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+
+        if options['explain']:
+            cursor = keyset_paginator.encode_cursor(offset_paginator.page(last_page // 2 or 1).object_list[0])
+            values = keyset_paginator.decode_cursor(cursor)
+            plan = queryset.filter(keyset_paginator._after(values)).order_by(*ORDERING)[:per_page + 1].explain()
+            self.stdout.write(plan)
@@ -0,0 +1,66 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Код дочернего процесса: время и пиковая RSS после запуска Django и загрузки URL-конфигурации,
+# затем — после первого обращения к численному стеку калькулятора
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+result = {
+    'urls_ms': (time.perf_counter() - started) * 1000,
+    'urls_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'scipy_loaded': 'scipy' in sys.modules,
+}
+from apps.calculator.services.distributions import get_distribution
+get_distribution('norm', 0.0, 1.0).isf(0.05)
+result['numeric_ms'] = (time.perf_counter() - started) * 1000
+result['numeric_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = ("Замеряет холодный старт процесса: время и пиковую RSS после загрузки URL-конфигурации "
+            "(воркер, обслуживающий только теорию и тесты) и после первого расчёта калькулятора.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Число запусков на сценарий (берётся медиана)')
+
+    def _probe(self) -> dict:
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            capture_output=True, text=True, env=env, cwd=str(settings.BASE_DIR),
+        )
+        if completed.returncode != 0:
+            raise CommandError(completed.stderr.strip())
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        if repeat < 1:
+            raise CommandError('--repeat должен быть ≥ 1')
+        runs = [self._probe() for _ in range(repeat)]
+
+        def median(key):
+            return statistics.median(run[key] for run in runs)
+
+        if any(run['scipy_loaded'] for run in runs):
+            self.stdout.write(self.style.WARNING('SciPy загружается уже при импорте URL-конфигурации'))
+        self.stdout.write(f"Запусков: {repeat} (медиана)")
+        self.stdout.write(f"  Django + URL:        {median('urls_ms'):8.0f} мс  {median('urls_rss_mb'):6.1f} МБ")
+        self.stdout.write(f"  + численный стек:    {median('numeric_ms'):8.0f} мс  {median('numeric_rss_mb'):6.1f} МБ")
+        self.stdout.write(
+            f"  Экономия без расчётов: {median('numeric_ms') - median('urls_ms'):.0f} мс, "
+            f"{median('numeric_rss_mb') - median('urls_rss_mb'):.1f} МБ"
+        )
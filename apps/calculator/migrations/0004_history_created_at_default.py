@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0003_calculationjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='calculationhistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0004_history_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calculationhistory',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='calc_history_user_created'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0005_history_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculationhistory',
+            name='test_mode',
+            field=models.CharField(choices=[('lr', 'Отношение правдоподобия'), ('x', 'Порог по наблюдению')], default='x', max_length=2),
+        ),
+    ]
@@ -1,7 +1,16 @@
+import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class CalculationHistory(models.Model):
+    TEST_MODE_LR = 'lr'
+    TEST_MODE_X = 'x'
+    TEST_MODE_CHOICES = [
+        (TEST_MODE_LR, 'Отношение правдоподобия'),
+        (TEST_MODE_X, 'Порог по наблюдению'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     alpha = models.FloatField()
     # Store input parameters as JSON
@@ -11,7 +20,53 @@ class CalculationHistory(models.Model):
     threshold = models.FloatField()
     power = models.FloatField()
     gamma = models.FloatField(help_text="Randomization factor")
+    # Какой критерий дал threshold: 'lr' — порог k для f₁(x)/f₀(x), 'x' — порог C для наблюдения.
+    # Записи до появления поля — критерий по X
+    test_mode = models.CharField(max_length=2, choices=TEST_MODE_CHOICES, default=TEST_MODE_X)
+    # Не auto_now_add: при отложенной записи (services.history) время берётся из момента расчёта
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # История пользователя: фильтр по user и keyset-пагинация по (created_at, id) — см. core.pagination
+            models.Index(fields=['user', '-created_at', '-id'], name='calc_history_user_created'),
+        ]
+
+    @property
+    def threshold_label(self) -> str:
+        return 'k' if self.test_mode == self.TEST_MODE_LR else 'C'
+
+    def __str__(self):
+        return f"Calculation for {self.user.username} at {self.created_at.strftime('%Y-%m-%d')}"
+
+class CalculationJob(models.Model):
+    """Фоновый расчёт (Celery): параметры, статус, прогресс и результат, доступные по id."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILURE = 'failure'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_SUCCESS, 'Готово'),
+        (STATUS_FAILURE, 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=32)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    params = models.JSONField()
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    progress = models.FloatField(default=0.0, help_text="Доля выполнения, 0..1")
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCESS, self.STATUS_FAILURE)
 
     def __str__(self):
-        return f"Calculation for {self.user.username} at {self.created_at.strftime('%Y-%m-%d')}"
\ No newline at end of file
+        return f"{self.kind} job {self.id} ({self.status})"
@@ -0,0 +1,248 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from .numeric import stats
+
+# Сообщение формы для параметров масштаба прежних семейств (norm/uniform/expon)
+SCALE_ERROR = "Параметр scale/σ должен быть > 0"
+
+
+@dataclass(frozen=True)
+class Parameter:
+    """Параметр семейства и ограничения на него; проверка собирается один раз (см. compile)."""
+    name: str
+    label: str
+    positive: bool = False
+    integer: bool = False
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    message: Optional[str] = None
+
+    @property
+    def error(self) -> str:
+        if self.message:
+            return self.message
+        bounds = []
+        if self.positive:
+            bounds.append('> 0')
+        if self.minimum is not None:
+            bounds.append(f'≥ {self.minimum:g}')
+        if self.maximum is not None:
+            bounds.append(f'≤ {self.maximum:g}')
+        text = ' и '.join(bounds)
+        if self.integer:
+            text = f'целым числом {text}'.rstrip()
+        return f"Параметр {self.label} должен быть {text or 'конечным числом'}"
+
+    def compile(self) -> Callable:
+        """Векторизованная проверка: массив значений -> маска допустимых (только нужные условия)."""
+        checks = [np.isfinite]
+        if self.positive:
+            checks.append(lambda v: v > 0)
+        if self.minimum is not None:
+            checks.append(lambda v, m=self.minimum: v >= m)
+        if self.maximum is not None:
+            checks.append(lambda v, m=self.maximum: v <= m)
+        if self.integer:
+            checks.append(lambda v: np.mod(v, 1) == 0)
+
+        def check(values):
+            values = np.atleast_1d(np.asarray(values, dtype=float))
+            with np.errstate(invalid='ignore'):
+                ok = checks[0](values)
+                for extra in checks[1:]:
+                    ok &= extra(values)
+            return ok
+        return check
+
+
+@dataclass(frozen=True)
+class DistributionFamily:
+    """Семейство распределений калькулятора.
+
+    factory(param1, param2) строит замороженный объект SciPy (параметры могут быть массивами),
+    support(param1, param2) — концы носителя, breakpoints(param1, param2) — точки разрыва плотности.
+    closed_form_isf — явная ли у семейства обратная функция выживания (ndtri, логарифм, линейная);
+    если isf SciPy сама итеративная (обратные неполные гамма- и бета-функции, t), порог ищется численно
+    решателем с контролем брекетинга (brentq / векторная бисекция), discrete — дискретное ли распределение (pmf вместо pdf, рандомизация).
+    example — типичные (param1, param2), на которых семейство прогревается при старте (см. services.warmup).
+    """
+    name: str
+    label: str
+    params: Tuple[Parameter, Parameter]
+    factory: Callable
+    support: Callable
+    breakpoints: Optional[Callable] = None
+    closed_form_isf: bool = True
+    discrete: bool = False
+    example: Tuple[float, float] = (0.0, 1.0)
+    checks: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'checks', tuple(param.compile() for param in self.params))
+
+    def validate(self, param1, param2) -> list:
+        """Ошибки параметров: список (номер параметра, номер первой недопустимой строки, сообщение)."""
+        errors = []
+        for position, (param, check, values) in enumerate(zip(self.params, self.checks, (param1, param2))):
+            bad = np.flatnonzero(~check(values))
+            if bad.size:
+                errors.append((position, int(bad[0]), param.error))
+        return errors
+
+
+DISTRIBUTIONS = {}
+
+
+def register_distribution(family: DistributionFamily) -> DistributionFamily:
+    DISTRIBUTIONS[family.name] = family
+    _frozen.cache_clear()
+    return family
+
+
+def get_family(name: str) -> DistributionFamily:
+    try:
+        return DISTRIBUTIONS[name]
+    except KeyError:
+        raise ValueError(f"Не поддерживаемое распределение: {name}")
+
+
+def distribution_choices() -> list:
+    return [(family.name, family.label) for family in DISTRIBUTIONS.values()]
+
+
+def _build(dist_name, param1, param2):
+    family = get_family(dist_name)
+    errors = family.validate(param1, param2)
+    if errors:
+        raise ValueError(errors[0][2])
+    return family.factory(param1, param2)
+
+
+# Исключения lru_cache не запоминает, поэтому проверка параметров выполняется только при промахе
+_frozen = lru_cache(maxsize=1024)(_build)
+
+
+def get_distribution(dist_name, param1, param2):
+    """Возвращает объект распределения SciPy, проверяя параметры по описанию семейства.
+
+    Для скалярных параметров объект берётся из кэша по (семейство, param1, param2): объекты
+    общие, их нельзя изменять. Параметры могут быть массивами NumPy — тогда объект векторизован
+    по строкам и не кэшируется.
+    """
+    if np.ndim(param1) == 0 and np.ndim(param2) == 0:
+        return _frozen(dist_name, float(param1), float(param2))
+    return _build(dist_name, param1, param2)
+
+
+def distribution_support(dist_name: str, param1, param2) -> tuple:
+    """Концы носителя, которые объявляет семейство."""
+    return get_family(dist_name).support(param1, param2)
+
+
+def distribution_breakpoints(dist_name: str, param1: float, param2: float) -> tuple:
+    """Точки разрыва плотности, которые сообщает семейство распределения (пусто для гладких)."""
+    breakpoints = get_family(dist_name).breakpoints
+    return tuple(float(b) for b in breakpoints(param1, param2)) if breakpoints else ()
+
+
+def is_discrete(dist) -> bool:
+    """Дискретен ли замороженный объект SciPy."""
+    return isinstance(dist.dist, stats.rv_discrete)
+
+
+def density(dist, x):
+    """Плотность для непрерывных и вероятность точки (pmf) для дискретных распределений."""
+    return dist.pmf(x) if is_discrete(dist) else dist.pdf(x)
+
+
+def log_density(dist, x):
+    return dist.logpmf(x) if is_discrete(dist) else dist.logpdf(x)
+
+
+def point_mass(dist, x):
+    """P(X = x): pmf для дискретных распределений (0 вне носителя и на ±inf), 0 для непрерывных."""
+    if not is_discrete(dist):
+        return np.zeros(np.shape(x))
+    with np.errstate(invalid='ignore'):
+        return np.nan_to_num(dist.pmf(x), nan=0.0)
+
+
+_LOC = Parameter('loc', 'μ/сдвиг')
+
+register_distribution(DistributionFamily(
+    name='norm', label='Normal',
+    params=(_LOC, Parameter('scale', 'σ', positive=True, message=SCALE_ERROR)),
+    factory=lambda loc, scale: stats.norm(loc=loc, scale=scale),
+    support=lambda loc, scale: (-np.inf, np.inf),
+))
+register_distribution(DistributionFamily(
+    name='uniform', label='Uniform',
+    params=(_LOC, Parameter('scale', 'ширина', positive=True, message=SCALE_ERROR)),
+    factory=lambda loc, scale: stats.uniform(loc=loc, scale=scale),
+    support=lambda loc, scale: (loc, loc + scale),
+    breakpoints=lambda loc, scale: (loc, loc + scale),
+))
+register_distribution(DistributionFamily(
+    name='expon', label='Exponential',
+    params=(_LOC, Parameter('scale', 'scale (1/λ)', positive=True, message=SCALE_ERROR)),
+    factory=lambda loc, scale: stats.expon(loc=loc, scale=scale),
+    support=lambda loc, scale: (loc, np.inf),
+    breakpoints=lambda loc, scale: (loc,),
+))
+register_distribution(DistributionFamily(
+    name='gamma', label='Gamma',
+    params=(Parameter('a', 'форма k', positive=True), Parameter('scale', 'масштаб θ', positive=True)),
+    factory=lambda a, scale: stats.gamma(a, scale=scale),
+    support=lambda a, scale: (0.0, np.inf),
+    breakpoints=lambda a, scale: (0.0,),
+    closed_form_isf=False,
+    example=(2.0, 1.0),
+))
+register_distribution(DistributionFamily(
+    name='beta', label='Beta',
+    params=(Parameter('a', 'α', positive=True), Parameter('b', 'β', positive=True)),
+    factory=lambda a, b: stats.beta(a, b),
+    support=lambda a, b: (0.0, 1.0),
+    breakpoints=lambda a, b: (0.0, 1.0),
+    closed_form_isf=False,
+    example=(2.0, 2.0),
+))
+register_distribution(DistributionFamily(
+    name='t', label="Student's t",
+    params=(Parameter('df', 'ν (степени свободы)', positive=True), Parameter('loc', 'сдвиг')),
+    factory=lambda df, loc: stats.t(df, loc=loc),
+    support=lambda df, loc: (-np.inf, np.inf),
+    closed_form_isf=False,
+    example=(5.0, 0.0),
+))
+register_distribution(DistributionFamily(
+    name='chi2', label='Chi-squared',
+    params=(Parameter('df', 'k (степени свободы)', positive=True), Parameter('scale', 'масштаб', positive=True)),
+    factory=lambda df, scale: stats.chi2(df, scale=scale),
+    support=lambda df, scale: (0.0, np.inf),
+    breakpoints=lambda df, scale: (0.0,),
+    closed_form_isf=False,
+    example=(3.0, 1.0),
+))
+register_distribution(DistributionFamily(
+    name='poisson', label='Poisson',
+    params=(Parameter('mu', 'λ', positive=True), Parameter('loc', 'сдвиг', integer=True)),
+    factory=lambda mu, loc: stats.poisson(mu, loc=loc),
+    support=lambda mu, loc: (loc, np.inf),
+    discrete=True,
+    example=(4.0, 0.0),
+))
+register_distribution(DistributionFamily(
+    name='binom', label='Binomial',
+    params=(Parameter('n', 'n (число испытаний)', integer=True, minimum=1),
+            Parameter('p', 'p (вероятность успеха)', minimum=0, maximum=1)),
+    # Генератор биномиальных выборок NumPy принимает только целое n
+    factory=lambda n, p: stats.binom(np.asarray(n).astype(np.int64), p),
+    support=lambda n, p: (0.0, n),
+    discrete=True,
+    example=(20.0, 0.3),
+))
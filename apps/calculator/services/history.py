@@ -0,0 +1,193 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ..models import CalculationHistory
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей помнит фильтр повторов (последний расчёт каждого)
+DEDUP_USERS = 10000
+
+
+def history_row(user, data: dict, results: dict) -> CalculationHistory:
+    """Несохранённая запись истории; время фиксируется сейчас, а не в момент записи в БД."""
+    return CalculationHistory(
+        user=user,
+        alpha=data['alpha'],
+        h0_params={
+            "dist": data['h0_dist'],
+            "param1": data['h0_param1'],
+            "param2": data['h0_param2'],
+        },
+        h1_params={
+            "dist": data['h1_dist'],
+            "param1": data['h1_param1'],
+            "param2": data['h1_param2'],
+        },
+        threshold=results['threshold'],
+        power=results['power'],
+        gamma=results['gamma'],
+        # Та же нормализация, что в CalculatorForm.clean_test_mode и ключе ResultCache
+        test_mode=data.get('test_mode') or CalculationHistory.TEST_MODE_X,
+        created_at=timezone.now(),
+    )
+
+
+def _signature(row: CalculationHistory) -> tuple:
+    return (
+        row.alpha,
+        tuple(sorted(row.h0_params.items())),
+        tuple(sorted(row.h1_params.items())),
+        row.test_mode, row.threshold, row.power, row.gamma,
+    )
+
+
+class HistoryBuffer:
+    """Запись истории расчётов: сразу (buffered=False) или отложенно пачками через bulk_create.
+
+    В отложенном режиме строки копятся в памяти процесса и записываются одним INSERT, когда их
+    набирается batch_size, через flush_interval секунд после первой строки пачки (фоновый таймер)
+    или при завершении процесса (atexit). Незаписанные строки теряются только при аварийном падении.
+    dedup=True не записывает расчёт, совпадающий с предыдущим расчётом того же пользователя
+    (в пределах процесса: каждый воркер помнит последние расчёты своих пользователей). Если строку
+    записать не удалось, фильтр её забывает, и повтор того же расчёта записывается снова.
+    """
+
+    def __init__(self, buffered=False, batch_size=100, flush_interval=2.0, dedup=False):
+        self.buffered = buffered
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedup = dedup
+        self._rows = []
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+        self.written = 0
+        self.skipped = 0
+
+    def add(self, row: CalculationHistory) -> None:
+        with self._lock:
+            if self.dedup and self._is_repeat(row):
+                self.skipped += 1
+                return
+            if self.buffered:
+                self._rows.append(row)
+                full = len(self._rows) >= self.batch_size
+                if not full and self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if not self.buffered:
+            try:
+                row.save()
+            except Exception:
+                self._forget(row)
+                raise
+            with self._lock:
+                self.written += 1
+        elif full:
+            self.flush()
+
+    def _is_repeat(self, row) -> bool:
+        signature = _signature(row)
+        if self._last.get(row.user_id) == signature:
+            return True
+        self._last[row.user_id] = signature
+        self._last.move_to_end(row.user_id)
+        while len(self._last) > DEDUP_USERS:
+            self._last.popitem(last=False)
+        return False
+
+    def _forget(self, row) -> None:
+        """Убирает незаписанную строку из фильтра повторов, если она всё ещё последняя у пользователя."""
+        if not self.dedup:
+            return
+        with self._lock:
+            if self._last.get(row.user_id) == _signature(row):
+                del self._last[row.user_id]
+
+    def flush(self) -> int:
+        """Записывает накопленные строки; возвращает число записанных."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not rows:
+            return 0
+        try:
+            CalculationHistory.objects.bulk_create(rows)
+            saved = len(rows)
+        except Exception:
+            # Одна плохая строка (например, пользователь удалён) не должна терять всю пачку
+            logger.exception("Пакетная запись истории не удалась, пишем по одной строке")
+            saved = 0
+            for row in rows:
+                try:
+                    row.save()
+                    saved += 1
+                except Exception:
+                    logger.exception("Не удалось записать историю пользователя %s", row.user_id)
+                    self._forget(row)
+        with self._lock:
+            self.written += saved
+        return saved
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # У потока таймера своё соединение с БД — закрываем его, чтобы не копились
+            connections.close_all()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_history_buffer() -> HistoryBuffer:
+    """Буфер истории процесса, настроенный из settings.CALCULATOR_HISTORY."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = settings.CALCULATOR_HISTORY
+                _buffer = HistoryBuffer(
+                    buffered=config['MODE'] == 'buffered',
+                    batch_size=config['BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    dedup=config['DEDUP'],
+                )
+    return _buffer
+
+
+def record_history(user, data: dict, results: dict) -> None:
+    get_history_buffer().add(history_row(user, data, results))
+
+
+@atexit.register
+def flush_history() -> None:
+    if _buffer is not None:
+        _buffer.flush()
+
+
+@receiver(setting_changed)
+def _reset_history_buffer(*, setting, **kwargs):
+    global _buffer
+    if setting == 'CALCULATOR_HISTORY':
+        with _buffer_lock:
+            if _buffer is not None:
+                _buffer.flush()
+            _buffer = None
@@ -0,0 +1,167 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.utils import timezone
+
+from ..forms import MonteCarloForm
+from ..models import CalculationJob
+from .monte_carlo import run_monte_carlo
+from .neyman_pearson_solver import solve_neyman_pearson_batch, BATCH_FIELDS
+
+
+@dataclass(frozen=True)
+class JobKind:
+    """Тип фоновой задачи.
+
+    parse(payload) проверяет входные данные и возвращает JSON-совместимые параметры (или ValueError),
+    run(params, progress) выполняет расчёт и возвращает JSON-совместимый результат; progress(fraction)
+    можно вызывать сколько угодно часто — запись в БД прореживается. template — partial для готового результата,
+    в него передаются result и preview (результат preview(result), если функция задана).
+    login_required — ставить задачу в очередь могут только авторизованные пользователи.
+    """
+    name: str
+    label: str
+    parse: Callable[[dict], dict]
+    run: Callable[[dict, Callable[[float], None]], dict]
+    template: str
+    preview: Optional[Callable[[dict], object]] = None
+    login_required: bool = False
+
+
+JOB_KINDS = {}
+
+
+def register_job_kind(kind: JobKind) -> JobKind:
+    JOB_KINDS[kind.name] = kind
+    return kind
+
+
+def get_job_kind(name: str) -> JobKind:
+    try:
+        return JOB_KINDS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный тип задачи: {name}")
+
+
+def submit_job(kind_name: str, payload: dict, user=None) -> CalculationJob:
+    """Проверяет параметры, создаёт CalculationJob и ставит задачу в очередь Celery.
+
+    В режиме CELERY_TASK_ALWAYS_EAGER задача выполняется сразу, и возвращается уже завершённая задача.
+    PermissionDenied — тип задачи требует входа, а пользователь анонимный.
+    """
+    from ..tasks import run_calculation_job
+
+    kind = get_job_kind(kind_name)
+    if kind.login_required and not (user is not None and user.is_authenticated):
+        raise PermissionDenied(f'Задачу «{kind.label}» может поставить только авторизованный пользователь')
+    params = kind.parse(payload)
+    job = CalculationJob.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        kind=kind.name,
+        params=params,
+    )
+    run_calculation_job.delay(str(job.id))
+    job.refresh_from_db()
+    return job
+
+
+def execute_job(job_id, progress_interval: float = 0.5) -> CalculationJob:
+    """Выполняет задачу в текущем процессе (вызывается из Celery-задачи) и сохраняет результат или ошибку."""
+    job = CalculationJob.objects.get(id=job_id)
+    if job.is_finished:
+        return job
+    kind = get_job_kind(job.kind)
+
+    job.status = CalculationJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    last_write = [time.monotonic()]
+
+    def progress(fraction: float) -> None:
+        now = time.monotonic()
+        if now - last_write[0] >= progress_interval:
+            last_write[0] = now
+            CalculationJob.objects.filter(id=job.id).update(progress=min(max(float(fraction), 0.0), 1.0))
+
+    try:
+        job.result = kind.run(job.params, progress)
+        job.status = CalculationJob.STATUS_SUCCESS
+        job.progress = 1.0
+    except Exception as e:
+        job.status = CalculationJob.STATUS_FAILURE
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'finished_at'])
+    return job
+
+
+def parse_batch_payload(payload) -> dict:
+    """Проверяет колоночный JSON пакетного расчёта (см. calculate_batch_view) и возвращает колонки."""
+    if not isinstance(payload, dict):
+        raise ValueError('Ожидался JSON-объект с колонками')
+    missing = [field for field in BATCH_FIELDS if field not in payload]
+    if missing:
+        raise ValueError(f'Не заданы поля: {", ".join(missing)}')
+    max_rows = settings.CALCULATOR_BATCH_MAX_ROWS
+    rows = batch_row_count(payload)
+    if rows > max_rows:
+        raise ValueError(f'Слишком много строк ({rows}). Максимум {max_rows}.')
+    return {field: payload[field] for field in BATCH_FIELDS}
+
+
+def batch_row_count(payload: dict) -> int:
+    return max(len(payload[f]) if isinstance(payload[f], list) else 1 for f in BATCH_FIELDS)
+
+
+def run_batch_job(params: dict, progress) -> dict:
+    results = solve_neyman_pearson_batch(*(params[field] for field in BATCH_FIELDS))
+    return {
+        'count': int(results['threshold'].size),
+        'threshold': results['threshold'].tolist(),
+        'power': results['power'].tolist(),
+        'gamma': results['gamma'].tolist(),
+    }
+
+
+register_job_kind(JobKind(
+    name='batch',
+    label='Пакетный расчёт',
+    parse=parse_batch_payload,
+    run=run_batch_job,
+    template='calculator/partials/job_batch.html',
+    preview=lambda result: list(zip(result['threshold'][:20], result['power'][:20])),
+    # До CALCULATOR_BATCH_MAX_ROWS строк на задачу: анонимно очередь не заполнить
+    login_required=True,
+))
+
+
+def parse_form_payload(form_class):
+    """parse для задач, параметры которых задаются формой: ошибки формы превращаются в ValueError."""
+    def parse(payload: dict) -> dict:
+        form = form_class(payload)
+        if not form.is_valid():
+            raise ValueError('; '.join(f"{field}: {err}" for field, errors in form.errors.items() for err in errors))
+        return form.cleaned_data
+    return parse
+
+
+def run_monte_carlo_job(params: dict, progress) -> dict:
+    config = settings.CALCULATOR_MONTE_CARLO
+    data = {name: value for name, value in params.items() if name not in ('n_samples', 'seed')}
+    return run_monte_carlo(
+        data, params['n_samples'], chunk_size=config['CHUNK_SIZE'], seed=params['seed'],
+        workers=config['WORKERS'], progress=progress,
+    )
+
+
+register_job_kind(JobKind(
+    name='monte_carlo',
+    label='Проверка методом Монте-Карло',
+    parse=parse_form_payload(MonteCarloForm),
+    run=run_monte_carlo_job,
+    template='calculator/partials/job_monte_carlo.html',
+))
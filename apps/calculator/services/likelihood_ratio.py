@@ -0,0 +1,276 @@
+import numpy as np
+
+from .distributions import distribution_breakpoints, get_distribution, is_discrete, log_density
+from .numeric import optimize, special
+
+# Бюджет узлов сетки, на которой ищется область {f1/f0 > k}; хвосты за квантилями LR_TAIL — крайние ячейки
+LR_GRID_POINTS = 2048
+LR_TAIL = 1e-12
+# Скачок P0 при переходе k через значение, большее этого, означает плато отношения правдоподобия
+PLATEAU_TOL = 1e-9
+# Предел итераций и допуск по log(f1/f0) при уточнении границ внутри ячеек
+BOUNDARY_ITERATIONS = 50
+BOUNDARY_TOL = 1e-12
+
+
+def _log_ratio(h0, h1, x):
+    """log(f1/f0) (для дискретных — отношение pmf) в точках x: +inf там, где f0 = 0 < f1, и -inf там, где f1 = 0 (в том числе f0 = f1 = 0)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_f0 = log_density(h0, x)
+        log_f1 = log_density(h1, x)
+        ratio = log_f1 - log_f0
+    return np.where(np.isneginf(log_f1), -np.inf, ratio)
+
+
+def _interval_mass(dist, a, b):
+    """P(a < X < b) разностью CDF; правее медианы — разностью sf, чтобы не терять точность в хвосте."""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    right = a > dist.median()
+    return np.where(right, dist.sf(a) - dist.sf(b), dist.cdf(b) - dist.cdf(a))
+
+
+class _RatioGrid:
+    """Разбиение носителя на ячейки со значением log(f1/f0) в представителе каждой ячейки.
+
+    Границы ячеек — квантили обеих гипотез на логит-равномерной сетке вероятностей от LR_TAIL
+    до 1 - LR_TAIL (мелкие ячейки там, где сосредоточена масса, и в хвостах — в том числе тяжёлых),
+    равномерная сетка по центральной части, концы носителей и точки разрыва плотностей.
+    Крайние ячейки уходят до концов объединённого носителя (возможно ±inf).
+    """
+
+    def __init__(self, h0, h1, breakpoints=(), points=LR_GRID_POINTS):
+        self.h0, self.h1 = h0, h1
+        lo = min(h0.support()[0], h1.support()[0])
+        hi = max(h0.support()[1], h1.support()[1])
+        probs = special.expit(np.linspace(special.logit(LR_TAIL), -special.logit(LR_TAIL), points // 4))
+        center = np.linspace(min(h0.ppf(1e-3), h1.ppf(1e-3)), max(h0.isf(1e-3), h1.isf(1e-3)), points // 2)
+        inner = np.concatenate([h0.ppf(probs), h1.ppf(probs), center, breakpoints])
+        edges = np.unique(np.concatenate([[lo, hi], inner[(inner > lo) & (inner < hi)]]))
+
+        a, b = edges[:-1], edges[1:]
+        # Представитель бесконечной ячейки — на расстоянии ширины соседней ячейки от конечного края
+        width = np.diff(edges[1:-1])
+        left_step = width[0] if width.size else 1.0
+        right_step = width[-1] if width.size else 1.0
+        with np.errstate(invalid='ignore'):
+            rep = np.where(np.isinf(a), b - left_step, np.where(np.isinf(b), a + right_step, 0.5 * (a + b)))
+        self.edges = edges
+        self.rep = rep
+        self.ratio = _log_ratio(h0, h1, rep)
+        # На разрывах плотностей и рядом с бесконечным отношением граница не уточняется — она на краю ячейки
+        finite = np.isfinite(self.ratio)
+        self.fixed = np.isin(edges[1:-1], breakpoints) | ~finite[:-1] | ~finite[1:]
+
+    def region(self, log_k, exact=False):
+        """Интервалы {x: log(f1/f0) > log_k} как массивы (starts, ends).
+
+        exact=False — границы внутри ячеек линейной интерполяцией (для бисекции по k),
+        exact=True — корни log(f1/f0) = log_k, уточнённые сразу для всех границ (см. _refine_boundaries).
+        """
+        inside = self.ratio > log_k
+        idx = np.flatnonzero(inside[1:] != inside[:-1])
+        boundary = self.edges[idx + 1].copy()
+        free = ~self.fixed[idx]
+        i = idx[free]
+        x0, x1 = self.rep[i], self.rep[i + 1]
+        r0, r1 = self.ratio[i] - log_k, self.ratio[i + 1] - log_k
+        if exact:
+            boundary[free] = self._refine_boundaries(x0, x1, r0, r1, log_k)
+        else:
+            boundary[free] = x0 - r0 * (x1 - x0) / (r1 - r0)
+        return self._intervals(inside, idx, boundary)
+
+    def _refine_boundaries(self, a, b, fa, fb, log_k):
+        """Векторизованный метод Иллинойса для log(f1/f0) = log_k на отрезках [a, b] со сменой знака."""
+        c = b
+        for _ in range(BOUNDARY_ITERATIONS):
+            if a.size == 0:
+                break
+            c = b - fb * (b - a) / (fb - fa)
+            fc = _log_ratio(self.h0, self.h1, c) - log_k
+            if np.all(np.abs(fc) <= BOUNDARY_TOL * max(1.0, abs(log_k))):
+                break
+            flipped = np.sign(fc) != np.sign(fb)
+            a, fa = np.where(flipped, b, a), np.where(flipped, fb, 0.5 * fa)
+            b, fb = c, fc
+        return c
+
+    def cells(self, inside):
+        """Объединение отмеченных ячеек как интервалы по их краям."""
+        idx = np.flatnonzero(inside[1:] != inside[:-1])
+        return self._intervals(inside, idx, self.edges[idx + 1])
+
+    def _intervals(self, inside, idx, boundary):
+        entering = inside[idx + 1]
+        starts = boundary[entering]
+        ends = boundary[~entering]
+        if inside[0]:
+            starts = np.concatenate([[self.edges[0]], starts])
+        if inside[-1]:
+            ends = np.concatenate([ends, [self.edges[-1]]])
+        return starts, ends
+
+    def mass(self, dist, intervals):
+        starts, ends = intervals
+        return float(_interval_mass(dist, starts, ends).sum()) if starts.size else 0.0
+
+
+def _as_list(intervals):
+    """Интервалы в JSON-совместимом виде: бесконечные концы — None."""
+    return [[float(a) if np.isfinite(a) else None, float(b) if np.isfinite(b) else None]
+            for a, b in zip(*intervals)]
+
+
+def solve_likelihood_ratio(data: dict) -> dict:
+    """Критерий Неймана–Пирсона по отношению правдоподобия: отвергаем H0 при f1(x)/f0(x) > k,
+    при f1/f0 = k — с вероятностью gamma.
+
+    Область отвержения находится векторизованно на сетке ячеек и может быть объединением интервалов
+    (например, при H1 с меньшей или большей дисперсией). k подбирается бисекцией по log k, вероятности
+    областей считаются разностями CDF по концам интервалов. Если P0(f1/f0 = k) > 0 (плато отношения,
+    например у равномерных распределений), gamma добирает размер критерия до alpha.
+
+    Возвращает k ("threshold"), мощность, gamma, интервалы строгой ("region") и рандомизированной
+    ("randomized_region") областей отвержения; бесконечные концы интервалов — None.
+    """
+    alpha = data['alpha']
+    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    breakpoints = (
+        distribution_breakpoints(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+        + distribution_breakpoints(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    )
+    if is_discrete(h0) or is_discrete(h1):
+        if not (is_discrete(h0) and is_discrete(h1)):
+            raise ValueError("Для критерия отношения правдоподобия H₀ и H₁ должны быть "
+                             "обе дискретными или обе непрерывными")
+        return _solve_discrete(h0, h1, alpha)
+    grid = _RatioGrid(h0, h1, breakpoints)
+
+    def size(log_k, exact=False):
+        return grid.mass(h0, grid.region(log_k, exact))
+
+    finite = grid.ratio[np.isfinite(grid.ratio)]
+    lo = float(finite.min()) - 1.0 if finite.size else -1.0
+    hi = float(finite.max()) + 1.0 if finite.size else 1.0
+
+    if size(lo) <= alpha:
+        # Даже вся область f1 > 0 не набирает alpha: k = 0, остаток добирается на {f1 = 0}
+        log_k = -np.inf
+        region = grid.region(lo)
+        randomized = grid.cells(~(grid.ratio > lo))
+    else:
+        for _ in range(200):
+            mid = 0.5 * (lo + hi)
+            if size(mid) > alpha:
+                lo = mid
+            else:
+                hi = mid
+            if hi - lo <= 1e-12 * max(1.0, abs(mid)):
+                break
+
+        if size(lo) - size(hi) > PLATEAU_TOL:
+            # Плато: ячейки, которые входят в область сразу все при переходе k через значение на плато
+            log_k = hi
+            region = grid.region(hi, exact=True)
+            randomized = grid.cells((grid.ratio > lo) & ~(grid.ratio > hi))
+        else:
+            log_k = _refine_log_k(lambda t: size(t, exact=True) - alpha, lo, hi)
+            region = grid.region(log_k, exact=True)
+            randomized = (np.empty(0), np.empty(0))
+
+    strict_size = grid.mass(h0, region)
+    plateau_size = grid.mass(h0, randomized)
+    gamma = min(max((alpha - strict_size) / plateau_size, 0.0), 1.0) if plateau_size > PLATEAU_TOL else 0.0
+    power = grid.mass(h1, region) + gamma * grid.mass(h1, randomized)
+
+    return {
+        "threshold": round(float(np.exp(log_k)), 4),
+        "power": round(float(power), 4),
+        "gamma": round(float(gamma), 4),
+        "size": float(strict_size + gamma * plateau_size),
+        "region": _as_list(region),
+        "randomized_region": _as_list(randomized),
+        "method": 'lr',
+    }
+
+
+def _integer_runs(points, inside, lower, upper):
+    """Целые точки, отмеченные inside, как интервалы (a - 1/2, b + 1/2) по подряд идущим точкам.
+
+    Крайние серии продолжаются до концов носителя lower/upper (за пределы перечисленных точек).
+    Полуцелые концы дают одно и то же множество целых и для открытых, и для замкнутых интервалов.
+    """
+    idx = np.flatnonzero(np.diff(np.concatenate([[0], inside.astype(np.int8), [0]])))
+    starts, ends = points[idx[::2]] - 0.5, points[idx[1::2] - 1] + 0.5
+    if starts.size:
+        if inside[0]:
+            starts[0] = lower - 0.5
+        if inside[-1]:
+            ends[-1] = upper + 0.5
+    return starts, ends
+
+
+def _solve_discrete(h0, h1, alpha):
+    """Дискретный случай: точки носителя упорядочиваются по p1/p0, k и gamma находятся точно.
+
+    P0(p1/p0 > k) <= alpha < P0(p1/p0 >= k), gamma = (alpha - P0(p1/p0 > k)) / P0(p1/p0 = k).
+    Хвосты за квантилями LR_TAIL примыкают к крайним перечисленным точкам.
+    """
+    lower = min(h0.support()[0], h1.support()[0])
+    upper = max(h0.support()[1], h1.support()[1])
+    start = max(lower, min(h0.ppf(LR_TAIL), h1.ppf(LR_TAIL)))
+    stop = min(upper, max(h0.isf(LR_TAIL), h1.isf(LR_TAIL)))
+    points = np.arange(start, stop + 1)
+    p0, p1 = h0.pmf(points), h1.pmf(points)
+    # Отношения сравниваются с точностью до 12 знаков, чтобы равные p1/p0 считались одним уровнем
+    ratio = np.round(_log_ratio(h0, h1, points), 12)
+
+    levels = np.unique(ratio)[::-1]
+    above = 0.0
+    log_k = -np.inf
+    for level in levels:
+        at = p0[ratio == level].sum()
+        if above + at > alpha:
+            log_k = level
+            break
+        above += at
+
+    strict = ratio > log_k
+    plateau = ratio == log_k
+    plateau_size = p0[plateau].sum()
+    gamma = min(max((alpha - p0[strict].sum()) / plateau_size, 0.0), 1.0) if plateau_size > 0 else 0.0
+    power = p1[strict].sum() + gamma * p1[plateau].sum()
+    return {
+        "threshold": round(float(np.exp(log_k)), 4),
+        "power": round(float(power), 4),
+        "gamma": round(float(gamma), 4),
+        "size": float(p0[strict].sum() + gamma * plateau_size),
+        "region": _as_list(_integer_runs(points, strict, lower, upper)),
+        "randomized_region": _as_list(_integer_runs(points, plateau, lower, upper)),
+        "method": 'lr',
+    }
+
+
+def _refine_log_k(func, lo, hi):
+    """Корень func (размер критерия с точными границами минус alpha) около найденного бисекцией интервала.
+
+    Интерполированные границы дают размер с небольшой погрешностью, поэтому интервал при
+    необходимости расширяется, пока func не сменит знак.
+    """
+    step = max(hi - lo, 1e-6 * max(1.0, abs(hi)))
+    for _ in range(60):
+        f_lo, f_hi = func(lo), func(hi)
+        if f_lo >= 0 >= f_hi:
+            break
+        if f_lo < 0:
+            lo -= step
+        if f_hi > 0:
+            hi += step
+        step *= 2
+    else:
+        return hi
+    if f_lo == 0 or f_hi == 0:
+        return lo if f_lo == 0 else hi
+    return optimize.brentq(func, lo, hi, xtol=1e-12)
@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .likelihood_ratio import solve_likelihood_ratio
+from .neyman_pearson_solver import get_distribution, find_threshold, randomization, randomized_power
+from .numeric import stats
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def chunk_sizes(n_samples: int, chunk_size: int) -> list:
+    """Размеры блоков выборки: все по chunk_size, последний — остаток."""
+    full, rest = divmod(n_samples, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def _in_intervals(x, intervals, closed=False):
+    inside = np.zeros(x.shape, dtype=bool)
+    for a, b in intervals:
+        inside |= ((x >= a) & (x <= b)) if closed else ((x > a) & (x < b))
+    return inside
+
+
+def _simulate_chunk(h0_spec, h1_spec, region, randomized, gamma, size, seed_seq):
+    """Один блок: size наблюдений из H0 и из H1, возвращает число отвержений H0 в каждой выборке.
+
+    H0 отвергается в интервалах region, а в интервалах randomized — с вероятностью gamma.
+    Верхнеуровневая функция, чтобы её можно было передать в пул процессов; распределения
+    пересоздаются из (имя, param1, param2) на стороне воркера.
+    """
+    rng = np.random.default_rng(seed_seq)
+    counts = []
+    for spec in (h0_spec, h1_spec):
+        x = get_distribution(*spec).rvs(size=size, random_state=rng)
+        reject = _in_intervals(x, region)
+        if gamma > 0:
+            reject |= _in_intervals(x, randomized, closed=True) & (rng.random(size) < gamma)
+        counts.append(int(np.count_nonzero(reject)))
+    return counts[0], counts[1], size
+
+
+def _bounds(intervals):
+    return [(-np.inf if a is None else a, np.inf if b is None else b) for a, b in intervals]
+
+
+def critical_region(data: dict) -> dict:
+    """Правило отвержения для выбранного критерия (data['test_mode']): интервалы, рандомизация и ожидаемая мощность.
+
+    Для критерия по X берётся неокруглённый порог: округлённый до 4 знаков в solve_neyman_pearson
+    сдвигал бы эмпирический alpha.
+    """
+    if data.get('test_mode') == 'lr':
+        solution = solve_likelihood_ratio(data)
+        return {
+            'threshold': solution['threshold'],
+            'region': solution['region'],
+            'randomized_region': solution['randomized_region'],
+            'gamma': solution['gamma'],
+            'expected_power': solution['power'],
+        }
+    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    threshold, _ = find_threshold(data['h0_dist'], h0, data['alpha'])
+    gamma = float(randomization(h0, threshold, data['alpha']))
+    return {
+        'threshold': threshold,
+        'region': [[threshold, None]],
+        'randomized_region': [[threshold, threshold]] if gamma > 0 else [],
+        'gamma': gamma,
+        'expected_power': float(randomized_power(h1, threshold, gamma)),
+    }
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> tuple:
+    """Доверительный интервал Уилсона для доли успехов."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = stats.norm.isf((1 - confidence) / 2)
+    p = successes / trials
+    denom = 1 + z ** 2 / trials
+    center = (p + z ** 2 / (2 * trials)) / denom
+    half = z * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / denom
+    lower = 0.0 if successes == 0 else max(0.0, center - half)
+    upper = 1.0 if successes == trials else min(1.0, center + half)
+    return float(lower), float(upper)
+
+
+def run_monte_carlo(data: dict, n_samples: int, chunk_size: int = DEFAULT_CHUNK_SIZE, seed=None,
+                    workers: int = 1, progress=None, confidence: float = 0.95) -> dict:
+    """Эмпирическая проверка размера и мощности критерия (см. critical_region).
+
+    Выборки из H0 и H1 генерируются блоками по chunk_size и сразу сворачиваются в счётчики
+    отвержений, поэтому память не зависит от n_samples. Каждый блок получает свой SeedSequence,
+    порождённый из seed, — результат воспроизводим и не зависит от числа воркеров.
+    workers > 1 распределяет блоки по пулу процессов. progress(fraction) вызывается после каждого блока.
+    """
+    if n_samples <= 0 or chunk_size <= 0:
+        raise ValueError("Размер выборки и размер блока должны быть > 0")
+
+    h0_spec = (data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1_spec = (data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    rule = critical_region(data)
+    region, randomized, gamma = _bounds(rule['region']), _bounds(rule['randomized_region']), rule['gamma']
+
+    sizes = chunk_sizes(n_samples, chunk_size)
+    seed_seq = np.random.SeedSequence(seed)
+    children = seed_seq.spawn(len(sizes))
+
+    rejected_h0 = rejected_h1 = done = 0
+
+    def accumulate(counts):
+        nonlocal rejected_h0, rejected_h1, done
+        rejected_h0 += counts[0]
+        rejected_h1 += counts[1]
+        done += counts[2]
+        if progress is not None:
+            progress(done / n_samples)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_simulate_chunk, h0_spec, h1_spec, region, randomized, gamma, size, child)
+                for size, child in zip(sizes, children)
+            ]
+            for future in as_completed(futures):
+                accumulate(future.result())
+    else:
+        for size, child in zip(sizes, children):
+            accumulate(_simulate_chunk(h0_spec, h1_spec, region, randomized, gamma, size, child))
+
+    empirical_alpha = rejected_h0 / n_samples
+    empirical_power = rejected_h1 / n_samples
+    return {
+        'n_samples': n_samples,
+        'chunks': len(sizes),
+        'seed': seed_seq.entropy if seed is None else seed,
+        'test_mode': data.get('test_mode') or 'x',
+        'threshold': rule['threshold'],
+        'region': rule['region'],
+        'gamma': gamma,
+        'confidence': confidence,
+        'expected_alpha': data['alpha'],
+        'expected_power': rule['expected_power'],
+        'empirical_alpha': empirical_alpha,
+        'alpha_ci': wilson_interval(rejected_h0, n_samples, confidence),
+        'empirical_power': empirical_power,
+        'power_ci': wilson_interval(rejected_h1, n_samples, confidence),
+    }
@@ -1,63 +1,384 @@
+import base64
 import numpy as np
-from scipy import stats
-from scipy.optimize import brentq
-from scipy.integrate import quad
-
-def get_distribution(dist_name, param1, param2):
-    """Возвращает объект распределения SciPy, проверяя допустимость параметров.
-
-    param2 для всех используемых распределений является scale / sigma / шириной и должен быть > 0.
-    """
-    if param2 <= 0:
-        raise ValueError("Параметр scale/σ/ширина должен быть > 0")
-    if dist_name == 'norm':
-        return stats.norm(loc=param1, scale=param2)
-    if dist_name == 'uniform':
-        return stats.uniform(loc=param1, scale=param2)
-    if dist_name == 'expon':
-        return stats.expon(loc=param1, scale=param2)
-    raise ValueError(f"Не поддерживаемое распределение: {dist_name}")
-
-def solve_neyman_pearson(data: dict) -> dict:
-    """Основная логика критерия Неймана–Пирсона (упрощённый вариант).
 
-    Находит порог c такой, что P(X > c | H0) = alpha для одностороннего теста.
-    Возвращает словарь с порогом, мощностью и данными для визуализации.
-    """
-    alpha = data['alpha']
-    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
-    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+from .distributions import (
+    density, distribution_breakpoints, distribution_support, get_distribution, get_family, is_discrete, point_mass,
+)
+from .numeric import optimize
+
+THRESHOLD_ERROR = "Не удалось найти уникальный порог. Проверьте параметры распределений и alpha."
 
+
+def _threshold_isf(h0, alpha):
+    return h0.isf(alpha)
+
+
+def _threshold_brentq(h0, alpha):
+    """Резервный путь: brentq по h0.sf(c) - alpha с расширением интервала до накрытия корня."""
     def find_c_func(c):
         return h0.sf(c) - alpha
 
+    lo, hi = h0.ppf(0.001), h0.ppf(0.999)
+    width = max(hi - lo, 1.0)
+    for _ in range(60):
+        if find_c_func(lo) >= 0 >= find_c_func(hi):
+            break
+        if find_c_func(lo) < 0:
+            lo -= width
+        if find_c_func(hi) > 0:
+            hi += width
+        width *= 2
+    # Точность относительная: корни у нуля (gamma с малой формой) не должны теряться в абсолютном xtol
+    return optimize.brentq(find_c_func, lo, hi, xtol=1e-300, rtol=4 * np.finfo(float).eps, maxiter=500)
+
+
+# Стратегии поиска порога: имя пути -> функция (h0, alpha) -> c
+THRESHOLD_STRATEGIES = {
+    'isf': _threshold_isf,
+    'brentq': _threshold_brentq,
+}
+
+
+def threshold_method_for(dist_name: str) -> str:
+    """Имя стратегии поиска порога для семейства H0: явная isf, если семейство её объявляет, иначе brentq."""
+    return 'isf' if get_family(dist_name).closed_form_isf else 'brentq'
+
+
+def find_threshold(dist_name: str, h0, alpha: float) -> tuple:
+    """Находит порог c с P(X > c | H0) = alpha.
+
+    Возвращает пару (c, method), где method — имя использованной стратегии ('isf' или 'brentq').
+    """
+    method = threshold_method_for(dist_name)
     try:
-        interval_start = h0.ppf(0.001)
-        interval_end = h0.ppf(0.999)
-        c_threshold = brentq(find_c_func, interval_start, interval_end)
+        c_threshold = float(THRESHOLD_STRATEGIES[method](h0, alpha))
     except ValueError:
-        raise ValueError("Не удалось найти уникальный порог. Проверьте параметры распределений и alpha.")
+        raise ValueError(THRESHOLD_ERROR)
+    if not np.isfinite(c_threshold):
+        raise ValueError(THRESHOLD_ERROR)
+    return c_threshold, method
 
-    power = h1.sf(c_threshold)
-    gamma = 0.0  # В этой упрощённой реализации рандомизация не используется
 
-    x = np.linspace(
-        min(h0.ppf(0.001), h1.ppf(0.001)),
-        max(h0.ppf(0.999), h1.ppf(0.999)),
-        400
-    )
-    h0_pdf = h0.pdf(x)
-    h1_pdf = h1.pdf(x)
+def randomization(h0, threshold, alpha):
+    """gamma рандомизированного критерия: P0(X > c) + gamma * P0(X = c) = alpha.
+
+    Для дискретного H0 порог c = isf(alpha) даёт P0(X > c) <= alpha < P0(X >= c), и недостающий
+    размер добирается отвержением с вероятностью gamma в точке c; для непрерывного H0 gamma = 0.
+    Векторизована по threshold/alpha.
+    """
+    mass = point_mass(h0, threshold)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.where(mass > 0, (alpha - h0.sf(threshold)) / mass, 0.0)
+    return np.clip(gamma, 0.0, 1.0)
+
+
+def randomized_power(h1, threshold, gamma):
+    """Мощность P1(X > c) + gamma * P1(X = c)."""
+    return h1.sf(threshold) + gamma * point_mass(h1, threshold)
+
+
+PLOT_POINTS = 400
+
+
+def _encode_f32(values) -> str:
+    """Массив -> base64 от little-endian Float32 (в 4+ раза короче JSON-списка из float)."""
+    return base64.b64encode(np.asarray(values, dtype='<f4').tobytes()).decode('ascii')
+
+
+def _allocate(weights: np.ndarray, total: int) -> np.ndarray:
+    """Распределяет total точек по ячейкам пропорционально весам (метод наибольших остатков)."""
+    if total <= 0 or weights.sum() <= 0:
+        return np.zeros(weights.size, dtype=int)
+    exact = weights / weights.sum() * total
+    counts = np.floor(exact).astype(int)
+    remainder = total - counts.sum()
+    if remainder:
+        counts[np.argsort(exact - counts)[::-1][:remainder]] += 1
+    return counts
+
+
+def adaptive_grid(h0, h1, start: float, stop: float, points: int, breakpoints=()):
+    """Неравномерная сетка из points точек, сгущающаяся там, где плотности меняются.
+
+    Четверть бюджета уходит на равномерный каркас, по нему оцениваются длина дуги и кривизна обеих
+    плотностей (в нормированных координатах); остальные точки распределяются по ячейкам каркаса
+    пропорционально этим весам. Около каждой точки разрыва ставится тройка b-ε, b, b+ε.
+    Возвращает (x, h0_pdf, h1_pdf); pdf вычисляется ровно в points точках.
+    """
+    breakpoints = sorted(b for b in breakpoints if start <= b <= stop)
+    width = stop - start
+    eps = width * 1e-6
+    break_x = np.array([v for b in breakpoints for v in (b - eps, b, b + eps)], dtype=float)
+
+    backbone_n = max(16, points // 4)
+    refine_n = points - backbone_n - break_x.size
+    if refine_n < 0:
+        raise ValueError("Слишком маленький бюджет точек для адаптивной сетки")
+
+    xb = np.linspace(start, stop, backbone_n)
+    f0b, f1b = density(h0, xb), density(h1, xb)
+    f0k, f1k = density(h0, break_x), density(h1, break_x)
+    scale = max(f0b.max(), f1b.max(), f0k.max(initial=0), f1k.max(initial=0), 1e-300)
+
+    dx = np.diff(xb) / width
+    dy = np.maximum(np.abs(np.diff(f0b)), np.abs(np.diff(f1b))) / scale
+    weights = np.sqrt(dx ** 2 + dy ** 2)
+    curvature = np.maximum(np.abs(np.diff(f0b, 2)), np.abs(np.diff(f1b, 2))) / scale
+    weights[:-1] += 0.5 * curvature
+    weights[1:] += 0.5 * curvature
+
+    counts = _allocate(weights, refine_n)
+    cells = np.repeat(np.arange(counts.size), counts)
+    # Позиция внутри ячейки: (k+1)/(count+1), k — номер точки в своей ячейке
+    offsets = np.arange(cells.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    xr = xb[cells] + (offsets + 1) / (counts[cells] + 1) * (xb[cells + 1] - xb[cells])
+
+    x = np.concatenate([xb, xr, break_x])
+    h0_pdf = np.concatenate([f0b, density(h0, xr), f0k])
+    h1_pdf = np.concatenate([f1b, density(h1, xr), f1k])
+    order = np.argsort(x, kind='stable')
+    return x[order], h0_pdf[order], h1_pdf[order]
+
+
+def build_plot_data(h0, h1, compact: bool = False, points: int = PLOT_POINTS,
+                    grid: str = 'uniform', breakpoints=()) -> dict:
+    """Данные для графика плотностей по объединению диапазонов 0.1%–99.9% обеих гипотез.
+
+    grid='uniform' — равномерная сетка из points точек; grid='adaptive' — сетка adaptive_grid
+    с тем же бюджетом, расширенная так, чтобы в неё попали точки разрыва breakpoints.
+    Если хотя бы одна гипотеза дискретна, сетка — целые точки диапазона (не больше points), а для
+    дискретных распределений вместо плотности берётся pmf.
+    Полный формат — списки float (x, h0_pdf, h1_pdf). Компактный формат передаёт равномерную сетку
+    как (start, step, n), а неравномерную и плотности — base64 от Float32 (encoding "f32-b64");
+    его разворачивает static/js/calculator_chart.js.
+    """
+    start = float(min(h0.ppf(0.001), h1.ppf(0.001)))
+    stop = float(max(h0.ppf(0.999), h1.ppf(0.999)))
+
+    if is_discrete(h0) or is_discrete(h1):
+        grid = 'integer'
+        x = np.unique(np.round(np.linspace(np.floor(start), np.ceil(stop), points)))
+        h0_pdf = density(h0, x)
+        h1_pdf = density(h1, x)
+    elif grid == 'adaptive':
+        if breakpoints:
+            margin = 0.05 * (stop - start)
+            start = min(start, min(breakpoints) - margin)
+            stop = max(stop, max(breakpoints) + margin)
+        x, h0_pdf, h1_pdf = adaptive_grid(h0, h1, start, stop, points, breakpoints)
+    else:
+        x = np.linspace(start, stop, points)
+        h0_pdf = density(h0, x)
+        h1_pdf = density(h1, x)
     max_pdf = float(max(h0_pdf.max(), h1_pdf.max()))
 
-    return {
-        "threshold": round(c_threshold, 4),
-        "power": round(power, 4),
-        "gamma": round(gamma, 4),
-        "plot_data": {
-            "x": list(map(float, x)),
-            "h0_pdf": list(map(float, h0_pdf)),
-            "h1_pdf": list(map(float, h1_pdf)),
+    if compact:
+        payload = {
+            "encoding": "f32-b64",
+            "h0_pdf": _encode_f32(h0_pdf),
+            "h1_pdf": _encode_f32(h1_pdf),
             "max_pdf": max_pdf,
         }
+        if grid != 'uniform':
+            payload["x"] = _encode_f32(x)
+        else:
+            payload["grid"] = {"start": start, "step": (stop - start) / (points - 1), "n": points}
+        return payload
+    return {
+        "x": list(map(float, x)),
+        "h0_pdf": list(map(float, h0_pdf)),
+        "h1_pdf": list(map(float, h1_pdf)),
+        "max_pdf": max_pdf,
+    }
+
+
+def solve_neyman_pearson(data: dict, plot: str = 'full') -> dict:
+    """Основная логика критерия Неймана–Пирсона (упрощённый вариант).
+
+    Находит порог c такой, что P(X > c | H0) = alpha для одностороннего теста. Он совпадает с критерием
+    Неймана–Пирсона только при монотонном f1/f0; общий случай — solve_likelihood_ratio (likelihood_ratio.py).
+    Способ поиска порога выбирается по семейству H0 (см. find_threshold) и возвращается в ключе "method".
+    Возвращает словарь с порогом, мощностью и данными для визуализации: plot='full' — списки float,
+    'compact' — компактный формат build_plot_data, None — без данных графика.
+    """
+    alpha = data['alpha']
+    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+
+    c_threshold, method = find_threshold(data['h0_dist'], h0, alpha)
+
+    gamma = float(randomization(h0, c_threshold, alpha))  # ненулевой только для дискретного H0
+    power = randomized_power(h1, c_threshold, gamma)
+
+    results = {
+        "threshold": round(float(c_threshold), 4),
+        "power": round(float(power), 4),
+        "gamma": round(gamma, 4),
+        "method": method,
+    }
+    if plot:
+        results["plot_data"] = build_plot_data(h0, h1, compact=(plot == 'compact'))
+    return results
+
+
+def solve_plot_data(data: dict, points: int = PLOT_POINTS, grid: str = 'uniform') -> dict:
+    """Только данные графика в компактном формате (для ленивой загрузки графика)."""
+    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    breakpoints = (
+        distribution_breakpoints(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+        + distribution_breakpoints(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    )
+    return build_plot_data(h0, h1, compact=True, points=points, grid=grid, breakpoints=breakpoints)
+
+
+ROC_POINTS = 256
+
+
+def roc_alpha_grid(points: int = ROC_POINTS) -> np.ndarray:
+    """Сетка alpha для ROC-кривой: логарифмическая в области малых alpha, затем равномерная, плюс концы 0 и 1."""
+    n_log = points // 4
+    n_lin = points - n_log - 2
+    return np.concatenate([
+        [0.0],
+        np.logspace(-4, -1, n_log, endpoint=False),
+        np.linspace(0.1, 1.0, n_lin, endpoint=False),
+        [1.0],
+    ])
+
+
+def solve_roc(data: dict, points: int = ROC_POINTS) -> dict:
+    """ROC-кривая (мощность как функция alpha) одним векторизованным проходом по сетке alpha.
+
+    Пороги для всех alpha считаются одним вызовом isf (или векторизованной бисекцией),
+    мощности — одним вызовом h1.sf. Концы alpha=0 и alpha=1 соответствуют порогам на границах
+    носителя H0. Для дискретного H0 учитывается рандомизация, и кривая линейна между достижимыми
+    уровнями. Возвращает компактный формат (base64 Float32) и площадь под кривой (AUC).
+    """
+    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    alphas = roc_alpha_grid(points)
+
+    thresholds = np.empty_like(alphas)
+    lower, upper = distribution_support(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    # Для дискретного H0 при alpha = 1 отвергать нужно и в самой левой точке носителя
+    thresholds[0], thresholds[-1] = upper, lower - 1 if is_discrete(h0) else lower
+    inner = alphas[1:-1]
+    method = threshold_method_for(data['h0_dist'])
+    if method == 'isf':
+        thresholds[1:-1] = _threshold_isf(h0, inner)
+    else:
+        thresholds[1:-1] = _vectorized_threshold_search(h0, inner)
+    power = randomized_power(h1, thresholds, randomization(h0, thresholds, alphas))
+
+    return {
+        "encoding": "f32-b64",
+        "points": int(alphas.size),
+        "alpha": _encode_f32(alphas),
+        "power": _encode_f32(power),
+        # Формула трапеций напрямую: np.trapz устарел в NumPy 2.0, а np.trapezoid нет в 1.x
+        "auc": float(np.sum(np.diff(alphas) * (power[1:] + power[:-1]) / 2)),
+        "method": method,
     }
+
+
+BATCH_FIELDS = ('alpha', 'h0_dist', 'h0_param1', 'h0_param2', 'h1_dist', 'h1_param1', 'h1_param2')
+
+
+def _broadcast_column(values, size, dtype):
+    column = np.asarray(values, dtype=dtype)
+    if column.ndim == 0:
+        return np.full(size, column.item(), dtype=dtype)
+    if column.ndim != 1 or column.shape[0] != size:
+        raise ValueError(f"Ожидался массив длины {size}, получено {column.shape}")
+    return column
+
+
+def _vectorized_threshold_search(h0, alphas, max_iter=200, xtol=1e-12):
+    """Векторизованная бисекция по всем строкам сразу: ищет c с h0.sf(c) = alpha.
+
+    Используется для семейств без явной isf. Начальный интервал берётся как в скалярном
+    решателе (ppf(0.001)…ppf(0.999)) и расширяется, пока не накроет корень.
+    """
+    lo = np.asarray(h0.ppf(0.001), dtype=float) * np.ones_like(alphas)
+    hi = np.asarray(h0.ppf(0.999), dtype=float) * np.ones_like(alphas)
+    width = np.maximum(hi - lo, 1.0)
+    for _ in range(60):
+        f_lo = h0.sf(lo) - alphas
+        f_hi = h0.sf(hi) - alphas
+        # sf убывает: слева значение должно быть >= 0, справа <= 0
+        bad_lo = f_lo < 0
+        bad_hi = f_hi > 0
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        lo = np.where(bad_lo, lo - width, lo)
+        hi = np.where(bad_hi, hi + width, hi)
+        width = width * 2
+    else:
+        raise ValueError(THRESHOLD_ERROR)
+
+    for _ in range(max_iter):
+        mid = 0.5 * (lo + hi)
+        above = h0.sf(mid) > alphas
+        lo = np.where(above, mid, lo)
+        hi = np.where(above, hi, mid)
+        if np.all(hi - lo <= xtol * np.maximum(np.abs(mid), np.finfo(float).tiny)):
+            break
+    return 0.5 * (lo + hi)
+
+
+def solve_neyman_pearson_batch(alpha, h0_dist, h0_param1, h0_param2, h1_dist, h1_param1, h1_param2) -> dict:
+    """Пакетный вариант solve_neyman_pearson для параметрических прогонов.
+
+    Каждый аргумент — скаляр или одномерный массив; скаляры растягиваются на длину самого
+    длинного массива. Строки группируются по семейству распределения, внутри группы порог
+    считается одним векторизованным вызовом isf (или векторизованной бисекцией для семейств
+    без явной isf), мощность — одним вызовом sf.
+
+    Возвращает словарь с массивами NumPy "threshold", "power" и "gamma" (рандомизация для дискретных H0)
+    без округления.
+    """
+    columns = (alpha, h0_dist, h0_param1, h0_param2, h1_dist, h1_param1, h1_param2)
+    size = max(np.size(c) for c in columns)
+    if size == 0:
+        return {"threshold": np.empty(0), "power": np.empty(0), "gamma": np.empty(0)}
+
+    alphas = _broadcast_column(alpha, size, float)
+    h0_names = _broadcast_column(h0_dist, size, object)
+    h1_names = _broadcast_column(h1_dist, size, object)
+    h0_p1 = _broadcast_column(h0_param1, size, float)
+    h0_p2 = _broadcast_column(h0_param2, size, float)
+    h1_p1 = _broadcast_column(h1_param1, size, float)
+    h1_p2 = _broadcast_column(h1_param2, size, float)
+
+    bad = np.flatnonzero(~((alphas > 0) & (alphas < 1)))
+    if bad.size:
+        raise ValueError(f"Строка {bad[0]}: alpha должен лежать в интервале (0, 1)")
+    # Параметры проверяются по описанию семейства; в ошибке — первая недопустимая строка
+    errors = []
+    for names, p1, p2 in ((h0_names, h0_p1, h0_p2), (h1_names, h1_p1, h1_p2)):
+        for name in np.unique(names):
+            rows = np.flatnonzero(names == name)
+            errors.extend((rows[row], message) for _, row, message in get_family(name).validate(p1[rows], p2[rows]))
+    if errors:
+        row, message = min(errors)
+        raise ValueError(f"Строка {row}: {message}")
+
+    thresholds = np.empty(size)
+    gammas = np.zeros(size)
+    for name in np.unique(h0_names):
+        rows = np.flatnonzero(h0_names == name)
+        h0 = get_distribution(name, h0_p1[rows], h0_p2[rows])
+        if threshold_method_for(name) == 'isf':
+            thresholds[rows] = _threshold_isf(h0, alphas[rows])
+        else:
+            thresholds[rows] = _vectorized_threshold_search(h0, alphas[rows])
+        gammas[rows] = randomization(h0, thresholds[rows], alphas[rows])
+
+    powers = np.empty(size)
+    for name in np.unique(h1_names):
+        rows = np.flatnonzero(h1_names == name)
+        h1 = get_distribution(name, h1_p1[rows], h1_p2[rows])
+        powers[rows] = randomized_power(h1, thresholds[rows], gammas[rows])
+
+    return {"threshold": thresholds, "power": powers, "gamma": gammas}
@@ -0,0 +1,48 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к атрибуту.
+
+    Сервисы калькулятора обращаются к SciPy через stats/special/optimize отсюда, поэтому загрузка
+    URL-конфигурации и manage.py-команды не тянут SciPy (~0.5 с и десятки МБ на процесс).
+    Найденный атрибут запоминается на самом объекте: повторные обращения — обычный поиск атрибута.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'загружен' if self.loaded else 'не загружен'
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+_lock = threading.RLock()
+
+stats = LazyModule('scipy.stats')
+special = LazyModule('scipy.special')
+optimize = LazyModule('scipy.optimize')
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .likelihood_ratio import solve_likelihood_ratio
+from .neyman_pearson_solver import solve_neyman_pearson, solve_plot_data, solve_roc
+from .sample_size import solve_sample_size
+
+# Меняется при изменении формата результата, чтобы не читать устаревшие записи из общего кэша
+RESULT_CACHE_VERSION = 2
+
+
+def _canonical_value(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        value = float(value)
+        return 0.0 if value == 0 else value  # -0.0 и 0.0 дают один ключ
+    return str(value)
+
+
+def make_cache_key(data: dict, namespace: str = 'np') -> str:
+    """Ключ кэша по нормализованным входным данным (cleaned_data формы).
+
+    Порядок полей и представление чисел (1 / 1.0 / -0.0) на ключ не влияют.
+    """
+    canonical = {name: _canonical_value(value) for name, value in data.items()}
+    raw = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+    return f"{namespace}:v{RESULT_CACHE_VERSION}:{digest}"
+
+
+class ResultCache:
+    """Двухуровневый кэш результатов: LRU в памяти процесса + необязательный общий кэш Django.
+
+    Локальный уровень ограничен max_entries и ttl (секунды). Общий уровень — алиас из settings.CACHES
+    (например Redis), записи в нём живут те же ttl секунд. Возвращаемые значения нельзя изменять:
+    локальный уровень отдаёт один и тот же объект всем вызывающим.
+    """
+
+    def __init__(self, max_entries=256, ttl=600, shared_alias=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store_local(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, timeout=self.ttl)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def _store_local(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(name: str) -> ResultCache:
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                config = settings.CALCULATOR_RESULT_CACHE
+                cache = _caches[name] = ResultCache(
+                    max_entries=config['MAX_ENTRIES'],
+                    ttl=config['TTL'],
+                    shared_alias=config['SHARED_ALIAS'],
+                )
+    return cache
+
+
+def get_result_cache() -> ResultCache:
+    """Кэш результатов процесса, настроенный из settings.CALCULATOR_RESULT_CACHE."""
+    return _get_cache('results')
+
+
+def get_partial_cache() -> ResultCache:
+    """Кэш отрендеренных partial-шаблонов результатов (байты), с теми же настройками."""
+    return _get_cache('partials')
+
+
+@receiver(setting_changed)
+def _reset_result_cache(*, setting, **kwargs):
+    if setting == 'CALCULATOR_RESULT_CACHE':
+        with _caches_lock:
+            _caches.clear()
+
+
+def cached_solve_neyman_pearson(data: dict) -> dict:
+    """solve_neyman_pearson (или solve_likelihood_ratio при test_mode='lr') с кэшированием
+    по нормализованным входным данным.
+
+    Данные графика не включаются: их отдаёт отдельный эндпоинт (см. cached_plot_data).
+    Ошибки решателя не кэшируются и пробрасываются как есть.
+    """
+    cache = get_result_cache()
+    if data.get('test_mode') == 'lr':
+        return cache.get_or_compute(make_cache_key(data), lambda: solve_likelihood_ratio(data))
+    return cache.get_or_compute(make_cache_key(data), lambda: solve_neyman_pearson(data, plot=None))
+
+
+def plot_cache_key(data: dict) -> str:
+    """Ключ данных графика: alpha и тип критерия на график не влияют и в ключ не входят,
+    а тип сетки и бюджет точек из settings.CALCULATOR_PLOT — входят."""
+    config = settings.CALCULATOR_PLOT
+    plot_input = {name: value for name, value in data.items() if name not in ('alpha', 'test_mode')}
+    plot_input.update(_grid=config['GRID'], _points=config['POINTS'])
+    return make_cache_key(plot_input, namespace='np-plot')
+
+
+def cached_plot_data(data: dict) -> dict:
+    """Компактные данные графика с кэшированием по plot_cache_key."""
+    config = settings.CALCULATOR_PLOT
+    cache = get_result_cache()
+    return cache.get_or_compute(
+        plot_cache_key(data),
+        lambda: solve_plot_data(data, points=config['POINTS'], grid=config['GRID']),
+    )
+
+
+def roc_cache_key(data: dict) -> str:
+    return make_cache_key(data, namespace='np-roc')
+
+
+def cached_roc(data: dict) -> dict:
+    """ROC-кривая (solve_roc) с кэшированием по паре гипотез."""
+    cache = get_result_cache()
+    return cache.get_or_compute(roc_cache_key(data), lambda: solve_roc(data))
+
+
+def cached_sample_size(data: dict) -> dict:
+    """solve_sample_size с кэшированием; граница поиска берётся из settings.CALCULATOR_SAMPLE_SIZE_MAX_N."""
+    max_n = settings.CALCULATOR_SAMPLE_SIZE_MAX_N
+    cache = get_result_cache()
+    return cache.get_or_compute(
+        make_cache_key(dict(data, _max_n=max_n), namespace='np-n'),
+        lambda: solve_sample_size(data, max_n),
+    )
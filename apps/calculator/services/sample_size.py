@@ -0,0 +1,95 @@
+import numpy as np
+
+from .distributions import get_distribution, point_mass
+from .neyman_pearson_solver import randomization, randomized_power
+from .numeric import stats
+
+# Достаточные статистики выборки из n наблюдений и их точные распределения.
+# Для равномерного семейства верхний хвост проверяется по максимуму, нижний — по минимуму.
+SUFFICIENT_STATISTICS = {
+    'norm': ('среднее', lambda loc, scale, n, upper: stats.norm(loc=loc, scale=scale / np.sqrt(n))),
+    'expon': ('сумма', lambda loc, scale, n, upper: stats.gamma(n, loc=n * loc, scale=scale)),
+    'uniform': (
+        'максимум/минимум',
+        lambda loc, scale, n, upper: stats.beta(n, 1, loc=loc, scale=scale) if upper
+        else stats.beta(1, n, loc=loc, scale=scale),
+    ),
+    'gamma': ('сумма', lambda a, scale, n, upper: stats.gamma(n * a, scale=scale)),
+    'chi2': ('сумма', lambda df, scale, n, upper: stats.chi2(n * df, scale=scale)),
+    'poisson': ('сумма', lambda mu, loc, n, upper: stats.poisson(n * mu, loc=n * loc)),
+    'binom': ('сумма', lambda trials, p, n, upper: stats.binom(int(n * trials), p)),
+}
+
+
+def statistic_distribution(dist_name: str, param1: float, param2: float, n: int, upper: bool = True):
+    """Распределение достаточной статистики выборки объёма n (см. SUFFICIENT_STATISTICS)."""
+    get_distribution(dist_name, param1, param2)  # та же проверка параметров, что и для одного наблюдения
+    if dist_name not in SUFFICIENT_STATISTICS:
+        raise ValueError(f"Для распределения {dist_name} не задана достаточная статистика")
+    return SUFFICIENT_STATISTICS[dist_name][1](param1, param2, n, upper)
+
+
+def power_at(data: dict, n: int, upper: bool) -> tuple:
+    """Порог и мощность одностороннего критерия по достаточной статистике для объёма выборки n.
+
+    Для дискретных статистик критерий рандомизирован в точке порога, и размер равен alpha точно.
+    """
+    alpha = data['alpha']
+    t0 = statistic_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'], n, upper)
+    t1 = statistic_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'], n, upper)
+    if upper:
+        threshold = float(t0.isf(alpha))
+        return threshold, float(randomized_power(t1, threshold, randomization(t0, threshold, alpha)))
+    # Нижний хвост: отвергаем при T < c и с вероятностью gamma при T = c
+    threshold = float(t0.ppf(alpha))
+    mass = point_mass(t0, threshold)
+    gamma = np.clip((alpha - t0.cdf(threshold) + mass) / mass, 0.0, 1.0) if mass > 0 else 0.0
+    return threshold, float(t1.cdf(threshold) - point_mass(t1, threshold) + gamma * point_mass(t1, threshold))
+
+
+def solve_sample_size(data: dict, max_n: int) -> dict:
+    """Минимальный объём выборки n, при котором мощность критерия достигает data['target_power'].
+
+    H0 и H1 — одно семейство; критерий отвергает H0 в хвосте достаточной статистики, направленном
+    в сторону H1 (по сравнению средних). Поиск — удвоение n до первого n с достаточной мощностью,
+    затем бисекция между n/2 и n: O(log n) вычислений мощности. Если и при max_n мощность не
+    достигнута, выбрасывается ValueError.
+    """
+    if data['h0_dist'] != data['h1_dist']:
+        raise ValueError("Для расчёта объёма выборки H₀ и H₁ должны быть из одного семейства")
+    h0 = get_distribution(data['h0_dist'], data['h0_param1'], data['h0_param2'])
+    h1 = get_distribution(data['h1_dist'], data['h1_param1'], data['h1_param2'])
+    upper = h1.mean() >= h0.mean()
+    target = data['target_power']
+    evaluations = 0
+
+    def evaluate(n):
+        nonlocal evaluations
+        evaluations += 1
+        return power_at(data, n, upper)
+
+    lo, n = 0, 1
+    threshold, power = evaluate(n)
+    while power < target:
+        if n >= max_n:
+            raise ValueError(f"Мощность {target} недостижима при n ≤ {max_n} (при n = {n}: {power:.4f})")
+        lo, n = n, min(2 * n, max_n)
+        threshold, power = evaluate(n)
+
+    # Инвариант: мощность при lo < target, при n >= target
+    while n - lo > 1:
+        mid = (lo + n) // 2
+        mid_threshold, mid_power = evaluate(mid)
+        if mid_power >= target:
+            n, threshold, power = mid, mid_threshold, mid_power
+        else:
+            lo = mid
+
+    return {
+        "n": n,
+        "threshold": round(threshold, 4),
+        "power": round(power, 4),
+        "statistic": SUFFICIENT_STATISTICS[data['h0_dist']][0],
+        "tail": 'upper' if upper else 'lower',
+        "evaluations": evaluations,
+    }
@@ -0,0 +1,68 @@
+import logging
+import time
+
+from django.conf import settings
+
+from .distributions import DISTRIBUTIONS
+from .likelihood_ratio import solve_likelihood_ratio
+from .neyman_pearson_solver import BATCH_FIELDS, solve_neyman_pearson, solve_neyman_pearson_batch, solve_plot_data
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ALPHA = 0.05
+
+
+def warmup_data(family) -> dict:
+    """Представительная задача для семейства: H0 — family.example, H1 — то же семейство с param1 + 1."""
+    param1, param2 = family.example
+    return {
+        'alpha': WARMUP_ALPHA,
+        'h0_dist': family.name, 'h0_param1': param1, 'h0_param2': param2,
+        'h1_dist': family.name, 'h1_param1': param1 + 1, 'h1_param2': param2,
+    }
+
+
+def warm_up() -> dict:
+    """Прогрев решателя: по одной задаче каждого зарегистрированного семейства через все ядра.
+
+    Первый вызов ppf/isf/pdf семейства SciPy строит внутренние таблицы и docstring-и, а объекты
+    распределений попадают в кэш get_distribution. Если прогрев выполнен в мастер-процессе
+    (gunicorn --preload), воркеры получают всё это после fork без повторной работы (copy-on-write).
+    Ошибка отдельного семейства записывается в лог и не прерывает прогрев. Возвращает время (с) по семействам.
+    """
+    config = settings.CALCULATOR_PLOT
+    timings = {}
+    started = time.perf_counter()
+    for family in DISTRIBUTIONS.values():
+        family_started = time.perf_counter()
+        data = warmup_data(family)
+        try:
+            solve_neyman_pearson(data, plot=None)
+            solve_plot_data(data, points=config['POINTS'], grid=config['GRID'])
+            solve_likelihood_ratio(data)
+        except Exception:
+            logger.exception("Прогрев семейства %s завершился ошибкой", family.name)
+            continue
+        timings[family.name] = time.perf_counter() - family_started
+        logger.debug("Прогрев %s: %.1f мс", family.name, timings[family.name] * 1000)
+
+    # Векторизованный пакетный путь: по строке на семейство
+    rows = [warmup_data(family) for family in DISTRIBUTIONS.values()]
+    batch_started = time.perf_counter()
+    try:
+        solve_neyman_pearson_batch(*([row[field] for row in rows] for field in BATCH_FIELDS))
+        timings['batch'] = time.perf_counter() - batch_started
+    except Exception:
+        logger.exception("Прогрев пакетного расчёта завершился ошибкой")
+
+    logger.info("Прогрев калькулятора: %d семейств за %.0f мс", len(DISTRIBUTIONS), (time.perf_counter() - started) * 1000)
+    return timings
+
+
+def warm_up_web_process() -> None:
+    """Прогрев при загрузке WSGI-приложения (core/wsgi.py), если включён CALCULATOR_WARMUP.
+
+    Воркер Celery и manage.py-команды wsgi.py не импортируют и SciPy ради прогрева не загружают.
+    """
+    if settings.CALCULATOR_WARMUP:
+        warm_up()
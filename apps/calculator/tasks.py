@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .services.jobs import execute_job
+
+
+@shared_task
+def run_calculation_job(job_id: str) -> None:
+    """Выполняет CalculationJob; результат и статус сохраняются в самой модели."""
+    execute_job(job_id)
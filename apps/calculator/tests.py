@@ -1,7 +1,31 @@
+import io
+import json
+import numpy as np
 import pytest
+from scipy import stats
+from django.test import Client
 from django.urls import reverse
 from apps.users.models import User
-from .services.neyman_pearson_solver import solve_neyman_pearson
+from .services.neyman_pearson_solver import (
+    adaptive_grid,
+    solve_roc,
+    build_plot_data,
+    distribution_breakpoints,
+    get_distribution,
+    solve_neyman_pearson,
+    solve_neyman_pearson_batch,
+    find_threshold,
+    THRESHOLD_STRATEGIES,
+    _vectorized_threshold_search,
+)
+from .services import result_cache
+from .forms import CalculatorForm
+from .services.distributions import DISTRIBUTIONS, get_family
+from .services.likelihood_ratio import solve_likelihood_ratio
+from .services.monte_carlo import run_monte_carlo, chunk_sizes, wilson_interval
+from .services.sample_size import solve_sample_size, power_at
+from .services.result_cache import ResultCache, make_cache_key, cached_solve_neyman_pearson
+from .services import warmup
 
 def test_solver_simple_normal_case():
     """
@@ -67,7 +91,7 @@ def test_calculate_view_returns_chart(client):
     assert resp.status_code == 200
     content = resp.content.decode('utf-8')
     assert 'distributionsChart' in content
-    assert 'plot-data' in content  # id json_script
+    assert 'data-plot-url' in content  # данные графика загружаются отдельным запросом
     # Проверим что присутствует ключ threshold в видимом HTML
     assert 'Порог (C):' in content
 
@@ -130,4 +154,766 @@ def test_history_page_loads_for_logged_in_user(client):
     url = reverse('calculator:history')
     response = client.get(url)
     # Теперь ожидаем код 200
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+def test_batch_solver_matches_scalar_solver():
+    """Пакетный решатель должен совпадать со скалярным построчно, включая смешанные семейства."""
+    rows = [
+        {'alpha': 0.05, 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+         'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1},
+        {'alpha': 0.1, 'h0_dist': 'expon', 'h0_param1': 0, 'h0_param2': 2,
+         'h1_dist': 'uniform', 'h1_param1': 0, 'h1_param2': 10},
+        {'alpha': 0.2, 'h0_dist': 'uniform', 'h0_param1': -1, 'h0_param2': 2,
+         'h1_dist': 'norm', 'h1_param1': 0.5, 'h1_param2': 0.5},
+    ]
+    batch = solve_neyman_pearson_batch(*([row[k] for row in rows] for k in rows[0]))
+    for i, row in enumerate(rows):
+        single = solve_neyman_pearson(row)
+        assert batch['threshold'][i] == pytest.approx(single['threshold'], abs=1e-4)
+        assert batch['power'][i] == pytest.approx(single['power'], abs=1e-4)
+
+
+def test_batch_solver_broadcasts_scalars_and_validates_rows():
+    """Скаляры растягиваются на длину массивов; некорректная строка даёт ValueError с её номером."""
+    alphas = np.linspace(0.01, 0.5, 1000)
+    result = solve_neyman_pearson_batch(alphas, 'norm', 0, 1, 'norm', 1, 1)
+    assert result['threshold'].shape == (1000,)
+    assert np.allclose(result['threshold'], stats.norm.isf(alphas))
+
+    with pytest.raises(ValueError, match='Строка 1'):
+        solve_neyman_pearson_batch([0.05, 0.05], 'norm', 0, [1, -1], 'norm', 1, 1)
+
+
+def test_vectorized_threshold_search_matches_isf():
+    """Резервная векторизованная бисекция должна давать тот же порог, что и явная isf."""
+    alphas = np.array([1e-4, 0.05, 0.5, 0.95])
+    h0 = stats.norm(loc=np.array([0.0, 3.0, -2.0, 10.0]), scale=np.array([1.0, 0.1, 5.0, 2.0]))
+    assert np.allclose(_vectorized_threshold_search(h0, alphas), h0.isf(alphas), atol=1e-8)
+
+
+@pytest.mark.django_db
+def test_calculate_batch_view_returns_arrays(client):
+    """JSON-эндпоинт принимает колонки и возвращает массивы порогов и мощностей."""
+    url = reverse('calculator:calculate_batch')
+    payload = {
+        'alpha': [0.05, 0.1], 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    }
+    resp = client.post(url, data=json.dumps(payload), content_type='application/json')
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['success'] is True
+    assert data['count'] == 2
+    assert data['threshold'][0] == pytest.approx(1.645, abs=0.01)
+
+    del payload['h1_dist']
+    resp = client.post(url, data=json.dumps(payload), content_type='application/json')
+    assert resp.status_code == 400
+    assert 'h1_dist' in resp.json()['error']
+
+
+@pytest.mark.django_db
+def test_calculate_batch_view_requires_csrf_token():
+    """Запрос с чужого сайта без CSRF-токена отклоняется, скрипт с токеном из cookie проходит."""
+    client = Client(enforce_csrf_checks=True)
+    url = reverse('calculator:calculate_batch')
+    payload = json.dumps({
+        'alpha': 0.05, 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    })
+    assert client.post(url, data=payload, content_type='application/json').status_code == 403
+
+    client.get(reverse('calculator:page'))
+    token = client.cookies['csrftoken'].value
+    resp = client.post(url, data=payload, content_type='application/json', HTTP_X_CSRFTOKEN=token)
+    assert resp.status_code == 200
+
+
+@pytest.mark.parametrize('dist_name, param1, param2', [('norm', 0, 1), ('uniform', -2, 4), ('expon', 1, 0.5)])
+def test_find_threshold_uses_isf_for_closed_form_families(dist_name, param1, param2):
+    """Для norm/uniform/expon порог берётся из isf, а brentq-стратегия даёт тот же ответ."""
+    h0 = get_distribution(dist_name, param1, param2)
+    c, method = find_threshold(dist_name, h0, 0.05)
+    assert method == 'isf'
+    assert c == pytest.approx(THRESHOLD_STRATEGIES['brentq'](h0, 0.05), abs=1e-8)
+
+
+@pytest.mark.parametrize('dist_name, param1, param2', [
+    ('t', 1, 0), ('t', 5, 2), ('gamma', 0.1, 1), ('gamma', 3, 2), ('beta', 0.5, 0.5), ('chi2', 1, 1),
+])
+@pytest.mark.parametrize('alpha', [1e-6, 0.05, 0.9])
+def test_numeric_threshold_for_families_with_iterative_isf(dist_name, param1, param2, alpha):
+    """t, gamma, beta и chi2 идут через brentq (и векторную бисекцию в пакете) и совпадают с isf SciPy."""
+    from .services.neyman_pearson_solver import _vectorized_threshold_search
+    h0 = get_distribution(dist_name, param1, param2)
+    c, method = find_threshold(dist_name, h0, alpha)
+    assert method == 'brentq'
+    assert c == pytest.approx(h0.isf(alpha), rel=1e-9)
+    batch = _vectorized_threshold_search(h0, np.array([alpha]))
+    assert batch[0] == pytest.approx(c, rel=1e-9)
+
+
+def test_solver_handles_extreme_alpha():
+    """alpha вне [0.001, 0.999] раньше ломал брекетинг brentq; через isf он решается."""
+    data = {
+        'alpha': 1e-6,
+        'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 5, 'h1_param2': 1,
+    }
+    result = solve_neyman_pearson(data)
+    assert result['method'] == 'isf'
+    assert result['threshold'] == pytest.approx(4.7534, abs=1e-3)
+
+    with pytest.raises(ValueError, match='порог'):
+        solve_neyman_pearson(dict(data, alpha=0.0))
+
+
+def test_cache_key_is_canonical():
+    """Порядок полей и запись чисел (0 / 0.0 / -0.0, 1 / 1.0) не меняют ключ."""
+    a = {'alpha': 0.05, 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1}
+    b = {'h0_param2': 1.0, 'h0_param1': -0.0, 'h0_dist': 'norm', 'alpha': 0.05}
+    assert make_cache_key(a) == make_cache_key(b)
+    assert make_cache_key(a) != make_cache_key(dict(a, alpha=0.1))
+
+
+def test_result_cache_lru_ttl_and_counters(monkeypatch):
+    """LRU вытесняет самую старую запись, TTL истекает, счётчики попаданий/промахов ведутся."""
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    cache = ResultCache(max_entries=2, ttl=10)
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # вытесняет 'b' — к 'a' обращались позже
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.stats() == {'size': 1, 'max_entries': 2, 'hits': 2, 'shared_hits': 0, 'misses': 2}
+
+
+def test_result_cache_shared_tier():
+    """Запись из общего уровня (locmem-алиас вместо Redis) подхватывается другим процессом/экземпляром."""
+    writer = ResultCache(max_entries=4, ttl=60, shared_alias='default')
+    reader = ResultCache(max_entries=4, ttl=60, shared_alias='default')
+    writer.set('np:test-shared', {'threshold': 1.0})
+    assert reader.get('np:test-shared') == {'threshold': 1.0}
+    assert reader.get('np:test-shared') == {'threshold': 1.0}
+    assert reader.stats()['shared_hits'] == 1
+    assert reader.stats()['hits'] == 1
+
+
+def test_cached_solver_computes_once(settings, monkeypatch):
+    """Повторный расчёт с теми же входными данными берётся из кэша."""
+    settings.CALCULATOR_RESULT_CACHE = {'MAX_ENTRIES': 8, 'TTL': 60, 'SHARED_ALIAS': None}
+    calls = []
+    monkeypatch.setattr(result_cache, 'solve_neyman_pearson', lambda data, **kwargs: calls.append(data) or {'threshold': 1.0})
+    data = {'alpha': 0.05, 'h0_dist': 'norm', 'h0_param1': 0.0, 'h0_param2': 1.0,
+            'h1_dist': 'norm', 'h1_param1': 1.0, 'h1_param2': 1.0}
+    cached_solve_neyman_pearson(data)
+    cached_solve_neyman_pearson(dict(data))
+    assert len(calls) == 1
+    assert result_cache.get_result_cache().stats()['hits'] == 1
+
+
+@pytest.mark.django_db
+def test_calculate_view_etag_and_partial_cache(client, monkeypatch):
+    """Повторный расчёт отдаёт готовый HTML или 304, но история всё равно пишется."""
+    from . import views
+    from .models import CalculationHistory
+
+    user = User.objects.create_user(username='etaguser', password='password123')
+    client.force_login(user)
+    url = reverse('calculator:calculate')
+    payload = {
+        'alpha': 0.07,
+        'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 2, 'h1_param2': 1,
+    }
+    first = client.post(url, data=payload)
+    assert first.status_code == 200
+    etag = first['ETag']
+
+    rendered = []
+    monkeypatch.setattr(views, 'render_to_string', lambda *a, **kw: rendered.append(a) or '')
+    second = client.post(url, data=payload)
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert rendered == []
+
+    third = client.post(url, data=payload, HTTP_IF_NONE_MATCH=etag)
+    assert third.status_code == 304
+    assert third['ETag'] == etag
+    assert CalculationHistory.objects.filter(user=user).count() == 3
+
+    # Новая версия шаблона: старый HTML из кэша и старый ETag не подходят
+    monkeypatch.setattr(views, 'RESULTS_PARTIAL_VERSION', views.RESULTS_PARTIAL_VERSION + 1)
+    fourth = client.post(url, data=payload, HTTP_IF_NONE_MATCH=etag)
+    assert fourth.status_code == 200
+    assert fourth['ETag'] != etag
+    assert len(rendered) == 1
+
+
+def test_compact_plot_data_roundtrip():
+    """Компактный формат: сетка (start, step, n) и Float32 в base64 совпадают с полным форматом."""
+    import base64
+    h0 = get_distribution('norm', 0, 1)
+    h1 = get_distribution('expon', 0, 2)
+    full = build_plot_data(h0, h1)
+    compact = build_plot_data(h0, h1, compact=True)
+    grid = compact['grid']
+    x = grid['start'] + grid['step'] * np.arange(grid['n'])
+    h1_pdf = np.frombuffer(base64.b64decode(compact['h1_pdf']), dtype='<f4')
+    assert np.allclose(x, full['x'])
+    assert np.allclose(h1_pdf, full['h1_pdf'], rtol=1e-6)
+    assert compact['max_pdf'] == full['max_pdf']
+
+
+@pytest.mark.django_db
+def test_plot_etag_ignores_alpha_and_follows_grid_settings(client, settings):
+    """ETag графика — по тем же данным, что ключ кэша графика: alpha не важна, настройки сетки важны."""
+    params = {
+        'alpha': 0.05,
+        'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    }
+    url = reverse('calculator:plot')
+    etag = client.get(url, data=params)['ETag']
+    assert client.get(url, data=dict(params, alpha=0.1), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    settings.CALCULATOR_PLOT = dict(settings.CALCULATOR_PLOT, POINTS=settings.CALCULATOR_PLOT['POINTS'] + 50)
+    assert client.get(url, data=params, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_plot_endpoint_is_compact_and_conditional(client):
+    """Ленивый эндпоинт графика в разы меньше полного JSON и поддерживает If-None-Match."""
+    params = {
+        'alpha': 0.05,
+        'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    }
+    resp = client.get(reverse('calculator:plot'), data=params)
+    assert resp.status_code == 200
+    assert resp.json()['encoding'] == 'f32-b64'
+    full_size = len(json.dumps(solve_neyman_pearson(params)['plot_data']))
+    assert len(resp.content) * 4 < full_size
+
+    again = client.get(reverse('calculator:plot'), data=params, HTTP_IF_NONE_MATCH=resp['ETag'])
+    assert again.status_code == 304
+
+    bad = client.get(reverse('calculator:plot'), data=dict(params, h0_param2=-1))
+    assert bad.status_code == 400
+
+
+def test_adaptive_grid_respects_budget_and_breakpoints():
+    """Адаптивная сетка укладывается в бюджет, отсортирована и содержит края равномерного распределения."""
+    h0 = get_distribution('uniform', 0, 1)
+    h1 = get_distribution('norm', 0.5, 0.2)
+    breakpoints = distribution_breakpoints('uniform', 0, 1) + distribution_breakpoints('norm', 0.5, 0.2)
+    assert breakpoints == (0.0, 1.0)
+
+    plot = build_plot_data(h0, h1, points=120, grid='adaptive', breakpoints=breakpoints)
+    x = np.array(plot['x'])
+    assert x.size == 120
+    assert np.all(np.diff(x) >= 0)
+    assert {0.0, 1.0} <= set(plot['x'])
+    # Скачок плотности на краю виден на графике: слева от 0 плотность H0 нулевая, в точке 0 — единица
+    left = np.searchsorted(x, 0.0) - 1
+    assert plot['h0_pdf'][left] == 0.0 and plot['h0_pdf'][left + 1] == 1.0
+
+
+def test_adaptive_grid_concentrates_points_on_narrow_peak():
+    """Точки сгущаются у узкого пика H1, а не распределяются равномерно по хвостам."""
+    h0 = get_distribution('norm', 0, 5)
+    h1 = get_distribution('norm', 0, 0.1)
+    x, _, _ = adaptive_grid(h0, h1, -15.0, 15.0, 200)
+    near_peak = np.count_nonzero(np.abs(x) < 0.5)
+    assert near_peak > 200 * (1.0 / 30.0) * 3
+
+
+@pytest.mark.django_db
+def test_job_submit_and_status_json(client):
+    """Задача ставится в очередь (в тестах Celery работает в eager-режиме), статус и результат доступны по id."""
+    url = reverse('calculator:job_submit', args=['batch'])
+    payload = {
+        'alpha': [0.05, 0.1], 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    }
+    anonymous = client.post(url, data=json.dumps(payload), content_type='application/json')
+    assert anonymous.status_code == 403  # пакетные задачи ставят только авторизованные пользователи
+    client.force_login(User.objects.create_user(username='jobs', email='jobs@example.com', password='password123'))
+
+    resp = client.post(url, data=json.dumps(payload), content_type='application/json')
+    assert resp.status_code == 202
+    job_id = resp.json()['job_id']
+
+    status = client.get(reverse('calculator:job_status', args=[job_id])).json()
+    assert status['status'] == 'success'
+    assert status['result']['count'] == 2
+    assert status['result']['threshold'][0] == pytest.approx(1.645, abs=0.01)
+
+    bad = client.post(url, data=json.dumps({'alpha': 0.05}), content_type='application/json')
+    assert bad.status_code == 400
+
+
+@pytest.mark.django_db
+def test_job_failure_and_htmx_partial(client, monkeypatch):
+    """Ошибка внутри задачи сохраняется в статусе; htmx получает partial с событием завершения."""
+    from .services import jobs
+
+    monkeypatch.setitem(jobs.JOB_KINDS, 'boom', jobs.JobKind(
+        name='boom', label='Сбой', parse=lambda payload: payload,
+        run=lambda params, progress: 1 / 0, template='calculator/partials/job_batch.html',
+    ))
+    resp = client.post(reverse('calculator:job_submit', args=['boom']), data={'x': '1'}, HTTP_HX_REQUEST='true')
+    assert resp.status_code == 200
+    assert resp['HX-Trigger'] == 'calculationJobFinished'
+    assert 'division by zero' in resp.content.decode('utf-8')
+
+
+@pytest.mark.django_db
+def test_large_batch_is_offloaded_to_job(client, settings):
+    """Пакет больше SYNC_MAX_ROWS уходит в фоновую задачу (только от авторизованного пользователя)."""
+    from .models import CalculationJob
+    settings.CALCULATOR_JOBS = dict(settings.CALCULATOR_JOBS, SYNC_MAX_ROWS=3)
+    url = reverse('calculator:calculate_batch')
+    payload = json.dumps({
+        'alpha': [0.01, 0.02, 0.03, 0.04], 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    })
+    assert client.post(url, data=payload, content_type='application/json').status_code == 403
+    assert CalculationJob.objects.count() == 0
+
+    client.force_login(User.objects.create_user(username='batch', email='batch@example.com', password='password123'))
+    resp = client.post(url, data=payload, content_type='application/json')
+    assert resp.status_code == 202
+    assert resp.json()['result']['count'] == 4
+
+
+@pytest.mark.django_db
+def test_cross_site_job_submission_is_rejected():
+    """POST с чужого сайта с cookie сессии, но без CSRF-токена, задачу не создаёт."""
+    from .models import CalculationJob
+    client = Client(enforce_csrf_checks=True)
+    client.force_login(User.objects.create_user(username='victim', email='victim@example.com', password='password123'))
+    payload = json.dumps({
+        'alpha': [0.01, 0.02], 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+    })
+    for url in (reverse('calculator:calculate_batch'), reverse('calculator:job_submit', args=['batch'])):
+        assert client.post(url, data=payload, content_type='application/json').status_code == 403
+    assert CalculationJob.objects.count() == 0
+
+
+def test_roc_matches_single_solves_and_auc():
+    """ROC из одного векторизованного прохода совпадает с поточечными решениями; AUC для N(0,1)/N(1,1) = Φ(1/√2)."""
+    import base64
+    data = {'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+            'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1}
+    roc = solve_roc(data)
+    alphas = np.frombuffer(base64.b64decode(roc['alpha']), dtype='<f4')
+    power = np.frombuffer(base64.b64decode(roc['power']), dtype='<f4')
+    assert alphas.size == power.size == roc['points']
+    assert (alphas[0], power[0], alphas[-1], power[-1]) == (0.0, 0.0, 1.0, 1.0)
+    assert np.all(np.diff(power) >= 0)
+
+    i = int(np.argmin(np.abs(alphas - 0.05)))
+    single = solve_neyman_pearson(dict(data, alpha=float(alphas[i])), plot=None)
+    assert power[i] == pytest.approx(single['power'], abs=1e-4)
+    assert roc['auc'] == pytest.approx(stats.norm.cdf(1 / np.sqrt(2)), abs=1e-3)
+
+
+def test_roc_uniform_endpoints_use_support():
+    """При alpha=0 порог — правая граница носителя H0, и мощность может быть > 0."""
+    import base64
+    roc = solve_roc({'h0_dist': 'uniform', 'h0_param1': 0, 'h0_param2': 1,
+                     'h1_dist': 'uniform', 'h1_param1': 0.5, 'h1_param2': 1})
+    power = np.frombuffer(base64.b64decode(roc['power']), dtype='<f4')
+    assert power[0] == pytest.approx(0.5)
+
+
+@pytest.mark.django_db
+def test_roc_view_returns_payload_without_history(client):
+    """Эндпоинт ROC работает без alpha и не пишет историю расчётов."""
+    from .models import CalculationHistory
+
+    user = User.objects.create_user(username='rocuser', password='password123')
+    client.force_login(user)
+    params = {'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+              'h1_dist': 'expon', 'h1_param1': 0, 'h1_param2': 2}
+    resp = client.get(reverse('calculator:roc'), data=params)
+    assert resp.status_code == 200
+    assert 0.5 < resp.json()['auc'] <= 1.0
+    assert CalculationHistory.objects.count() == 0
+
+
+MC_DATA = {
+    'alpha': 0.05,
+    'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+    'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1,
+}
+
+
+def test_monte_carlo_chunks_are_bounded():
+    """Выборка режется на блоки не больше chunk_size; сумма блоков равна n_samples."""
+    sizes = chunk_sizes(10_000_000, 65536)
+    assert max(sizes) == 65536
+    assert sum(sizes) == 10_000_000
+    assert chunk_sizes(10, 4) == [4, 4, 2]
+
+
+def test_monte_carlo_confirms_threshold_and_reports_progress():
+    """Эмпирические alpha и мощность попадают в доверительные интервалы, прогресс доходит до 1."""
+    progress = []
+    result = run_monte_carlo(MC_DATA, 200_003, chunk_size=50_000, seed=7, progress=progress.append)
+    assert result['chunks'] == 5
+    assert result['alpha_ci'][0] <= 0.05 <= result['alpha_ci'][1]
+    assert result['power_ci'][0] <= 0.2595 <= result['power_ci'][1]
+    assert progress[-1] == 1.0 and len(progress) == 5
+
+
+def test_monte_carlo_is_reproducible_across_workers():
+    """Один и тот же seed даёт одинаковый результат в одном процессе и в пуле процессов."""
+    single = run_monte_carlo(MC_DATA, 40_000, chunk_size=10_000, seed=123)
+    pooled = run_monte_carlo(MC_DATA, 40_000, chunk_size=10_000, seed=123, workers=2)
+    assert single == pooled
+
+
+def test_wilson_interval_bounds():
+    lo, hi = wilson_interval(0, 100)
+    assert lo == 0.0 and 0 < hi < 0.05
+    assert wilson_interval(50, 100)[0] < 0.5 < wilson_interval(50, 100)[1]
+
+
+@pytest.mark.django_db
+def test_monte_carlo_job_via_htmx(client):
+    """Форма Монте-Карло на странице калькулятора ставит задачу и получает готовый partial."""
+    payload = dict(MC_DATA, n_samples=20_000, seed=1)
+    resp = client.post(reverse('calculator:job_submit', args=['monte_carlo']), data=payload, HTTP_HX_REQUEST='true')
+    assert resp.status_code == 200
+    html = resp.content.decode('utf-8')
+    assert 'Эмпирический α' in html
+
+    bad = client.post(reverse('calculator:job_submit', args=['monte_carlo']), data=dict(payload, n_samples=10),
+                      HTTP_HX_REQUEST='true')
+    assert 'n_samples' in bad.content.decode('utf-8')
+
+
+def _lr_data(h0, h1, alpha=0.05):
+    return {'alpha': alpha, 'test_mode': 'lr',
+            'h0_dist': h0[0], 'h0_param1': h0[1], 'h0_param2': h0[2],
+            'h1_dist': h1[0], 'h1_param1': h1[1], 'h1_param2': h1[2]}
+
+
+def test_likelihood_ratio_matches_threshold_test_for_monotone_ratio():
+    """При монотонном f1/f0 (сдвиг нормального) область — правый хвост с тем же порогом, что и по X."""
+    result = solve_likelihood_ratio(_lr_data(('norm', 0, 1), ('norm', 1, 1)))
+    assert len(result['region']) == 1
+    assert result['region'][0][0] == pytest.approx(stats.norm.isf(0.05), abs=1e-9)
+    assert result['region'][0][1] is None
+    assert result['power'] == pytest.approx(0.2595, abs=1e-4)
+    assert result['gamma'] == 0.0
+
+
+def test_likelihood_ratio_region_is_union_of_intervals_for_variance_change():
+    """H1 с меньшей дисперсией — центральный интервал, с большей — два хвоста; размер ровно alpha."""
+    narrow = solve_likelihood_ratio(_lr_data(('norm', 0, 1), ('norm', 0, 0.5)))
+    r = stats.norm.ppf(0.525)
+    assert narrow['region'] == [[pytest.approx(-r, abs=1e-9), pytest.approx(r, abs=1e-9)]]
+    assert narrow['power'] == pytest.approx(round(stats.norm(0, 0.5).cdf(r) - stats.norm(0, 0.5).cdf(-r), 4))
+
+    wide = solve_likelihood_ratio(_lr_data(('norm', 0, 1), ('norm', 0, 2)))
+    r = stats.norm.isf(0.025)
+    assert wide['region'] == [[None, pytest.approx(-r, abs=1e-9)], [pytest.approx(r, abs=1e-9), None]]
+    assert wide['size'] == pytest.approx(0.05, abs=1e-10)
+
+
+def test_likelihood_ratio_randomizes_on_plateau():
+    """U(0,1) против U(0,2): f1/f0 = 1/2 на [0, 1] — там отвергаем с вероятностью gamma = alpha."""
+    result = solve_likelihood_ratio(_lr_data(('uniform', 0, 1), ('uniform', 0, 2)))
+    assert result['region'] == [[1.0, 2.0]]
+    assert result['randomized_region'] == [[0.0, 1.0]]
+    assert result['threshold'] == pytest.approx(0.5)
+    assert result['gamma'] == pytest.approx(0.05)
+    assert result['power'] == pytest.approx(0.5 + 0.5 * 0.05, abs=1e-4)
+
+
+def test_monte_carlo_verifies_likelihood_ratio_test():
+    """Монте-Карло проверяет выбранный критерий: для LR с плато учитывается рандомизация."""
+    data = _lr_data(('uniform', 0, 1), ('uniform', 0, 2))
+    result = run_monte_carlo(data, 200_000, chunk_size=50_000, seed=3)
+    assert result['test_mode'] == 'lr'
+    assert result['alpha_ci'][0] <= 0.05 <= result['alpha_ci'][1]
+    assert result['power_ci'][0] <= 0.525 <= result['power_ci'][1]
+
+
+@pytest.mark.django_db
+def test_calculate_view_likelihood_ratio_mode(client):
+    """test_mode=lr показывает k и область отвержения; без поля остаётся критерий по X."""
+    payload = {
+        'alpha': 0.05, 'test_mode': 'lr',
+        'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 0, 'h1_param2': 2,
+    }
+    html = client.post(reverse('calculator:calculate'), data=payload).content.decode('utf-8')
+    assert 'Порог отношения правдоподобия (k)' in html
+    assert '−∞' in html and '+∞' in html
+    assert 'np-region' in html
+
+    del payload['test_mode']
+    html = client.post(reverse('calculator:calculate'), data=payload).content.decode('utf-8')
+    assert 'Порог (C):' in html
+
+
+@pytest.mark.django_db
+def test_history_records_which_test_produced_threshold(client):
+    """В истории k критерия отношения правдоподобия не смешивается с порогом C по наблюдению."""
+    from .models import CalculationHistory
+
+    user = User.objects.create_user(username='modeuser', password='password123')
+    client.force_login(user)
+    payload = {
+        'alpha': 0.05, 'test_mode': 'lr',
+        'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+        'h1_dist': 'norm', 'h1_param1': 0, 'h1_param2': 2,
+    }
+    client.post(reverse('calculator:calculate'), data=payload)
+    del payload['test_mode']
+    client.post(reverse('calculator:calculate'), data=payload)
+
+    modes = list(CalculationHistory.objects.filter(user=user).order_by('id').values_list('test_mode', flat=True))
+    assert modes == ['lr', 'x']
+    html = client.get(reverse('calculator:history')).content.decode('utf-8')
+    assert 'k = ' in html and 'C = ' in html
+
+
+def test_sample_size_matches_normal_closed_form():
+    """Для среднего нормальных n = ceil(((z_α + z_β) σ / δ)²); поиск укладывается в O(log n) вычислений."""
+    data = {'alpha': 0.05, 'target_power': 0.8,
+            'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+            'h1_dist': 'norm', 'h1_param1': -0.1, 'h1_param2': 1}
+    expected = int(np.ceil(((stats.norm.isf(0.05) + stats.norm.isf(0.2)) / 0.1) ** 2))
+    result = solve_sample_size(data, max_n=10 ** 6)
+    assert result['n'] == expected
+    assert result['tail'] == 'lower'
+    assert result['evaluations'] <= 2 * int(np.log2(expected)) + 2
+    assert power_at(data, expected - 1, upper=False)[1] < 0.8 <= result['power']
+
+
+def test_sample_size_single_observation_and_limits():
+    """При n = 1 статистика — само наблюдение; недостижимая мощность даёт ValueError."""
+    data = {'alpha': 0.05, 'target_power': 0.2,
+            'h0_dist': 'expon', 'h0_param1': 0, 'h0_param2': 1,
+            'h1_dist': 'expon', 'h1_param1': 0, 'h1_param2': 2}
+    result = solve_sample_size(data, max_n=100)
+    assert result['n'] == 1
+    assert result['power'] == solve_neyman_pearson(data, plot=None)['power']
+
+    with pytest.raises(ValueError):
+        solve_sample_size(dict(data, h1_param2=1, target_power=0.9), max_n=64)
+
+
+@pytest.mark.django_db
+def test_sample_size_view(client):
+    payload = {'alpha': 0.05, 'target_power': 0.9,
+               'h0_dist': 'uniform', 'h0_param1': 0, 'h0_param2': 1,
+               'h1_dist': 'uniform', 'h1_param1': 0, 'h1_param2': 1.2}
+    html = client.post(reverse('calculator:sample_size'), data=payload).content.decode('utf-8')
+    assert 'Объём выборки: n =' in html
+
+    html = client.post(reverse('calculator:sample_size'), data=dict(payload, h1_dist='norm')).content.decode('utf-8')
+    assert 'одного семейства' in html
+
+
+def test_distribution_registry_validates_and_caches_frozen_objects():
+    """Форма и решатель читают семейства и проверки параметров из реестра; объекты SciPy кэшируются."""
+    assert {'norm', 'uniform', 'expon', 'gamma', 'beta', 't', 'chi2', 'poisson', 'binom'} <= set(DISTRIBUTIONS)
+    assert get_distribution('gamma', 2, 1.5) is get_distribution('gamma', 2.0, 1.5)
+    assert get_family('binom').validate([10, 2.5, 0], [0.5, 0.5, 1.5]) == [
+        (0, 1, 'Параметр n (число испытаний) должен быть целым числом ≥ 1'),
+        (1, 2, 'Параметр p (вероятность успеха) должен быть ≥ 0 и ≤ 1'),
+    ]
+    with pytest.raises(ValueError, match='Не поддерживаемое'):
+        get_distribution('cauchy', 0, 1)
+
+    form = CalculatorForm({'alpha': 0.05, 'h0_dist': 'binom', 'h0_param1': 2.5, 'h0_param2': 0.5,
+                           'h1_dist': 't', 'h1_param1': 3, 'h1_param2': -2})
+    assert not form.is_valid()
+    assert list(form.errors) == ['h0_param1']  # у t второй параметр — сдвиг, он может быть отрицательным
+
+
+def test_discrete_threshold_is_randomized_to_exact_alpha():
+    """Для дискретного H0 размер критерия P0(X > c) + gamma P0(X = c) равен alpha точно."""
+    data = {'alpha': 0.05, 'h0_dist': 'poisson', 'h0_param1': 3, 'h0_param2': 0,
+            'h1_dist': 'poisson', 'h1_param1': 6, 'h1_param2': 0}
+    result = solve_neyman_pearson(data, plot=None)
+    h0, h1 = stats.poisson(3), stats.poisson(6)
+    c = result['threshold']
+    assert c == 6.0
+    assert h0.sf(c) + result['gamma'] * h0.pmf(c) == pytest.approx(0.05, abs=1e-4)
+    assert result['power'] == pytest.approx(h1.sf(c) + result['gamma'] * h1.pmf(c), abs=1e-4)
+
+    batch = solve_neyman_pearson_batch([0.05, 0.1], 'poisson', 3, 0, 'poisson', 6, 0)
+    assert batch['gamma'][0] == pytest.approx(result['gamma'], abs=1e-4)
+    assert np.allclose(h0.sf(batch['threshold']) + batch['gamma'] * h0.pmf(batch['threshold']), [0.05, 0.1])
+
+    lr = solve_likelihood_ratio(dict(data, test_mode='lr'))
+    assert lr['power'] == result['power']  # отношение Пуассона монотонно — тот же критерий
+    assert lr['region'] == [[6.5, None]] and lr['randomized_region'] == [[5.5, 6.5]]
+
+
+def test_likelihood_ratio_handles_heavy_tails():
+    """Для сдвига t(3) отношение f1/f0 не монотонно: область — ограниченный интервал размера alpha."""
+    result = solve_likelihood_ratio(_lr_data(('t', 3, 0), ('t', 3, 2)))
+    [[a, b]] = result['region']
+    h0, h1 = stats.t(3), stats.t(3, loc=2)
+    assert h0.cdf(b) - h0.cdf(a) == pytest.approx(0.05, abs=1e-9)
+    assert h1.pdf(a) / h0.pdf(a) == pytest.approx(h1.pdf(b) / h0.pdf(b), rel=1e-6)
+
+
+def test_warmup_solves_every_family_and_runs_only_when_enabled(settings, monkeypatch):
+    """Прогрев проходит по всем семействам реестра; веб-процесс выполняет его только при CALCULATOR_WARMUP."""
+    timings = warmup.warm_up()
+    assert set(timings) == set(DISTRIBUTIONS) | {'batch'}
+    for family in DISTRIBUTIONS.values():
+        assert family.validate(*family.example) == []
+
+    calls = []
+    monkeypatch.setattr(warmup, 'warm_up', lambda: calls.append(1))
+    settings.CALCULATOR_WARMUP = False
+    warmup.warm_up_web_process()
+    settings.CALCULATOR_WARMUP = True
+    warmup.warm_up_web_process()
+    assert calls == [1]
+
+
+def test_url_loading_does_not_import_scipy():
+    """SciPy загружается фасадом services.numeric при первом расчёте, а не при импорте views и URL.
+
+    Прогрев включён: он выполняется только из core/wsgi.py, а не в каждом процессе с django.setup()
+    (воркер Celery, manage.py-команды).
+    """
+    import os
+    import subprocess
+    import sys
+    from django.conf import settings as django_settings
+
+    probe = ("import sys, django; django.setup(); from django.urls import get_resolver; "
+             "get_resolver().url_patterns; print(any(m.startswith('scipy') for m in sys.modules))")
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='core.settings', CALCULATOR_WARMUP='True')
+    completed = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True,
+                               env=env, cwd=str(django_settings.BASE_DIR), check=True)
+    assert completed.stdout.strip() == 'False'
+
+
+@pytest.mark.django_db
+def test_history_buffer_batches_and_dedups(client, settings):
+    """В режиме buffered история пишется пачками; dedup отбрасывает повтор предыдущего расчёта пользователя."""
+    from .models import CalculationHistory
+    from .services.history import get_history_buffer, flush_history
+
+    settings.CALCULATOR_HISTORY = {'MODE': 'buffered', 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 60, 'DEDUP': True}
+    user = User.objects.create_user(username='bufferuser', password='password123')
+    client.force_login(user)
+    url = reverse('calculator:calculate')
+    payload = {'alpha': 0.05, 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+               'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1}
+
+    for h1_loc in (1, 1, 2):  # второй расчёт — повтор первого
+        client.post(url, data=dict(payload, h1_param1=h1_loc))
+    buffer = get_history_buffer()
+    assert CalculationHistory.objects.count() == 0
+    assert (buffer.pending(), buffer.skipped) == (2, 1)
+
+    client.post(url, data=dict(payload, h1_param1=3))
+    assert CalculationHistory.objects.count() == 3  # пачка из BATCH_SIZE строк записана одним bulk_create
+
+    client.post(url, data=dict(payload, h1_param1=1))
+    flush_history()
+    rows = list(CalculationHistory.objects.filter(user=user).order_by('created_at'))
+    assert [row.h1_params['param1'] for row in rows] == [1, 2, 3, 1]
+    assert rows[0].created_at < rows[-1].created_at  # время расчёта, а не записи
+
+
+@pytest.mark.django_db
+def test_benchmark_history_runs_alongside_users_without_email():
+    """Тестовый пользователь замера создаётся со своим email и не конфликтует с уже существующими."""
+    from django.core.management import call_command
+    from .models import CalculationHistory
+
+    User.objects.create_user(username='noemail', password='password123')
+    call_command('benchmark_history', rows=30, batch_size=10, repeat=1, stdout=io.StringIO())
+    assert not User.objects.filter(username='history-benchmark').exists()
+    assert CalculationHistory.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_history_buffer_retries_rows_lost_on_failed_flush(monkeypatch):
+    """Строка, которую не удалось записать, не блокирует фильтром повторов тот же расчёт."""
+    from .models import CalculationHistory
+    from .services.history import HistoryBuffer, history_row
+
+    user = User.objects.create_user(username='retryuser', email='retry@example.com', password='password123')
+    data = {'alpha': 0.05, 'h0_dist': 'norm', 'h0_param1': 0, 'h0_param2': 1,
+            'h1_dist': 'norm', 'h1_param1': 1, 'h1_param2': 1}
+    results = {'threshold': 1.645, 'power': 0.26, 'gamma': 0.0}
+    buffer = HistoryBuffer(buffered=True, batch_size=10, flush_interval=60, dedup=True)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('database is unavailable')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(CalculationHistory.objects, 'bulk_create', fail)
+        patch.setattr(CalculationHistory, 'save', fail)
+        buffer.add(history_row(user, data, results))
+        assert buffer.flush() == 0
+
+    buffer.add(history_row(user, data, results))
+    assert (buffer.pending(), buffer.skipped) == (1, 0)
+    assert buffer.flush() == 1
+    assert CalculationHistory.objects.filter(user=user).count() == 1
+
+    unbuffered = HistoryBuffer(dedup=True)
+    with monkeypatch.context() as patch:
+        patch.setattr(CalculationHistory, 'save', fail)
+        with pytest.raises(RuntimeError):
+            unbuffered.add(history_row(user, data, results))
+    unbuffered.add(history_row(user, data, results))
+    assert (unbuffered.written, unbuffered.skipped) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_keyset_history_pages_walk_forward_and_back(client, settings, django_assert_max_num_queries):
+    """Курсоры обходят историю без пропусков и повторов даже при одинаковом created_at; COUNT не выполняется."""
+    from django.utils import timezone
+    from core.pagination import KeysetPaginator
+    from .models import CalculationHistory
+
+    settings.HISTORY_PAGINATION = 'keyset'
+    user = User.objects.create_user(username='keysetuser', password='password123')
+    moment = timezone.now()
+    CalculationHistory.objects.bulk_create([
+        CalculationHistory(user=user, alpha=0.05, h0_params={}, h1_params={}, threshold=i, power=0.5, gamma=0,
+                           created_at=moment - timezone.timedelta(seconds=i // 3))  # по 3 строки на момент
+        for i in range(25)
+    ])
+    expected = list(CalculationHistory.objects.filter(user=user).order_by('-created_at', '-id'))
+
+    paginator = KeysetPaginator(CalculationHistory.objects.filter(user=user), 10)
+    pages = [paginator.page()]
+    while pages[-1].has_next:
+        pages.append(paginator.page(after=pages[-1].next_cursor))
+    assert [row for page in pages for row in page] == expected
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert list(paginator.page(before=pages[2].previous_cursor)) == list(pages[1])
+    assert not paginator.page(before=pages[1].previous_cursor).has_previous
+
+    client.force_login(user)
+    url = reverse('calculator:history')
+    with django_assert_max_num_queries(3):  # сессия, пользователь, страница — без COUNT
+        response = client.get(url, {'after': pages[0].next_cursor})
+    assert f'?before={pages[1].previous_cursor}' in response.content.decode('utf-8')
+    assert client.get(url, {'after': 'мусор'}).status_code == 200
@@ -6,5 +6,11 @@ app_name = 'calculator'
 urlpatterns = [
     path('', views.calculator_page_view, name='page'),
     path('calculate/', views.calculate_view, name='calculate'),
+    path('calculate/batch/', views.calculate_batch_view, name='calculate_batch'),
+    path('plot/', views.plot_data_view, name='plot'),
+    path('roc/', views.roc_view, name='roc'),
+    path('sample-size/', views.sample_size_view, name='sample_size'),
+    path('jobs/<str:kind>/submit/', views.job_submit_view, name='job_submit'),
+    path('jobs/<uuid:job_id>/', views.job_status_view, name='job_status'),
     path('history/', views.calculation_history_view, name='history'),
 ]
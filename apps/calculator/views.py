@@ -1,10 +1,28 @@
-from django.shortcuts import render
-from django.http import HttpRequest, HttpResponse
+import json
+from django.shortcuts import render, get_object_or_404
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag, urlencode
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .forms import CalculatorForm
-from .services.neyman_pearson_solver import solve_neyman_pearson
-from .models import CalculationHistory
+from django.views.decorators.http import require_http_methods
+from core.pagination import paginate
+from .forms import CalculatorForm, HypothesesForm, MonteCarloForm, SampleSizeForm
+from .services.neyman_pearson_solver import solve_neyman_pearson_batch, BATCH_FIELDS
+from .services.result_cache import (
+    cached_solve_neyman_pearson, cached_plot_data, cached_roc, cached_sample_size, get_partial_cache,
+    make_cache_key, plot_cache_key, roc_cache_key,
+)
+from .services.history import record_history
+from .services.jobs import submit_job, get_job_kind, parse_batch_payload, batch_row_count
+from .models import CalculationHistory, CalculationJob
+
+# Меняется при изменении шаблона calculator/partials/results.html: HTML в общем кэше и ETag браузеров
+# после деплоя с новым шаблоном перестают совпадать
+RESULTS_PARTIAL_VERSION = 1
 
 def calculator_page_view(request: HttpRequest) -> HttpResponse:
     form = CalculatorForm()
@@ -12,7 +30,19 @@ def calculator_page_view(request: HttpRequest) -> HttpResponse:
     if request.user.is_authenticated:
         history = CalculationHistory.objects.filter(user=request.user).order_by('-created_at')[:5]
 
-    return render(request, "calculator/calculator_page.html", {"form": form, "history": history})
+    context = {"form": form, "mc_form": MonteCarloForm(), "n_form": SampleSizeForm(), "history": history}
+    return render(request, "calculator/calculator_page.html", context)
+
+def _etag_for(key: str) -> str:
+    """ETag по ключу кэша целиком (пространство имён, версия формата и хэш входных данных)."""
+    return quote_etag(key.replace(':', '-'))
+
+def _etag_matches(request: HttpRequest, etag: str) -> bool:
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
 
 def calculate_view(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
@@ -20,29 +50,30 @@ def calculate_view(request: HttpRequest) -> HttpResponse:
         if form.is_valid():
             data = form.cleaned_data
             try:
-                results = solve_neyman_pearson(data)
+                results = cached_solve_neyman_pearson(data)
                 
+                # История пишется всегда, даже если клиенту уйдёт 304 или готовый HTML из кэша
                 if request.user.is_authenticated:
-                    CalculationHistory.objects.create(
-                        user=request.user,
-                        alpha=data['alpha'],
-                        h0_params={
-                            "dist": data['h0_dist'],
-                            "param1": data['h0_param1'],
-                            "param2": data['h0_param2'],
-                        },
-                        h1_params={
-                            "dist": data['h1_dist'],
-                            "param1": data['h1_param1'],
-                            "param2": data['h1_param2'],
-                        },
-                        threshold=results['threshold'],
-                        power=results['power'],
-                        gamma=results['gamma']
-                    )
-
-                context = {"form": form, "results": results}
-                return render(request, "calculator/partials/results.html", context)
+                    record_history(request.user, data, results)
+
+                # partial не зависит от пользователя, поэтому HTML кэшируется по ключу входных данных
+                key = make_cache_key(dict(data, _partial=RESULTS_PARTIAL_VERSION), namespace='np-partial')
+                etag = _etag_for(key)
+                if _etag_matches(request, etag):
+                    response = HttpResponseNotModified()
+                    response['ETag'] = etag
+                    return response
+
+                partial_cache = get_partial_cache()
+                content = partial_cache.get(key)
+                if content is None:
+                    plot_url = f"{reverse('calculator:plot')}?{urlencode(data)}"
+                    context = {"form": form, "results": results, "plot_url": plot_url}
+                    content = render_to_string("calculator/partials/results.html", context).encode('utf-8')
+                    partial_cache.set(key, content)
+                response = HttpResponse(content)
+                response['ETag'] = etag
+                return response
             except Exception as e:
                 # Возвращаем ошибку в partial но не 400, чтобы htmx корректно обработал swap
                 context = {"error": str(e)}
@@ -61,19 +92,166 @@ def calculate_view(request: HttpRequest) -> HttpResponse:
     form = CalculatorForm()
     return render(request, "calculator/calculator_page.html", {"form": form})
 
+def _cached_json_view(request: HttpRequest, form, cache_key, compute) -> JsonResponse:
+    """Общая часть GET-эндпоинтов с детерминированным JSON: валидация, ETag, кэширование браузером.
+
+    cache_key(cleaned_data) — тот же ключ, по которому кэширует compute, поэтому ETag меняется
+    ровно тогда, когда меняется ответ.
+    """
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'error': form.errors.get_json_data()}, status=400)
+
+    key = cache_key(form.cleaned_data)
+    etag = _etag_for(key)
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            response = JsonResponse(compute(form.cleaned_data))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+@require_http_methods(["GET"])
+def plot_data_view(request: HttpRequest) -> JsonResponse:
+    """Компактные данные графика плотностей (см. build_plot_data), загружаемые графиком лениво.
+
+    Параметры те же, что у формы калькулятора, в строке запроса. Ответ детерминирован по входным
+    данным, поэтому разрешено кэширование браузером и поддерживается If-None-Match.
+    """
+    return _cached_json_view(request, CalculatorForm(request.GET), plot_cache_key, cached_plot_data)
+
+@require_http_methods(["GET"])
+def roc_view(request: HttpRequest) -> JsonResponse:
+    """ROC-кривая для пары гипотез одним запросом (компактный формат, см. solve_roc).
+
+    Заменяет многократную отправку формы калькулятора с разными alpha; история не сохраняется.
+    """
+    return _cached_json_view(request, HypothesesForm(request.GET), roc_cache_key, cached_roc)
+
+@require_http_methods(["POST"])
+def sample_size_view(request: HttpRequest) -> HttpResponse:
+    """Минимальный объём выборки для целевой мощности (partial для htmx, см. solve_sample_size)."""
+    form = SampleSizeForm(request.POST)
+    if not form.is_valid():
+        joined_errors = "; ".join(f"{field}: {err}" for field, errors in form.errors.items() for err in errors)
+        return render(request, "calculator/partials/results.html", {"error": f"error: {joined_errors}"})
+    try:
+        result = cached_sample_size(form.cleaned_data)
+    except ValueError as e:
+        return render(request, "calculator/partials/results.html", {"error": str(e)})
+    return render(request, "calculator/partials/sample_size.html", {"result": result, "data": form.cleaned_data})
+
+@require_http_methods(["POST"])
+def calculate_batch_view(request: HttpRequest) -> JsonResponse:
+    """JSON API для пакетного расчёта.
+
+    Тело запроса — объект в колоночном формате: каждое из полей alpha, h0_dist, h0_param1,
+    h0_param2, h1_dist, h1_param1, h1_param2 задаётся скаляром или списком одинаковой длины.
+    В ответе — массивы threshold, power и gamma (рандомизация, ненулевая для дискретных H0).
+    Пакеты больше CALCULATOR_JOBS['SYNC_MAX_ROWS'] строк ставятся в очередь: ответ 202 с id задачи
+    (только для авторизованных пользователей, анонимным — 403).
+    История расчётов для пакетных запросов не сохраняется.
+
+    Эндпоинт защищён CSRF, как и остальные POST-запросы: большой пакет создаёт задачу от имени
+    пользователя сессии. Скрипты берут cookie csrftoken (например, GET страницы калькулятора)
+    и передают её значение в заголовке X-CSRFToken.
+    """
+    try:
+        payload = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'error': 'Некорректный JSON в запросе'}, status=400)
+
+    try:
+        columns = parse_batch_payload(payload)
+        if batch_row_count(columns) > settings.CALCULATOR_JOBS['SYNC_MAX_ROWS']:
+            return _job_json_response(request, submit_job('batch', columns, request.user), status=202)
+        results = solve_neyman_pearson_batch(*(columns[field] for field in BATCH_FIELDS))
+    except PermissionDenied as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'count': int(results['threshold'].size),
+        'threshold': results['threshold'].tolist(),
+        'power': results['power'].tolist(),
+        'gamma': results['gamma'].tolist(),
+    })
+
+def _job_json_response(request: HttpRequest, job: CalculationJob, status: int = 200) -> JsonResponse:
+    data = {
+        'success': job.status != CalculationJob.STATUS_FAILURE,
+        'job_id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'status_url': request.build_absolute_uri(reverse('calculator:job_status', args=[job.id])),
+    }
+    if job.status == CalculationJob.STATUS_SUCCESS:
+        data['result'] = job.result
+    if job.status == CalculationJob.STATUS_FAILURE:
+        data['error'] = job.error
+    return JsonResponse(data, status=status)
+
+def _render_job(request: HttpRequest, job: CalculationJob) -> HttpResponse:
+    kind = get_job_kind(job.kind)
+    context = {
+        'job': job,
+        'kind': kind,
+        'preview': kind.preview(job.result) if kind.preview and job.status == CalculationJob.STATUS_SUCCESS else None,
+        'poll_interval': settings.CALCULATOR_JOBS['POLL_INTERVAL'],
+    }
+    response = render(request, 'calculator/partials/job_status.html', context)
+    if job.is_finished:
+        # Страница может подписаться на событие, чтобы обновить связанные блоки
+        response['HX-Trigger'] = 'calculationJobFinished'
+    return response
+
+@require_http_methods(["POST"])
+def job_submit_view(request: HttpRequest, kind: str) -> HttpResponse:
+    """Ставит расчёт в очередь. Параметры — JSON-тело или поля формы (зависит от типа задачи).
+
+    htmx-запросу возвращается partial, который сам опрашивает статус; остальным — JSON (202).
+    """
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({'success': False, 'error': 'Некорректный JSON в запросе'}, status=400)
+    else:
+        payload = request.POST.dict()
+
+    try:
+        job = submit_job(kind, payload, request.user)
+    except (PermissionDenied, ValueError, TypeError) as e:
+        if request.headers.get('HX-Request'):
+            return render(request, 'calculator/partials/results.html', {'error': str(e)})
+        status = 403 if isinstance(e, PermissionDenied) else 400
+        return JsonResponse({'success': False, 'error': str(e)}, status=status)
+
+    if request.headers.get('HX-Request'):
+        return _render_job(request, job)
+    return _job_json_response(request, job, status=202)
+
+@require_http_methods(["GET"])
+def job_status_view(request: HttpRequest, job_id) -> HttpResponse:
+    """Статус задачи: partial для htmx-опроса или JSON с результатом."""
+    job = get_object_or_404(CalculationJob, id=job_id)
+    if job.user_id is not None and job.user_id != request.user.pk:
+        raise Http404
+    if request.headers.get('HX-Request'):
+        return _render_job(request, job)
+    return _job_json_response(request, job)
+
 @login_required # Только авторизованные пользователи могут видеть эту страницу
 def calculation_history_view(request: HttpRequest) -> HttpResponse:
-    history_list = CalculationHistory.objects.filter(user=request.user).order_by('-created_at')
-    
-    page = request.GET.get('page', 1)
-    paginator = Paginator(history_list, 10) # 10 элементов на страницу
-    try:
-        history = paginator.page(page)
-    except PageNotAnInteger:
-        history = paginator.page(1)
-    except EmptyPage:
-        history = paginator.page(paginator.num_pages)
-    
+    history_list = CalculationHistory.objects.filter(user=request.user)
+    history = paginate(request, history_list, 10, ordering=('-created_at', '-id')) # 10 элементов на страницу
+
     context = {
         'history': history
     }
@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Tuple
+
+from django.core.cache import cache
+
+from .models import Answer, Quiz
+
+# Меняется при изменении формата AnswerKey, чтобы не читать устаревшие записи из общего кэша
+ANSWER_KEY_VERSION = 1
+# Страховка на случай изменений в обход сигналов (bulk_create, queryset.update)
+ANSWER_KEY_TTL = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """Ключ ответов теста: вопросы в порядке прохождения и множества правильных ответов."""
+    question_ids: Tuple[int, ...]
+    correct: Dict[int, FrozenSet[int]]
+
+    def is_correct(self, question_id: int, answer_ids) -> bool:
+        return frozenset(answer_ids) == self.correct.get(question_id, frozenset())
+
+    def score(self, question_ids, user_answers_map: dict) -> int:
+        """Число вопросов из question_ids, на которые дан точный набор правильных ответов (без запросов к БД)."""
+        return sum(self.is_correct(qid, user_answers_map.get(str(qid), ())) for qid in question_ids)
+
+
+def answer_key_cache_key(quiz_id) -> str:
+    return f'quiz-answer-key:v{ANSWER_KEY_VERSION}:{quiz_id}'
+
+
+def build_answer_key(quiz_id) -> AnswerKey:
+    """Два запроса: вопросы теста и правильные ответы на них."""
+    question_ids = tuple(Quiz.questions.through.objects.filter(quiz_id=quiz_id).values_list('question_id', flat=True))
+    correct = {qid: set() for qid in question_ids}
+    for question_id, answer_id in Answer.objects.filter(question_id__in=question_ids, is_correct=True) \
+                                                .values_list('question_id', 'id'):
+        correct[question_id].add(answer_id)
+    return AnswerKey(question_ids, {qid: frozenset(ids) for qid, ids in correct.items()})
+
+
+def get_answer_key(quiz_id) -> AnswerKey:
+    """Ключ ответов теста из кэша; при промахе собирается заново (см. signals — инвалидация при изменениях)."""
+    key = answer_key_cache_key(quiz_id)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz_id)
+        cache.set(key, answer_key, ANSWER_KEY_TTL)
+    return answer_key
+
+
+def invalidate_answer_keys(quiz_ids) -> None:
+    cache.delete_many([answer_key_cache_key(quiz_id) for quiz_id in quiz_ids])
+
+
+def quiz_ids_for_questions(question_ids) -> list:
+    return list(Quiz.questions.through.objects.filter(question_id__in=question_ids)
+                .values_list('quiz_id', flat=True).distinct())
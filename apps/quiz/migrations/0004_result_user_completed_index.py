@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_alter_answer_options_alter_question_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizresult',
+            index=models.Index(fields=['user', '-completed_at', '-id'], name='quiz_result_user_completed'),
+        ),
+    ]
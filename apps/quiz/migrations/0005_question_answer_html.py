@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:03
+
+import markdown
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# Замороженная копия рендеринга на момент миграции (apps.quiz.rendering): миграция не должна
+# зависеть от живого кода приложения, который может измениться или переехать
+MARKDOWN_EXTENSIONS = ['extra', 'abbr', 'attr_list', 'def_list', 'fenced_code', 'footnotes', 'tables']
+
+
+def render_markdown(text):
+    if not text:
+        return ''
+    return markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, output_format='html5')
+
+
+def render_stored_html(apps, schema_editor):
+    """Заполняет HTML-колонки для уже существующих вопросов и ответов (исторические модели без save())."""
+    Question = apps.get_model('quiz', 'Question')
+    Answer = apps.get_model('quiz', 'Answer')
+
+    batch = []
+    for question in Question.objects.only('id', 'text', 'explanation').iterator(chunk_size=BATCH_SIZE):
+        question.text_html = render_markdown(question.text)
+        question.explanation_html = render_markdown(question.explanation)
+        batch.append(question)
+        if len(batch) >= BATCH_SIZE:
+            Question.objects.bulk_update(batch, ['text_html', 'explanation_html'])
+            batch = []
+    Question.objects.bulk_update(batch, ['text_html', 'explanation_html'])
+
+    batch = []
+    for answer in Answer.objects.only('id', 'text').iterator(chunk_size=BATCH_SIZE):
+        answer.text_html = render_markdown(answer.text)
+        batch.append(answer)
+        if len(batch) >= BATCH_SIZE:
+            Answer.objects.bulk_update(batch, ['text_html'])
+            batch = []
+    Answer.objects.bulk_update(batch, ['text_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_result_user_completed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='explanation_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_stored_html, migrations.RunPython.noop),
+    ]
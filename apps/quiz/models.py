@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from .rendering import render_markdown
+
 class Quiz(models.Model):
     title = models.CharField(max_length=200, verbose_name="Название теста")
     questions = models.ManyToManyField('Question', related_name='quizzes', verbose_name="Вопросы")
@@ -16,6 +18,9 @@ class Quiz(models.Model):
 class Question(models.Model):
     text = models.TextField(verbose_name="Текст вопроса")
     explanation = models.TextField(blank=True, help_text="Пояснение к правильному ответу.", verbose_name="Пояснение")
+    # HTML из Markdown, как Article.content_html: рендерится при сохранении, а не при каждом показе
+    text_html = models.TextField(editable=False, blank=True)
+    explanation_html = models.TextField(editable=False, blank=True)
 
     class Meta:
         verbose_name = "Вопрос"
@@ -24,10 +29,16 @@ class Question(models.Model):
     def __str__(self):
         return self.text[:50]
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_markdown(self.text)
+        self.explanation_html = render_markdown(self.explanation)
+        super().save(*args, **kwargs)
+
 class Answer(models.Model):
     question = models.ForeignKey(Question, related_name='answers', on_delete=models.CASCADE, verbose_name="Вопрос")
     text = models.CharField(max_length=255, verbose_name="Текст ответа")
     is_correct = models.BooleanField(default=False, verbose_name="Правильный ответ")
+    text_html = models.TextField(editable=False, blank=True)
 
     class Meta:
         verbose_name = "Ответ"
@@ -36,6 +47,10 @@ class Answer(models.Model):
     def __str__(self):
         return f"{'✓' if self.is_correct else '✗'}"
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_markdown(self.text)
+        super().save(*args, **kwargs)
+
 class QuizResult(models.Model):
     # Эта модель пока не используется, но оставим ее для будущего
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -43,5 +58,11 @@ class QuizResult(models.Model):
     score = models.FloatField()
     completed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # История тестов пользователя: фильтр по user и keyset-пагинация по (completed_at, id)
+            models.Index(fields=['user', '-completed_at', '-id'], name='quiz_result_user_completed'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title} - {self.score}%"
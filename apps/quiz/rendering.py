@@ -0,0 +1,42 @@
+import threading
+from functools import lru_cache
+
+import markdown
+
+# Настройки Markdown: включаем базовые расширения и поддерживаем простые конструкции.
+# Формулы LaTeX не преобразуются markdown-пакетом, их рендерит MathJax на клиенте.
+# Поэтому мы оставляем символы $ ... $ и $$ ... $$ нетронутыми.
+MARKDOWN_EXTENSIONS = [
+    'extra',        # Таблицы, списки и прочее
+    'abbr',
+    'attr_list',
+    'def_list',
+    'fenced_code',
+    'footnotes',
+    'tables'
+]
+
+# Сколько различных текстов помнит кэш отрендеренного HTML в процессе
+MARKDOWN_CACHE_SIZE = 4096
+
+_local = threading.local()
+
+
+def _converter() -> markdown.Markdown:
+    """Экземпляр Markdown текущего потока: сборка расширений дорогая, а сам экземпляр не потокобезопасен."""
+    md = getattr(_local, 'markdown', None)
+    if md is None:
+        md = _local.markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, output_format='html5')
+    return md
+
+
+@lru_cache(maxsize=MARKDOWN_CACHE_SIZE)
+def render_markdown(text: str) -> str:
+    """HTML для текста в Markdown; результат кэшируется по содержимому текста (LRU)."""
+    if not text:
+        return ''
+    md = _converter()
+    try:
+        return md.convert(text)
+    finally:
+        md.reset()  # сноски, аббревиатуры и прочее состояние не должны перетекать в следующий текст
@@ -0,0 +1,139 @@
+from django.core.cache import cache
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.utils.text import Truncator
+
+from .models import Answer, Question
+from .templatetags.quiz_markdown import stored_html
+
+# Меняется при изменении шаблона quiz/partials/question_body.html или состава payload
+QUESTION_PAYLOAD_VERSION = 3
+QUESTION_PAYLOAD_TTL = 24 * 60 * 60
+
+
+def get_session_keys(quiz_id):
+    return f'quiz_{quiz_id}_questions', f'quiz_{quiz_id}_answers'
+
+
+class QuizSession:
+    """Состояние прохождения теста в сессии: порядок вопросов, их позиции и ответы пользователя.
+
+    Позиции вопросов (id -> индекс) считаются один раз при старте, поэтому проверка вопроса и переход
+    к следующему/предыдущему — поиск в словаре, а не list.index. Порядок вопросов и ответы хранятся
+    под прежними ключами сессии (get_session_keys); для сессий, начатых до появления позиций,
+    словарь восстанавливается при первом обращении.
+    """
+
+    def __init__(self, session, quiz_id):
+        self.session = session
+        self.quiz_id = quiz_id
+        self.questions_key, self.answers_key = get_session_keys(quiz_id)
+        self.positions_key = f'quiz_{quiz_id}_positions'
+        self._positions = None
+
+    def start(self, question_ids) -> None:
+        question_ids = list(question_ids)
+        self.session[self.questions_key] = question_ids
+        self.session[self.answers_key] = {}
+        # Ключи JSON-сессии — строки
+        self.session[self.positions_key] = {str(qid): i for i, qid in enumerate(question_ids)}
+        self._positions = None
+
+    @property
+    def question_ids(self) -> list:
+        return self.session.get(self.questions_key, [])
+
+    @property
+    def answers(self) -> dict:
+        return self.session.get(self.answers_key, {})
+
+    @property
+    def positions(self) -> dict:
+        if self._positions is None:
+            positions = self.session.get(self.positions_key)
+            if positions is None or len(positions) != len(self.question_ids):
+                positions = {str(qid): i for i, qid in enumerate(self.question_ids)}
+                if positions:
+                    self.session[self.positions_key] = positions
+            self._positions = positions
+        return self._positions
+
+    def position(self, question_id):
+        """Индекс вопроса в тесте или None, если вопроса в этом прохождении нет."""
+        return self.positions.get(str(question_id))
+
+    def next_id(self, question_id):
+        position = self.position(question_id)
+        question_ids = self.question_ids
+        if position is None or position + 1 >= len(question_ids):
+            return None
+        return question_ids[position + 1]
+
+    def previous_id(self, question_id):
+        position = self.position(question_id)
+        return self.question_ids[position - 1] if position else None
+
+    def progress(self, question_id) -> int:
+        return int(self.position(question_id) / len(self.question_ids) * 100)
+
+    def record_answer(self, question_id, answer_ids) -> None:
+        answers = self.answers
+        answers[str(question_id)] = [int(aid) for aid in answer_ids]
+        self.session[self.answers_key] = answers
+
+    def clear(self) -> None:
+        for key in (self.questions_key, self.answers_key, self.positions_key):
+            self.session.pop(key, None)
+
+
+def question_payload_cache_key(question_id) -> str:
+    return f'quiz-question:v{QUESTION_PAYLOAD_VERSION}:{question_id}'
+
+
+def build_question_payload(question, answers) -> dict:
+    """html — форма вопроса для страницы прохождения, остальное — фрагменты для разбора на странице результатов."""
+    return {
+        'id': question.id,
+        'title': Truncator(question.text).chars(30),
+        'html': render_to_string('quiz/partials/question_body.html', {'question': question, 'answers': answers}),
+        'text_html': str(stored_html(question.text_html, question.text)),
+        'explanation_html': str(stored_html(question.explanation_html, question.explanation)),
+        'answers': [{'id': answer.id, 'html': str(stored_html(answer.text_html, answer.text))} for answer in answers],
+    }
+
+
+def get_question_payloads(question_ids) -> dict:
+    """{id: payload} отрендеренных вопросов с вариантами ответов (одинаковы для всех пользователей).
+
+    Кэш читается одним get_many; промахи собираются одним запросом — ответы вместе с вопросами через
+    JOIN (и отдельный запрос только для вопросов без вариантов ответа). Удалённых вопросов в словаре нет.
+    Инвалидируется сигналами при изменении вопроса или его ответов.
+    """
+    keys = {question_payload_cache_key(qid): qid for qid in question_ids}
+    payloads = {keys[key]: payload for key, payload in cache.get_many(keys).items()}
+    missing = [qid for qid in question_ids if qid not in payloads]
+    if missing:
+        questions, answers = {}, {}
+        for answer in Answer.objects.filter(question_id__in=missing).select_related('question').order_by('id'):
+            questions[answer.question_id] = answer.question
+            answers.setdefault(answer.question_id, []).append(answer)
+        without_answers = [qid for qid in missing if qid not in questions]
+        if without_answers:
+            questions.update(Question.objects.in_bulk(without_answers))
+        built = {qid: build_question_payload(question, answers.get(qid, [])) for qid, question in questions.items()}
+        cache.set_many({question_payload_cache_key(qid): payload for qid, payload in built.items()},
+                       QUESTION_PAYLOAD_TTL)
+        payloads.update(built)
+    return payloads
+
+
+def get_question_payload(question_id) -> dict:
+    """Payload одного вопроса (см. get_question_payloads); Http404, если вопрос удалён."""
+    payload = get_question_payloads([question_id]).get(question_id)
+    if payload is None:
+        raise Http404("Вопрос не найден")
+    return payload
+
+
+def invalidate_question_payloads(question_ids) -> None:
+    cache.delete_many([question_payload_cache_key(qid) for qid in question_ids])
@@ -0,0 +1,40 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .answer_keys import invalidate_answer_keys, quiz_ids_for_questions
+from .models import Answer, Question, Quiz
+from .session import invalidate_question_payloads
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def _answer_changed(sender, instance, **kwargs):
+    invalidate_answer_keys(quiz_ids_for_questions([instance.question_id]))
+    invalidate_question_payloads([instance.question_id])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def _question_changed(sender, instance, **kwargs):
+    invalidate_question_payloads([instance.pk])
+
+
+@receiver(pre_delete, sender=Question)  # после удаления связи вопроса с тестами уже не найти
+def _question_deleted(sender, instance, **kwargs):
+    invalidate_answer_keys(quiz_ids_for_questions([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Quiz.questions.through)
+def _quiz_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:  # quiz.questions.add/remove/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_answer_keys([instance.pk])
+    elif action in ('post_add', 'post_remove'):  # question.quizzes.add/remove
+        invalidate_answer_keys(pk_set)
+    elif action == 'pre_clear':  # после clear тесты вопроса уже не найти
+        invalidate_answer_keys(quiz_ids_for_questions([instance.pk]))
+
+
+@receiver(post_delete, sender=Quiz)
+def _quiz_deleted(sender, instance, **kwargs):
+    invalidate_answer_keys([instance.pk])
@@ -1,21 +1,10 @@
 from django import template
 from django.utils.safestring import mark_safe
-import markdown
+
+from ..rendering import render_markdown
 
 register = template.Library()
 
-# Настройки Markdown: включаем базовые расширения и поддерживаем простые конструкции.
-# Формулы LaTeX не преобразуются markdown-пакетом, их рендерит MathJax на клиенте.
-# Поэтому мы оставляем символы $ ... $ и $$ ... $$ нетронутыми.
-MARKDOWN_EXTENSIONS = [
-    'extra',        # Таблицы, списки и прочее
-    'abbr',
-    'attr_list',
-    'def_list',
-    'fenced_code',
-    'footnotes',
-    'tables'
-]
 
 @register.filter(name='markdownify')
 def markdownify(value: str) -> str:
@@ -25,8 +14,19 @@ def markdownify(value: str) -> str:
         - Формулы вида $...$ или $$...$$ не изменяются и будут отрендерены MathJax (конфигурация в base.html).
         - Безопасность: результат помечен как safe, предполагается что ввод контролируется (админ / подготовленные материалы).
             Если нужен ввод от пользователей — следует добавить санитайзинг (bleach и whitelist тегов).
+        - Повторные тексты берутся из LRU-кэша render_markdown (apps/quiz/rendering.py).
         """
         if not value:
                 return ''
-        html = markdown.markdown(value, extensions=MARKDOWN_EXTENSIONS, output_format='html5')
-        return mark_safe(html)
+        return mark_safe(render_markdown(value))
+
+
+@register.filter(name='stored_html')
+def stored_html(html: str, source: str) -> str:
+        """Сохранённый в модели HTML (например, question.text_html), а если его нет — рендер исходного Markdown.
+
+        Использование: {{ question.text_html|stored_html:question.text }}
+        """
+        if html:
+                return mark_safe(html)
+        return markdownify(source)
@@ -1,4 +1,6 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from django.template import Context, Template
 
 
@@ -26,3 +28,177 @@ class MarkdownFilterTests(TestCase):
 		self.assertIn('$$P(\\text{ошибка}) = \\alpha$$', html)
 		# Текст до формулы сохраняется
 		self.assertIn('Формула:', html)
+
+
+class QuizHistoryPaginationTests(TestCase):
+	def setUp(self):
+		from apps.users.models import User
+		from .models import Quiz, QuizResult
+		self.user = User.objects.create_user(username='quizhistory', password='password123')
+		quiz = Quiz.objects.create(title='Тест')
+		QuizResult.objects.bulk_create([QuizResult(user=self.user, quiz=quiz, score=i) for i in range(12)])
+		self.client.force_login(self.user)
+
+	@override_settings(HISTORY_PAGINATION='keyset')
+	def test_keyset_pages_without_count(self):
+		response = self.client.get(reverse('quiz:history'))
+		page = response.context['results']
+		self.assertEqual(len(page), 10)
+		self.assertTrue(page.has_next)
+		second = self.client.get(reverse('quiz:history'), {'after': page.next_cursor}).context['results']
+		self.assertEqual(len(second), 2)
+		self.assertFalse(second.has_next)
+		self.assertTrue(second.has_previous)
+
+	@override_settings(HISTORY_PAGINATION='offset')
+	def test_offset_mode_keeps_page_numbers(self):
+		response = self.client.get(reverse('quiz:history'), {'page': 2})
+		self.assertEqual(response.context['results'].number, 2)
+		self.assertContains(response, '?page=1')
+
+
+class QuizResultsQueryTests(TestCase):
+	def setUp(self):
+		from apps.users.models import User
+		from .models import Quiz, Question, Answer
+		cache.clear()  # ключи ответов кэшируются по id теста, а id после отката транзакции повторяются
+		self.user = User.objects.create_user(username='quizscore', password='password123')
+		self.quiz = Quiz.objects.create(title='Большой тест')
+		questions = Question.objects.bulk_create([Question(text=f'Вопрос {i}') for i in range(100)])
+		self.quiz.questions.set(questions)
+		Answer.objects.bulk_create([
+			Answer(question=question, text=f'Ответ {j}', is_correct=(j == 0))
+			for question in questions for j in range(4)
+		])
+		self.question_ids = [question.id for question in questions]
+		self.correct = {
+			str(answer.question_id): [answer.id]
+			for answer in Answer.objects.filter(question__in=questions, is_correct=True)
+		}
+
+	def _start(self, answers):
+		from .answer_keys import get_answer_key
+		from .session import get_question_payloads
+		get_answer_key(self.quiz.id)  # ключ собирается при старте теста (quiz_start_view)
+		get_question_payloads(self.question_ids)  # вопросы кэшируются при показе (question_view)
+		session = self.client.session
+		session[f'quiz_{self.quiz.id}_questions'] = self.question_ids
+		session[f'quiz_{self.quiz.id}_answers'] = answers
+		session.save()
+
+	def test_results_use_constant_number_of_queries(self):
+		self.client.force_login(self.user)
+		answers = dict(self.correct)
+		answers[str(self.question_ids[0])] = []  # один вопрос без ответа
+		self._start(answers)
+		# сессия, тест, пользователь, запись QuizResult, сохранение сессии (+2 SAVEPOINT): вопросы и ответы
+		# для разбора берутся из кэша, число запросов не зависит от числа вопросов
+		with self.assertNumQueries(7):
+			response = self.client.get(reverse('quiz:results', args=[self.quiz.id]))
+		self.assertEqual(response.context['correct_count'], 99)
+		self.assertEqual(response.context['score'], 99.0)
+		first = response.context['results'][0]
+		self.assertFalse(first['is_correct'])
+		self.assertEqual(first['user_answers'], [])
+		self.assertEqual([answer['html'] for answer in first['correct_answers']], ['<p>Ответ 0</p>'])
+		self.assertContains(response, 'Вопрос 0')
+
+
+class AnswerKeyTests(TestCase):
+	def setUp(self):
+		from .models import Quiz, Question, Answer
+		cache.clear()
+		self.quiz = Quiz.objects.create(title='Ключ')
+		self.question = Question.objects.create(text='Вопрос')
+		self.quiz.questions.add(self.question)
+		self.right = Answer.objects.create(question=self.question, text='да', is_correct=True)
+		self.wrong = Answer.objects.create(question=self.question, text='нет')
+
+	def test_key_is_cached_and_scores_without_queries(self):
+		from .answer_keys import get_answer_key
+		key = get_answer_key(self.quiz.id)
+		self.assertEqual(key.question_ids, (self.question.id,))
+		with self.assertNumQueries(0):
+			key = get_answer_key(self.quiz.id)
+			self.assertEqual(key.score(key.question_ids, {str(self.question.id): [self.right.id]}), 1)
+			self.assertEqual(key.score(key.question_ids, {str(self.question.id): [self.right.id, self.wrong.id]}), 0)
+
+	def test_key_is_invalidated_by_answer_and_question_changes(self):
+		from .answer_keys import get_answer_key
+		from .models import Question
+		get_answer_key(self.quiz.id)
+		self.wrong.is_correct = True
+		self.wrong.save()
+		self.assertEqual(get_answer_key(self.quiz.id).correct[self.question.id], {self.right.id, self.wrong.id})
+
+		extra = Question.objects.create(text='Ещё вопрос')
+		extra.quizzes.add(self.quiz)
+		self.assertEqual(len(get_answer_key(self.quiz.id).question_ids), 2)
+		extra.delete()
+		self.assertEqual(get_answer_key(self.quiz.id).question_ids, (self.question.id,))
+		self.quiz.questions.clear()
+		self.assertEqual(get_answer_key(self.quiz.id).question_ids, ())
+
+
+class QuizNavigationTests(TestCase):
+	def setUp(self):
+		from .models import Quiz, Question, Answer
+		cache.clear()
+		self.quiz = Quiz.objects.create(title='Навигация')
+		self.questions = [Question.objects.create(text=f'Вопрос **{i}**') for i in range(3)]
+		self.quiz.questions.set(self.questions)
+		self.answers = [Answer.objects.create(question=q, text='да', is_correct=True) for q in self.questions]
+
+	def test_walk_through_quiz_with_cached_questions(self):
+		self.client.get(reverse('quiz:start', args=[self.quiz.id]))
+		first = self.questions[0]
+		url = reverse('quiz:question', args=[self.quiz.id, first.id])
+		with self.assertNumQueries(2):  # сессия + вопрос с ответами одним JOIN
+			response = self.client.get(url)
+		self.assertContains(response, '<strong>0</strong>')
+		self.assertContains(response, f'value="{self.answers[0].id}"')
+		with self.assertNumQueries(1):  # только сессия: вопрос уже отрендерен и в кэше
+			self.client.get(url)
+
+		for question, answer in zip(self.questions, self.answers):
+			response = self.client.post(reverse('quiz:check_answer', args=[self.quiz.id, question.id]),
+										{'answer': [answer.id]})
+		self.assertRedirects(response, reverse('quiz:results', args=[self.quiz.id]), fetch_redirect_response=False)
+		self.assertEqual(self.client.get(response.url).context['correct_count'], 3)
+
+	def test_question_cache_is_invalidated_and_foreign_question_redirects(self):
+		from .models import Question
+		self.client.get(reverse('quiz:start', args=[self.quiz.id]))
+		url = reverse('quiz:question', args=[self.quiz.id, self.questions[1].id])
+		self.client.get(url)
+		self.answers[1].text = 'исправленный ответ'
+		self.answers[1].save()
+		self.assertContains(self.client.get(url), 'исправленный ответ')
+
+		other = Question.objects.create(text='Чужой вопрос')
+		response = self.client.post(reverse('quiz:check_answer', args=[self.quiz.id, other.id]), {})
+		self.assertRedirects(response, reverse('quiz:list'), fetch_redirect_response=False)
+
+
+class StoredHtmlTests(TestCase):
+	def test_html_is_rendered_on_save_and_used_by_templates(self):
+		from .models import Question, Answer
+		question = Question.objects.create(text='**Вопрос**', explanation='Сноска[^1]\n\n[^1]: текст')
+		answer = Answer.objects.create(question=question, text='$x$ и *да*')
+		self.assertEqual(question.text_html, '<p><strong>Вопрос</strong></p>')
+		self.assertIn('footnote', question.explanation_html)
+		self.assertEqual(answer.text_html, '<p>$x$ и <em>да</em></p>')
+
+		tpl = Template("""{% load quiz_markdown %}{{ q.text_html|stored_html:q.text }}|{{ a.text_html|stored_html:a.text }}""")
+		question.text_html = '<p>сохранённый</p>'
+		answer.text_html = ''  # например, строка из bulk_create — рендерится на лету
+		html = tpl.render(Context({'q': question, 'a': answer}))
+		self.assertEqual(html, '<p>сохранённый</p>|<p>$x$ и <em>да</em></p>')
+
+	def test_rendering_reuses_state_free_converter(self):
+		from .rendering import render_markdown
+		first = render_markdown.__wrapped__('Текст[^1]\n\n[^1]: сноска')
+		# Сноска предыдущего текста не должна попасть в следующий — экземпляр сбрасывается reset()
+		self.assertNotIn('footnote', render_markdown.__wrapped__('Просто текст'))
+		self.assertIn('footnote', first)
+		self.assertIs(render_markdown('*a*'), render_markdown('*a*'))
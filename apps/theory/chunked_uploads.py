@@ -0,0 +1,121 @@
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .images import validate_image
+from .models import ChunkedUpload
+
+# Размер буфера при копировании части из запроса во временный файл
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class OffsetMismatch(ValueError):
+    """Часть пришла не с того смещения: клиент должен продолжить с offset (его знает сервер)."""
+
+    def __init__(self, offset: int):
+        super().__init__(f'Ожидалась часть со смещения {offset}')
+        self.offset = offset
+
+
+def upload_settings() -> dict:
+    return settings.THEORY_CHUNKED_UPLOAD
+
+
+def temp_path(upload: ChunkedUpload) -> str:
+    return os.path.join(upload_settings()['TEMP_DIR'], f'{upload.id}.part')
+
+
+def start_upload(user, name: str, size: int, content_type: str, sha256: str = '') -> ChunkedUpload:
+    """Создаёт загрузку и пустой временный файл; ValueError, если файл не подходит по типу или размеру."""
+    error = validate_image(name, content_type, size, upload_settings()['MAX_SIZE'])
+    if error:
+        raise ValueError(error)
+    if size <= 0:
+        raise ValueError('Выбранный файл пустой')
+    if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256.lower())):
+        raise ValueError('Некорректная контрольная сумма файла')
+
+    purge_stale_uploads()
+    upload = ChunkedUpload.objects.create(
+        user=user, original_name=os.path.basename(name), content_type=content_type, size=size,
+        sha256=sha256.lower(),
+    )
+    os.makedirs(upload_settings()['TEMP_DIR'], exist_ok=True)
+    open(temp_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload_id, user, offset: int, stream, length: int, checksum: str = '') -> ChunkedUpload:
+    """Дописывает часть длиной length из stream (файлоподобный объект запроса) со смещения offset.
+
+    Части одной загрузки обрабатываются по очереди (select_for_update). Часть копируется во временный
+    файл буферами, не собираясь в памяти; при обрыве или несовпадении SHA-256 (checksum) файл
+    обрезается обратно до offset, и ту же часть можно прислать снова.
+    """
+    if length <= 0 or length > upload_settings()['CHUNK_SIZE']:
+        raise ValueError(f"Размер части должен быть от 1 до {upload_settings()['CHUNK_SIZE']} байт")
+
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().filter(id=upload_id, user=user).first()
+        if upload is None:
+            raise ValueError('Загрузка не найдена или устарела')
+        if offset != upload.offset:
+            raise OffsetMismatch(upload.offset)
+        if offset + length > upload.size:
+            raise ValueError('Часть выходит за объявленный размер файла')
+
+        digest = hashlib.sha256()
+        received = 0
+        with open(temp_path(upload), 'r+b') as file:
+            file.seek(offset)
+            file.truncate()
+            while received < length:
+                data = stream.read(min(COPY_BUFFER_SIZE, length - received))
+                if not data:
+                    break
+                digest.update(data)
+                file.write(data)
+                received += len(data)
+            if received != length or (checksum and digest.hexdigest() != checksum.lower()):
+                file.truncate(offset)
+                raise ValueError('Часть получена не полностью' if received != length
+                                 else 'Контрольная сумма части не совпала')
+
+        upload.offset += length
+        upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def finish_upload(upload: ChunkedUpload) -> str:
+    """SHA-256 собранного файла; ValueError, если приняты не все части или хэш не совпал с объявленным."""
+    if upload.offset != upload.size:
+        raise ValueError(f'Получено {upload.offset} из {upload.size} байт')
+    digest = hashlib.sha256()
+    with open(temp_path(upload), 'rb') as file:
+        for data in iter(lambda: file.read(COPY_BUFFER_SIZE), b''):
+            digest.update(data)
+    sha256 = digest.hexdigest()
+    if upload.sha256 and sha256 != upload.sha256:
+        raise ValueError('Контрольная сумма файла не совпала')
+    return sha256
+
+
+def discard_upload(upload: ChunkedUpload) -> None:
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def purge_stale_uploads() -> int:
+    """Удаляет загрузки без новых частей дольше EXPIRE_HOURS вместе с временными файлами."""
+    deadline = timezone.now() - timedelta(hours=upload_settings()['EXPIRE_HOURS'])
+    stale = list(ChunkedUpload.objects.filter(updated_at__lt=deadline))
+    for upload in stale:
+        discard_upload(upload)
+    return len(stale)
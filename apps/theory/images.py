@@ -0,0 +1,156 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+
+from .models import Article, IMAGE_EXTENSIONS, IMAGES_DIR, UploadedImage
+
+IMAGE_CONTENT_TYPES = (
+    'image/jpeg',
+    'image/jpg',
+    'image/png',
+    'image/gif',
+    'image/webp',
+    'image/svg+xml',
+)
+# Предел обычной загрузки одним запросом; по частям можно больше (THEORY_CHUNKED_UPLOAD['MAX_SIZE'])
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
+
+class Sha256UploadHandler(FileUploadHandler):
+    """Считает SHA-256 файлов по мере приёма запроса и передаёт данные дальше без изменений.
+
+    Ставится первым в request.upload_handlers, файл сохраняют следующие обработчики
+    (в память или во временный файл), поэтому повторно читать загрузку ради хэша не нужно.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self._hash = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self._hash.hexdigest()
+        return None
+
+
+def uploaded_sha256(request, field_name: str, file) -> str:
+    """SHA-256 загруженного файла: из Sha256UploadHandler, а если его не было — по содержимому."""
+    for handler in request.upload_handlers:
+        if isinstance(handler, Sha256UploadHandler) and field_name in handler.digests:
+            return handler.digests[field_name]
+    return file_sha256(file)
+
+
+def validate_image(name: str, content_type: str, size: int, max_size: int = MAX_IMAGE_SIZE):
+    """Текст ошибки для недопустимого изображения или None: расширение, MIME тип и размер."""
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        return f'Недопустимое расширение файла. Разрешены: {", ".join(IMAGE_EXTENSIONS)}'
+    if content_type not in IMAGE_CONTENT_TYPES:
+        return 'Недопустимый тип файла. Разрешены только изображения.'
+    if size > max_size:
+        return (f'Файл слишком большой ({size / (1024*1024):.1f} МБ). '
+                f'Максимум {max_size // (1024 * 1024)} МБ.')
+    return None
+
+
+def format_size(size: int) -> str:
+    """Размер файла в удобном для галереи виде."""
+    if size < 1024:
+        return f"{size} Б"
+    if size < 1024 * 1024:
+        return f"{size // 1024} КБ"
+    return f"{size / (1024 * 1024):.1f} МБ"
+
+
+def image_dimensions(file, filename: str):
+    """(ширина, высота) растрового изображения или (None, None): SVG не измеряем, без Pillow — тоже."""
+    if os.path.splitext(filename)[1].lower() == '.svg':
+        return None, None
+    try:
+        width, height = get_image_dimensions(file)
+    except ImportError:  # Pillow не установлен
+        return None, None
+    except Exception:
+        return None, None
+    return width, height
+
+
+def file_sha256(file) -> str:
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_record(filename: str, file, original_name='', content_type='', mtime=None, sha256=None) -> UploadedImage:
+    """Несохранённая запись UploadedImage с метаданными файла file (размер, SHA-256, размеры в пикселях)."""
+    width, height = image_dimensions(file, filename)
+    return UploadedImage(
+        filename=filename,
+        original_name=original_name or filename,
+        size=file.size,
+        width=width,
+        height=height,
+        sha256=sha256 or file_sha256(file),
+        content_type=content_type or '',
+        mtime=mtime or timezone.now(),
+    )
+
+
+def content_filename(sha256: str, extension: str) -> str:
+    """Имя файла в хранилище по содержимому: одинаковые загрузки попадают в один файл."""
+    return f"{sha256}{extension.lower()}"
+
+
+def find_duplicate(sha256: str):
+    """Уже сохранённое изображение с таким содержимым или None (записи без файла не считаются)."""
+    for image in UploadedImage.objects.filter(sha256=sha256):
+        if default_storage.exists(image.path):
+            return image
+    return None
+
+
+def referencing_articles(filename: str):
+    """Статьи, в Markdown которых упоминается файл изображения."""
+    return Article.objects.filter(content_md__contains=f"{IMAGES_DIR}/{filename}")
+
+
+def register_image(saved_path: str, file, original_name='', content_type='', sha256=None) -> UploadedImage:
+    """Заносит в индекс файл, только что сохранённый в хранилище по пути saved_path."""
+    record = image_record(os.path.basename(saved_path), file, original_name, content_type, sha256=sha256)
+    UploadedImage.objects.filter(filename=record.filename).delete()
+    record.save()
+    return record
+
+
+def image_payload(image: UploadedImage, request) -> dict:
+    """Запись галереи в формате, который ожидает theory_admin.js."""
+    url = request.build_absolute_uri(settings.MEDIA_URL + f"{IMAGES_DIR}/{image.filename}")
+    # Миниатюра — наименьший WebP-вариант, пока его нет — сам файл
+    thumb = url
+    if image.variants:
+        smallest = min(image.variants, key=lambda variant: variant['width'])
+        thumb = request.build_absolute_uri(settings.MEDIA_URL + f"{IMAGES_DIR}/{smallest['filename']}")
+    return {
+        'filename': image.filename,
+        'url': url,
+        'thumb': thumb,
+        'size': format_size(image.size),
+        'created': timezone.localtime(image.mtime).strftime('%d.%m.%Y %H:%M'),
+        'original_name': image.original_name,
+        'markdown': f"![{image.original_name}]({url})",
+    }
@@ -0,0 +1,47 @@
+import mimetypes
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.theory.images import image_record
+from apps.theory.models import IMAGE_EXTENSIONS, IMAGES_DIR, UploadedImage
+
+
+class Command(BaseCommand):
+    help = ("Заносит в индекс UploadedImage изображения из каталога theory/images, которых в нём нет "
+            "(загруженные до появления индекса или в обход админки), и удаляет записи об исчезнувших файлах.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пачки bulk_create')
+        parser.add_argument('--no-prune', action='store_true', help='Не удалять записи о несуществующих файлах')
+
+    def handle(self, *args, **options):
+        if not default_storage.exists(IMAGES_DIR):
+            self.stdout.write("Каталог изображений отсутствует, индексировать нечего")
+            return
+
+        _, files = default_storage.listdir(IMAGES_DIR)
+        files = {name for name in files if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS}
+        known = set(UploadedImage.objects.values_list('filename', flat=True))
+
+        batch, created = [], 0
+        for name in sorted(files - known):
+            path = f"{IMAGES_DIR}/{name}"
+            with default_storage.open(path) as file:
+                batch.append(image_record(
+                    name, file,
+                    content_type=mimetypes.guess_type(name)[0] or '',
+                    mtime=default_storage.get_modified_time(path),
+                ))
+            if len(batch) >= options['batch_size']:
+                created += len(UploadedImage.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        if batch:
+            created += len(UploadedImage.objects.bulk_create(batch, ignore_conflicts=True))
+
+        pruned = 0
+        if not options['no_prune']:
+            pruned, _ = UploadedImage.objects.filter(filename__in=known - files).delete()
+
+        self.stdout.write(f"Добавлено записей: {created}, удалено устаревших: {pruned}")
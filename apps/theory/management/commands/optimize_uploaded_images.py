@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.theory.models import UploadedImage
+from apps.theory.optimization import optimize_and_rerender, pillow_available
+
+
+class Command(BaseCommand):
+    help = ("Создаёт WebP-варианты для изображений, которые ещё не оптимизированы (загруженные до появления "
+            "фоновой задачи), и обновляет HTML статей с ними. Выполняется в текущем процессе, без Celery.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересоздать варианты и для уже оптимизированных')
+
+    def handle(self, *args, **options):
+        if not pillow_available():
+            raise CommandError('Для оптимизации изображений нужен Pillow (см. requirements.txt)')
+        images = UploadedImage.objects.all()
+        if not options['all']:
+            images = images.filter(optimized_at__isnull=True)
+        processed = 0
+        for image_id in images.values_list('id', flat=True).iterator():
+            optimize_and_rerender(image_id)
+            processed += 1
+        self.stdout.write(f"Обработано изображений: {processed}")
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theory', '0003_convert_to_markdown'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadedImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, unique=True, verbose_name='Имя файла в хранилище')),
+                ('original_name', models.CharField(blank=True, max_length=255, verbose_name='Исходное имя')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер, байт')),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('mtime', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменён')),
+            ],
+            options={
+                'verbose_name': 'Изображение',
+                'verbose_name_plural': 'Изображения',
+                'ordering': ['-mtime', '-id'],
+                'indexes': [models.Index(fields=['-mtime', '-id'], name='uploaded_image_mtime')],
+            },
+        ),
+    ]
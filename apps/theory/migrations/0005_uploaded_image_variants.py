@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theory', '0004_uploaded_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='optimized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
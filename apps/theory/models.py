@@ -1,5 +1,16 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 import markdown
+import re
+import uuid
+
+from .responsive_images import ResponsiveImagesExtension
+
+# Каталог изображений статей внутри MEDIA_ROOT и допустимые расширения
+IMAGES_DIR = 'theory/images'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg')
+IMAGE_REFERENCE_RE = re.compile(re.escape(IMAGES_DIR) + r'/([\w.-]+)')
 
 class Article(models.Model):
     title = models.CharField(max_length=200)
@@ -27,9 +38,71 @@ class Article(models.Model):
                     'markdown.extensions.codehilite', # Подсветка синтаксиса кода
                     'markdown.extensions.toc',        # Генерация оглавления
                     'markdown.extensions.nl2br',      # Поддержка переносов строк
+                    ResponsiveImagesExtension(self.responsive_images(), IMAGES_DIR),  # srcset для WebP-вариантов
                 ]
             )
             self.content_html = md.convert(self.content_md)
         else:
             self.content_html = ''
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+    def responsive_images(self) -> dict:
+        """Оптимизированные изображения, на которые ссылается статья: {имя файла: размеры и варианты}."""
+        filenames = set(IMAGE_REFERENCE_RE.findall(self.content_md or ''))
+        if not filenames:
+            return {}
+        images = UploadedImage.objects.filter(filename__in=filenames, optimized_at__isnull=False) \
+            .values('filename', 'width', 'height', 'variants')
+        return {image['filename']: image for image in images}
+
+
+class UploadedImage(models.Model):
+    """Метаданные загруженного изображения статьи: галерея читает их из БД, а не сканирует каталог."""
+    filename = models.CharField(max_length=255, unique=True, verbose_name="Имя файла в хранилище")
+    original_name = models.CharField(max_length=255, blank=True, verbose_name="Исходное имя")
+    size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    mtime = models.DateTimeField(default=timezone.now, verbose_name="Изменён")
+    # WebP-варианты разной ширины: [{'width', 'height', 'filename', 'size'}], filename — относительно IMAGES_DIR
+    variants = models.JSONField(default=list, blank=True)
+    optimized_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-mtime', '-id']
+        indexes = [
+            # Галерея: новые сверху, keyset-пагинация по (mtime, id)
+            models.Index(fields=['-mtime', '-id'], name='uploaded_image_mtime'),
+        ]
+        verbose_name = "Изображение"
+        verbose_name_plural = "Изображения"
+
+    def __str__(self):
+        return self.filename
+
+    @property
+    def path(self) -> str:
+        return f"{IMAGES_DIR}/{self.filename}"
+
+
+class ChunkedUpload(models.Model):
+    """Незавершённая загрузка изображения по частям: принятые байты лежат во временном файле (см. chunked_uploads)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField(verbose_name="Размер файла, байт")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Принято байт")
+    # SHA-256 всего файла, если клиент передал его при создании загрузки
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Загрузка по частям"
+        verbose_name_plural = "Загрузки по частям"
+
+    def __str__(self):
+        return f"{self.original_name} ({self.offset}/{self.size})"
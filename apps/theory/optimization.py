@@ -0,0 +1,170 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .images import referencing_articles
+from .models import IMAGES_DIR, UploadedImage
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # Pillow ставится из requirements.txt; без него изображения отдаются как есть
+    Image = ImageOps = UnidentifiedImageError = None
+
+logger = logging.getLogger(__name__)
+
+# Варианты лежат в подкаталоге IMAGES_DIR: theory/images/variants/<имя>-<ширина>w.webp
+VARIANTS_DIR = 'variants'
+VARIANT_WIDTHS = (480, 960, 1600)
+WEBP_QUALITY = 80
+# Качество пересохранения исходного JPEG/WebP без метаданных: выше, чем у вариантов, это «оригинал»
+ORIGINAL_QUALITY = 90
+# SVG — вектор, GIF может быть анимированным: такие файлы отдаются без обработки
+OPTIMIZABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def variant_filename(filename: str, width: int) -> str:
+    """Путь варианта относительно IMAGES_DIR."""
+    return f"{VARIANTS_DIR}/{os.path.splitext(filename)[0]}-{width}w.webp"
+
+
+def target_widths(width: int) -> list:
+    """Ширины вариантов: стандартные меньше исходной и сама исходная, если она не больше максимальной."""
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    if width <= VARIANT_WIDTHS[-1]:
+        widths.append(width)
+    return widths
+
+
+def encode_webp(image, width: int):
+    """(высота, байты WebP) для изображения, уменьшенного до ширины width.
+
+    Сохраняется только растр (и ICC-профиль для верной цветопередачи): EXIF, XMP и текстовые
+    блоки PNG в вариант не попадают.
+    """
+    if width != image.width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+    options = {'quality': WEBP_QUALITY}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', **options)
+    return image.height, buffer.getvalue()
+
+
+def encode_original(image, extension: str) -> bytes:
+    """Байты изображения в формате по расширению без EXIF, XMP и текстовых блоков PNG.
+
+    Как и в encode_webp, сохраняется только растр и ICC-профиль.
+    """
+    options = {}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if extension == '.png':
+        image_format = 'PNG'
+        options['optimize'] = True
+    elif extension == '.webp':
+        image_format = 'WEBP'
+        options['quality'] = ORIGINAL_QUALITY
+    else:
+        image_format = 'JPEG'
+        options.update(quality=ORIGINAL_QUALITY, optimize=True)
+        if image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def strip_metadata(file, extension: str):
+    """ContentFile с загруженным изображением без метаданных (EXIF с GPS, XMP, текст PNG) или None.
+
+    Вызывается при загрузке до сохранения в хранилище, поэтому исходные байты с метаданными не
+    публикуются. None — без Pillow, для SVG/GIF и для нечитаемых файлов: они сохраняются как есть.
+    """
+    if not pillow_available() or extension not in OPTIMIZABLE_EXTENSIONS:
+        return None
+    try:
+        file.seek(0)
+        source = Image.open(file)
+        source = ImageOps.exif_transpose(source)  # поворот из EXIF применяется до удаления метаданных
+        source.load()
+        return ContentFile(encode_original(source, extension))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception("Не удалось удалить метаданные изображения %s", getattr(file, 'name', ''))
+        return None
+    finally:
+        file.seek(0)
+
+
+def delete_variants(image: UploadedImage) -> None:
+    for variant in image.variants:
+        default_storage.delete(f"{IMAGES_DIR}/{variant['filename']}")
+
+
+def optimize_image(image: UploadedImage) -> list:
+    """Создаёт WebP-варианты изображения разной ширины и записывает их в image.variants.
+
+    Исходный файл не меняется: метаданные удалены при загрузке (strip_metadata). Повторный запуск
+    пересоздаёт варианты. Без Pillow, для SVG/GIF и для нечитаемых файлов возвращает [].
+    """
+    if not pillow_available():
+        logger.warning("Pillow не установлен, изображение %s не оптимизировано", image.filename)
+        return []
+    if os.path.splitext(image.filename)[1].lower() not in OPTIMIZABLE_EXTENSIONS:
+        return []
+
+    try:
+        with default_storage.open(image.path, 'rb') as file:
+            source = Image.open(file)
+            source = ImageOps.exif_transpose(source)  # поворот из EXIF применяется до удаления метаданных
+            source.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception("Не удалось открыть изображение %s", image.filename)
+        return []
+
+    if source.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in source.mode or 'transparency' in source.info
+        source = source.convert('RGBA' if has_alpha else 'RGB')
+
+    delete_variants(image)
+    variants = []
+    for width in target_widths(source.width):
+        height, data = encode_webp(source, width)
+        filename = variant_filename(image.filename, width)
+        path = f"{IMAGES_DIR}/{filename}"
+        default_storage.delete(path)
+        default_storage.save(path, ContentFile(data))
+        variants.append({'width': width, 'height': height, 'filename': filename, 'size': len(data)})
+
+    image.width, image.height = source.size
+    image.variants = variants
+    image.optimized_at = timezone.now()
+    image.save(update_fields=['width', 'height', 'variants', 'optimized_at'])
+    return variants
+
+
+def optimize_and_rerender(image_id: int) -> None:
+    """Оптимизирует изображение и перестраивает HTML статей, которые на него ссылаются (для srcset)."""
+    image = UploadedImage.objects.filter(id=image_id).first()
+    if image is None:
+        return
+    if optimize_image(image):
+        for article in referencing_articles(image.filename):
+            article.save(update_fields=['content_html'])
+
+
+def schedule_optimization(image: UploadedImage) -> None:
+    """Ставит оптимизацию в очередь Celery после фиксации транзакции с записью изображения."""
+    from .tasks import optimize_uploaded_image
+
+    transaction.on_commit(lambda: optimize_uploaded_image.delay(image.id))
@@ -0,0 +1,49 @@
+from urllib.parse import urlsplit
+
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+
+class ResponsiveImagesTreeprocessor(Treeprocessor):
+    """Добавляет srcset/sizes, loading="lazy" и размеры к <img>, для которых есть WebP-варианты."""
+
+    def __init__(self, md, images: dict, images_dir: str):
+        super().__init__(md)
+        self.images = images
+        self.images_dir = images_dir.strip('/')
+
+    def run(self, root):
+        for img in root.iter('img'):
+            src = img.get('src', '')
+            directory, _, filename = urlsplit(src).path.rpartition('/')
+            image = self.images.get(filename)
+            if image is None or not directory.endswith(f'/{self.images_dir}'):
+                continue
+            variants = sorted(image['variants'], key=lambda variant: variant['width'])
+            if not variants:
+                continue
+            # Варианты лежат рядом с исходным файлом, поэтому база URL (и хост) берутся из src
+            base = src[:src.rindex(filename)]
+            largest = variants[-1]['width']
+            img.set('srcset', ', '.join(f"{base}{variant['filename']} {variant['width']}w" for variant in variants))
+            img.set('sizes', f"(max-width: {largest}px) 100vw, {largest}px")
+            img.set('loading', 'lazy')
+            img.set('decoding', 'async')
+            if image.get('width') and image.get('height') and 'width' not in img.attrib:
+                # Размеры резервируют место до загрузки и убирают сдвиг вёрстки
+                img.set('width', str(image['width']))
+                img.set('height', str(image['height']))
+
+
+class ResponsiveImagesExtension(Extension):
+    """images — {имя файла: {'width', 'height', 'variants'}} для изображений из каталога images_dir."""
+
+    def __init__(self, images: dict, images_dir: str, **kwargs):
+        self.images = images
+        self.images_dir = images_dir
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        # После inline (20): к этому моменту ![...](...) уже превращены в <img>
+        md.treeprocessors.register(ResponsiveImagesTreeprocessor(md, self.images, self.images_dir),
+                                   'responsive_images', 15)
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .optimization import optimize_and_rerender
+
+
+@shared_task
+def optimize_uploaded_image(image_id: int) -> None:
+    """Создаёт WebP-варианты загруженного изображения и обновляет HTML статей с ним."""
+    optimize_and_rerender(image_id)
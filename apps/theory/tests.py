@@ -1,7 +1,29 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
+from io import StringIO
+import hashlib
+import io
 import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from .models import Article, ChunkedUpload, UploadedImage
+from .optimization import pillow_available
+
+# Минимальный корректный PNG 1x1
+PNG_1X1 = bytes.fromhex(
+	'89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489'
+	'0000000d49444154789c6360000002000005000155e2f2560000000049454e44ae426082'
+)
 
 
 class AdminPreviewTests(TestCase):
@@ -28,3 +50,323 @@ class AdminPreviewTests(TestCase):
 		self.assertIn('$E=mc^2$', html)
 		# Сигнал для MathJax
 		self.assertTrue(data.get('trigger_mathjax'))
+
+
+class UploadedImageIndexTests(TestCase):
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+		override = override_settings(MEDIA_ROOT=self.media_root)
+		override.enable()
+		self.addCleanup(override.disable)
+
+	def upload(self, name='plot.png', content=PNG_1X1):
+		image = SimpleUploadedFile(name, content, content_type='image/png')
+		return self.client.post(reverse('theory:upload_image'), {'image': image}).json()
+
+	def test_upload_indexes_image_and_gallery_reads_index(self):
+		uploaded = self.upload()
+		self.assertTrue(uploaded['success'])
+		image = UploadedImage.objects.get(filename=uploaded['filename'])
+		self.assertEqual(image.original_name, 'plot.png')
+		self.assertEqual(image.size, len(PNG_1X1))
+		self.assertEqual(image.sha256, hashlib.sha256(PNG_1X1).hexdigest())
+		self.assertEqual(image.content_type, 'image/png')
+
+		with self.assertNumQueries(2):  # версия индекса для ETag и сама страница
+			data = self.client.get(reverse('theory:get_images')).json()
+		self.assertTrue(data['success'])
+		self.assertEqual(data['count'], 1)
+		self.assertIsNone(data['next'])
+		entry = data['images'][0]
+		self.assertEqual(entry['filename'], image.filename)
+		self.assertEqual(entry['original_name'], 'plot.png')
+		self.assertEqual(entry['size'], f'{len(PNG_1X1)} Б')
+		self.assertTrue(entry['url'].endswith(f'/theory/images/{image.filename}'))
+
+		response = self.client.post(reverse('theory:delete_image'), data=json.dumps({'filename': image.filename}),
+									content_type='application/json')
+		self.assertTrue(response.json()['success'])
+		self.assertFalse(UploadedImage.objects.exists())
+
+	def test_gallery_pages_by_cursor(self):
+		names = [self.upload(f'img{i}.png', PNG_1X1 + bytes([i]))['filename'] for i in range(5)]
+		seen, after = [], None
+		while True:
+			params = {'limit': 2, 'after': after} if after else {'limit': 2}
+			data = self.client.get(reverse('theory:get_images'), params).json()
+			seen += [img['filename'] for img in data['images']]
+			after = data['next']
+			if not after:
+				break
+		self.assertEqual(seen, names[::-1])
+
+	def test_identical_upload_is_stored_once_by_digest(self):
+		digest = hashlib.sha256(PNG_1X1).hexdigest()
+		first = self.upload('figure.png')
+		self.assertEqual(first['filename'], f'{digest}.png')
+		self.assertFalse(first['duplicate'])
+
+		second = self.upload('figure-copy.png')
+		self.assertTrue(second['duplicate'])
+		self.assertEqual(second['url'], first['url'])
+		self.assertEqual(UploadedImage.objects.count(), 1)
+		self.assertEqual(default_storage.listdir('theory/images')[1], [f'{digest}.png'])
+
+	def test_upload_keeps_csrf_protection(self):
+		client = Client(enforce_csrf_checks=True)
+		image = SimpleUploadedFile('plot.png', PNG_1X1, content_type='image/png')
+		response = client.post(reverse('theory:upload_image'), {'image': image})
+		self.assertEqual(response.status_code, 403)
+		self.assertFalse(UploadedImage.objects.exists())
+
+	def test_delete_refuses_image_referenced_by_article(self):
+		uploaded = self.upload()
+		article = Article.objects.create(title='Мощность критерия', slug='power',
+										 content_md=f"![график]({uploaded['url']})")
+		url = reverse('theory:delete_image')
+		payload = json.dumps({'filename': uploaded['filename']})
+
+		data = self.client.post(url, data=payload, content_type='application/json').json()
+		self.assertFalse(data['success'])
+		self.assertIn('Мощность критерия', data['error'])
+		self.assertTrue(default_storage.exists(f"theory/images/{uploaded['filename']}"))
+
+		article.delete()
+		self.assertTrue(self.client.post(url, data=payload, content_type='application/json').json()['success'])
+		self.assertFalse(default_storage.exists(f"theory/images/{uploaded['filename']}"))
+
+	def test_light_fields(self):
+		filename = self.upload()['filename']
+		data = self.client.get(reverse('theory:get_images'), {'fields': 'light'}).json()
+		self.assertEqual(data['images'], [{'filename': filename, 'url': f'/media/theory/images/{filename}'}])
+
+	def test_conditional_get_returns_304_until_index_changes(self):
+		self.upload()
+		url = reverse('theory:get_images')
+		response = self.client.get(url)
+		etag = response['ETag']
+		self.assertIn('no-cache', response['Cache-Control'])
+
+		with self.assertNumQueries(1):  # только версия индекса, без выборки страницы
+			response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 304)
+		# Другие параметры — другая страница и другой тег
+		self.assertEqual(self.client.get(url, {'limit': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+		self.upload('second.png', PNG_1X1 + b'2')
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['count'], 2)
+		etag = response['ETag']
+
+		UploadedImage.objects.order_by('id').first().delete()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+	def test_conditional_get_sees_background_optimization(self):
+		filename = self.upload()['filename']
+		url = reverse('theory:get_images')
+		response = self.client.get(url)
+		etag = response['ETag']
+		self.assertTrue(response.json()['images'][0]['thumb'].endswith(filename))
+
+		# Как optimize_image: mtime не меняется, меняются варианты и optimized_at
+		image = UploadedImage.objects.get()
+		image.variants = [{'width': 1, 'height': 1, 'filename': 'variants/thumb-1w.webp', 'size': 10}]
+		image.optimized_at = timezone.now()
+		image.save(update_fields=['variants', 'optimized_at'])
+
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.json()['images'][0]['thumb'].endswith('variants/thumb-1w.webp'))
+
+	def test_backfill_indexes_existing_files_and_prunes_missing(self):
+		default_storage.save('theory/images/legacy.png', ContentFile(PNG_1X1))
+		UploadedImage.objects.create(filename='gone.png', size=1)
+		out = StringIO()
+		call_command('backfill_uploaded_images', stdout=out)
+		self.assertEqual(list(UploadedImage.objects.values_list('filename', flat=True)), ['legacy.png'])
+		image = UploadedImage.objects.get()
+		self.assertEqual(image.content_type, 'image/png')
+		self.assertEqual(image.sha256, hashlib.sha256(PNG_1X1).hexdigest())
+		self.assertIn('Добавлено записей: 1, удалено устаревших: 1', out.getvalue())
+
+
+class ResponsiveImagesTests(TestCase):
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+		override = override_settings(MEDIA_ROOT=self.media_root)
+		override.enable()
+		self.addCleanup(override.disable)
+
+	def test_article_images_get_srcset_for_known_variants(self):
+		UploadedImage.objects.create(
+			filename='abc.png', size=10, width=1200, height=600, optimized_at=timezone.now(),
+			variants=[
+				{'width': 960, 'height': 480, 'filename': 'variants/abc-960w.webp', 'size': 5},
+				{'width': 480, 'height': 240, 'filename': 'variants/abc-480w.webp', 'size': 3},
+			],
+		)
+		article = Article.objects.create(title='Статья', slug='article', content_md=(
+			"![график](http://testserver/media/theory/images/abc.png)\n\n"
+			"![чужое](https://example.com/other.png)"
+		))
+		self.assertIn(
+			'srcset="http://testserver/media/theory/images/variants/abc-480w.webp 480w, '
+			'http://testserver/media/theory/images/variants/abc-960w.webp 960w"',
+			article.content_html,
+		)
+		self.assertIn('loading="lazy"', article.content_html)
+		self.assertIn('width="1200"', article.content_html)
+		self.assertEqual(article.content_html.count('srcset='), 1)
+
+	def _jpeg_with_exif(self, maker):
+		from PIL import Image
+		exif = Image.Exif()
+		exif[0x010F] = maker  # производитель камеры
+		exif[0x8825] = {1: 'N', 2: (55.0, 45.0, 0.0)}  # GPS
+		buffer = io.BytesIO()
+		Image.new('RGB', (2000, 1000), (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+		return buffer.getvalue()
+
+	def _upload(self, content):
+		return self.client.post(reverse('theory:upload_image'), {
+			'image': SimpleUploadedFile('photo.jpg', content, content_type='image/jpeg'),
+		}).json()
+
+	def _assert_served_without_metadata(self, url):
+		from PIL import Image
+		with default_storage.open(url.split(settings.MEDIA_URL, 1)[1]) as file:
+			served = file.read()
+		self.assertNotIn(b'Exif', served)
+		self.assertFalse(Image.open(io.BytesIO(served)).getexif())
+		return served
+
+	@unittest.skipUnless(pillow_available(), 'Pillow не установлен')
+	def test_upload_creates_stripped_webp_variants_and_rerenders_articles(self):
+		from PIL import Image
+		original = self._jpeg_with_exif('Camera maker')
+
+		with self.captureOnCommitCallbacks(execute=False) as callbacks:
+			uploaded = self._upload(original)
+		# Метаданные удалены ещё до ответа: URL из ответа окончательный, имя — хэш загрузки
+		self.assertEqual(uploaded['filename'], hashlib.sha256(original).hexdigest() + '.jpg')
+		served = self._assert_served_without_metadata(uploaded['url'])
+		self.assertEqual(uploaded['size'], len(served))
+		article = Article.objects.create(title='Фото', slug='photo', content_md=f"![фото]({uploaded['url']})")
+		self.assertNotIn('srcset', article.content_html)
+		for callback in callbacks:
+			callback()
+
+		image = UploadedImage.objects.get(filename=uploaded['filename'])
+		self.assertEqual((image.width, image.height), (2000, 1000))
+		self.assertEqual([variant['width'] for variant in image.variants], [480, 960, 1600])
+		for variant in image.variants:
+			with default_storage.open(f"theory/images/{variant['filename']}") as file:
+				webp = Image.open(file)
+				self.assertEqual(webp.format, 'WEBP')
+				self.assertEqual(webp.size, (variant['width'], variant['height']))
+				self.assertFalse(webp.getexif())
+		# Фоновая оптимизация исходник не трогает: ссылка из ответа продолжает работать
+		self.assertEqual(self._assert_served_without_metadata(uploaded['url']), served)
+		article.refresh_from_db()
+		self.assertIn('srcset=', article.content_html)
+		self.assertIn('loading="lazy"', article.content_html)
+
+	@unittest.skipUnless(pillow_available(), 'Pillow не установлен')
+	def test_same_pixels_with_different_metadata_keep_their_own_duplicates(self):
+		first, second = self._jpeg_with_exif('Camera A'), self._jpeg_with_exif('Camera B')
+		with self.captureOnCommitCallbacks(execute=True):
+			uploads = [self._upload(first), self._upload(second)]
+		self.assertEqual([upload['duplicate'] for upload in uploads], [False, False])
+		for upload in uploads:
+			self._assert_served_without_metadata(upload['url'])
+		self.assertEqual(UploadedImage.objects.count(), 2)
+
+		# Каждая запись хранит хэш своей загрузки: повтор любого из исходников находится
+		for content, upload in zip((first, second), uploads):
+			again = self._upload(content)
+			self.assertTrue(again['duplicate'])
+			self.assertEqual(again['filename'], upload['filename'])
+		self.assertEqual(UploadedImage.objects.count(), 2)
+
+
+class ChunkedUploadTests(TestCase):
+	CHUNK_SIZE = 32
+
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		self.temp_dir = tempfile.mkdtemp()
+		for path in (self.media_root, self.temp_dir):
+			self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+		override = override_settings(MEDIA_ROOT=self.media_root, THEORY_CHUNKED_UPLOAD={
+			'TEMP_DIR': self.temp_dir, 'CHUNK_SIZE': self.CHUNK_SIZE, 'MAX_SIZE': 1024, 'EXPIRE_HOURS': 24,
+		})
+		override.enable()
+		self.addCleanup(override.disable)
+		self.staff = get_user_model().objects.create_superuser(username='editor', email='editor@example.com', password='pass12345')
+		self.client.force_login(self.staff)
+
+	def init(self, content=PNG_1X1, **extra):
+		payload = {'filename': 'figure.png', 'size': len(content), 'content_type': 'image/png', **extra}
+		return self.client.post(reverse('theory:chunked_upload_init'), data=json.dumps(payload),
+								content_type='application/json').json()
+
+	def put(self, upload_id, offset, data, checksum=None):
+		return self.client.put(
+			reverse('theory:chunked_upload', args=[upload_id]), data=data, content_type='application/octet-stream',
+			HTTP_UPLOAD_OFFSET=str(offset), HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest(),
+		).json()
+
+	def test_chunks_resume_after_errors_and_finalize_stores_image(self):
+		state = self.init(sha256=hashlib.sha256(PNG_1X1).hexdigest())
+		self.assertTrue(state['success'])
+		self.assertEqual((state['offset'], state['chunk_size']), (0, self.CHUNK_SIZE))
+		upload_id = state['upload_id']
+		chunks = [PNG_1X1[i:i + self.CHUNK_SIZE] for i in range(0, len(PNG_1X1), self.CHUNK_SIZE)]
+
+		self.assertEqual(self.put(upload_id, 0, chunks[0])['offset'], self.CHUNK_SIZE)
+		# Повтор уже принятой части (ответ потерялся) — сервер сообщает, откуда продолжать
+		repeated = self.put(upload_id, 0, chunks[0])
+		self.assertFalse(repeated['success'])
+		self.assertEqual(repeated['offset'], self.CHUNK_SIZE)
+		# Повреждённая часть не записывается
+		corrupted = self.put(upload_id, self.CHUNK_SIZE, chunks[1], checksum='0' * 64)
+		self.assertFalse(corrupted['success'])
+		status = self.client.get(reverse('theory:chunked_upload', args=[upload_id])).json()
+		self.assertEqual(status['offset'], self.CHUNK_SIZE)
+
+		offset = status['offset']
+		for chunk in chunks[1:]:
+			offset = self.put(upload_id, offset, chunk)['offset']
+		self.assertEqual(offset, len(PNG_1X1))
+
+		result = self.client.post(reverse('theory:chunked_upload_finalize', args=[upload_id])).json()
+		self.assertTrue(result['success'])
+		self.assertEqual(result['filename'], f'{hashlib.sha256(PNG_1X1).hexdigest()}.png')
+		with default_storage.open(f"theory/images/{result['filename']}") as file:
+			self.assertEqual(file.read(), PNG_1X1)
+		self.assertEqual(UploadedImage.objects.get().original_name, 'figure.png')
+		self.assertFalse(ChunkedUpload.objects.exists())
+		self.assertEqual(os.listdir(self.temp_dir), [])
+
+	def test_finalize_rejects_incomplete_upload(self):
+		state = self.init()
+		self.put(state['upload_id'], 0, PNG_1X1[:self.CHUNK_SIZE])
+		result = self.client.post(reverse('theory:chunked_upload_finalize', args=[state['upload_id']])).json()
+		self.assertFalse(result['success'])
+		self.assertFalse(UploadedImage.objects.exists())
+
+	def test_init_validates_type_and_size(self):
+		self.assertFalse(self.init(filename='notes.txt')['success'])
+		self.assertFalse(self.init(size=4096)['success'])
+
+	def test_requires_staff(self):
+		user = get_user_model().objects.create_user(username='student', email='student@example.com', password='pass12345')
+		self.client.force_login(user)
+		response = self.client.post(reverse('theory:chunked_upload_init'), data=json.dumps({
+			'filename': 'figure.png', 'size': len(PNG_1X1), 'content_type': 'image/png',
+		}), content_type='application/json')
+		self.assertEqual(response.status_code, 302)
+		self.assertFalse(ChunkedUpload.objects.exists())
@@ -10,4 +10,7 @@ urlpatterns = [
     path('admin/upload-image/', views.upload_image_view, name='upload_image'),
     path('admin/get-images/', views.get_uploaded_images_view, name='get_images'),
     path('admin/delete-image/', views.delete_image_view, name='delete_image'),
+    path('admin/uploads/', views.chunked_upload_init_view, name='chunked_upload_init'),
+    path('admin/uploads/<uuid:upload_id>/', views.chunked_upload_view, name='chunked_upload'),
+    path('admin/uploads/<uuid:upload_id>/finalize/', views.chunked_upload_finalize_view, name='chunked_upload_finalize'),
 ]
@@ -1,15 +1,28 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpRequest, HttpResponse, JsonResponse
-from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt, csrf_protect
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.files import File
 from django.core.files.storage import default_storage
 from django.conf import settings
+from django.db.models import Count, Max
+import hashlib
 import json
 import os
-import uuid
-from datetime import datetime
-from .models import Article
+from core.pagination import InvalidCursor, KeysetPaginator
+from .chunked_uploads import OffsetMismatch, discard_upload, finish_upload, start_upload, temp_path, write_chunk
+from .images import (
+    Sha256UploadHandler, content_filename, find_duplicate, image_payload, referencing_articles,
+    register_image, uploaded_sha256, validate_image,
+)
+from .optimization import delete_variants, schedule_optimization, strip_metadata
+from .models import Article, ChunkedUpload, IMAGES_DIR, UploadedImage
+
+# Сколько изображений отдаёт галерея за один запрос по умолчанию и максимум для ?limit=
+GALLERY_PAGE_SIZE = 100
+GALLERY_MAX_PAGE_SIZE = 500
 
 def article_list_view(request: HttpRequest) -> HttpResponse:
     articles = Article.objects.all()
@@ -126,9 +139,21 @@ def admin_preview_view(request: HttpRequest) -> JsonResponse:
             'error': str(e)
         })
 
+@csrf_exempt
 @require_http_methods(["POST"])
 def upload_image_view(request: HttpRequest) -> JsonResponse:
-    """Загрузка изображений для статей"""
+    """Загрузка изображений для статей.
+
+    Обработчик загрузки подменяется до разбора тела запроса, поэтому CSRF проверяется не
+    middleware (оно читает request.POST раньше), а csrf_protect на _upload_image.
+    """
+    request.upload_handlers.insert(0, Sha256UploadHandler(request))
+    return _upload_image(request)
+
+
+@csrf_protect
+def _upload_image(request: HttpRequest) -> JsonResponse:
+    """Сохраняет изображение под именем по SHA-256 содержимого; повторная загрузка отдаёт уже сохранённый файл."""
     try:
         print(f"Upload request from {request.META.get('REMOTE_ADDR', 'unknown')}")
         print(f"CSRF token: {request.META.get('HTTP_X_CSRFTOKEN', 'Not found')}")
@@ -150,168 +175,260 @@ def upload_image_view(request: HttpRequest) -> JsonResponse:
                 'error': 'Выбранный файл пустой'
             })
         
-        # Проверяем тип файла по расширению и MIME типу
-        allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']
-        allowed_mime_types = [
-            'image/jpeg', 
-            'image/jpg', 
-            'image/png', 
-            'image/gif', 
-            'image/webp', 
-            'image/svg+xml'
-        ]
-        
-        file_ext = os.path.splitext(image_file.name)[1].lower()
-        if file_ext not in allowed_extensions:
+        # Проверяем тип файла по расширению и MIME типу, размер (максимум 10MB)
+        error = validate_image(image_file.name, image_file.content_type, image_file.size)
+        if error:
             return JsonResponse({
                 'success': False,
-                'error': f'Недопустимое расширение файла. Разрешены: {", ".join(allowed_extensions)}'
+                'error': error
             })
         
-        if image_file.content_type not in allowed_mime_types:
+        # Хэш посчитан Sha256UploadHandler при приёме файла
+        sha256 = uploaded_sha256(request, 'image', image_file)
+        return _store_image(request, image_file, image_file.name, image_file.content_type, sha256)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Ошибка сервера: {str(e)}'
+        })
+
+
+def _store_image(request: HttpRequest, image_file, original_name: str, content_type: str, sha256: str) -> JsonResponse:
+    """Сохраняет проверенное изображение под именем по SHA-256 и заносит в индекс (общая часть обычной
+    и частичной загрузки); повторная загрузка отдаёт уже сохранённый файл без записи на диск."""
+    duplicate = find_duplicate(sha256)
+    if duplicate is not None:
+        file_url = request.build_absolute_uri(settings.MEDIA_URL + duplicate.path)
+        return JsonResponse({
+            'success': True,
+            'url': file_url,
+            'filename': duplicate.filename,
+            'original_name': original_name,
+            'size': duplicate.size,
+            'markdown': f"![{original_name}]({file_url})",
+            'duplicate': True
+        })
+    
+    # Имя файла по содержимому, путь в папке media/theory/images/
+    file_ext = os.path.splitext(original_name)[1].lower()
+    file_path = f"{IMAGES_DIR}/{content_filename(sha256, file_ext)}"
+    
+    # Убеждаемся, что директория существует
+    images_dir = os.path.join(settings.MEDIA_ROOT, 'theory', 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    
+    # Метаданные (EXIF с GPS, XMP) удаляются до сохранения: публикуется только очищенный файл, а имя
+    # остаётся хэшем загрузки — по нему находятся повторные загрузки, и URL из ответа не меняется
+    stored_file = strip_metadata(image_file, file_ext) or image_file
+    
+    # Сохраняем файл (если он уже лежит в каталоге без записи в индексе — только индексируем)
+    if default_storage.exists(file_path):
+        saved_path = file_path
+    else:
+        try:
+            saved_path = default_storage.save(file_path, stored_file)
+        except Exception as save_error:
             return JsonResponse({
                 'success': False,
-                'error': 'Недопустимый тип файла. Разрешены только изображения.'
+                'error': f'Ошибка при сохранении файла: {str(save_error)}'
             })
-        
-        # Проверяем размер файла (максимум 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if image_file.size > max_size:
+    
+    image = register_image(saved_path, stored_file, original_name, content_type, sha256=sha256)
+    # WebP-варианты и srcset в статьях — фоновой задачей, ответ загрузки их не ждёт
+    schedule_optimization(image)
+
+    # Создаем URL для доступа к файлу
+    file_url = request.build_absolute_uri(settings.MEDIA_URL + saved_path)
+    
+    return JsonResponse({
+        'success': True,
+        'url': file_url,
+        'filename': image.filename,
+        'original_name': original_name,
+        'size': image.size,
+        'markdown': f"![{original_name}]({file_url})",
+        'duplicate': False
+    })
+
+
+def _chunked_upload_state(upload) -> dict:
+    return {
+        'success': True,
+        'upload_id': str(upload.id),
+        'offset': upload.offset,
+        'size': upload.size,
+        'chunk_size': settings.THEORY_CHUNKED_UPLOAD['CHUNK_SIZE']
+    }
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+def chunked_upload_init_view(request: HttpRequest) -> JsonResponse:
+    """Начало загрузки по частям: JSON {filename, size, content_type[, sha256]} -> upload_id и размер части.
+
+    Дальше части отправляются PUT на chunked_upload_view с заголовками Upload-Offset и
+    X-Chunk-SHA256, после последней — POST на chunked_upload_finalize_view.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Некорректный JSON в запросе'
+        })
+    
+    try:
+        upload = start_upload(
+            request.user,
+            name=str(data.get('filename', '')),
+            size=int(data.get('size', 0)),
+            content_type=str(data.get('content_type', '')),
+            sha256=str(data.get('sha256', '')),
+        )
+    except (TypeError, ValueError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+    return JsonResponse(_chunked_upload_state(upload))
+
+
+@staff_member_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def chunked_upload_view(request: HttpRequest, upload_id) -> JsonResponse:
+    """GET — сколько байт уже принято (для продолжения после сбоя), PUT — очередная часть, DELETE — отмена."""
+    if request.method == 'PUT':
+        try:
+            offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
             return JsonResponse({
                 'success': False,
-                'error': f'Файл слишком большой ({image_file.size / (1024*1024):.1f} МБ). Максимум 10 МБ.'
+                'error': 'Нужны заголовки Upload-Offset и Content-Length'
             })
-        
-        # Генерируем уникальное имя файла
-        unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-        
-        # Создаем путь в папке media/theory/images/
-        file_path = f"theory/images/{unique_filename}"
-        
-        # Убеждаемся, что директория существует
-        images_dir = os.path.join(settings.MEDIA_ROOT, 'theory', 'images')
-        os.makedirs(images_dir, exist_ok=True)
-        
-        # Сохраняем файл
         try:
-            saved_path = default_storage.save(file_path, image_file)
-        except Exception as save_error:
+            upload = write_chunk(upload_id, request.user, offset, stream=request, length=length,
+                                 checksum=request.META.get('HTTP_X_CHUNK_SHA256', ''))
+        except OffsetMismatch as e:
             return JsonResponse({
                 'success': False,
-                'error': f'Ошибка при сохранении файла: {str(save_error)}'
+                'error': str(e),
+                'offset': e.offset
             })
-        
-        # Создаем URL для доступа к файлу
-        file_url = request.build_absolute_uri(settings.MEDIA_URL + saved_path)
-        
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            })
+        return JsonResponse(_chunked_upload_state(upload))
+    
+    upload = ChunkedUpload.objects.filter(id=upload_id, user=request.user).first()
+    if upload is None:
         return JsonResponse({
-            'success': True,
-            'url': file_url,
-            'filename': unique_filename,
-            'original_name': image_file.name,
-            'size': image_file.size,
-            'markdown': f"![{image_file.name}]({file_url})"
+            'success': False,
+            'error': 'Загрузка не найдена или устарела'
+        })
+    if request.method == 'DELETE':
+        discard_upload(upload)
+        return JsonResponse({'success': True})
+    return JsonResponse(_chunked_upload_state(upload))
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+def chunked_upload_finalize_view(request: HttpRequest, upload_id) -> JsonResponse:
+    """Проверяет собранный файл и сохраняет его как обычную загрузку; временный файл удаляется."""
+    upload = ChunkedUpload.objects.filter(id=upload_id, user=request.user).first()
+    if upload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Загрузка не найдена или устарела'
+        })
+    
+    try:
+        sha256 = finish_upload(upload)
+        with open(temp_path(upload), 'rb') as temp_file:
+            response = _store_image(request, File(temp_file, name=upload.original_name),
+                                    upload.original_name, upload.content_type, sha256)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
         })
-        
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': f'Ошибка сервера: {str(e)}'
         })
+    
+    discard_upload(upload)
+    return response
+
+
+def gallery_etag(request: HttpRequest) -> str:
+    """ETag страницы галереи: версия индекса изображений и параметры запроса.
+
+    Версия — число записей, максимальный id, mtime и optimized_at UploadedImage (один агрегирующий
+    запрос): загрузка меняет id, удаление — число записей, фоновая оптимизация — optimized_at
+    (от неё зависит миниатюра). Совпавший If-None-Match даёт 304 без выборки страницы.
+    Хост входит в тег, потому что URL в ответе абсолютные.
+    """
+    version = UploadedImage.objects.aggregate(
+        count=Count('id'), last_id=Max('id'), last_mtime=Max('mtime'), last_optimized=Max('optimized_at'),
+    )
+    key = '|'.join([
+        str(version['count']), str(version['last_id']), str(version['last_mtime']), str(version['last_optimized']),
+        request.get_host(), request.GET.urlencode(),
+    ])
+    return hashlib.sha1(key.encode()).hexdigest()
 
 
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=gallery_etag)
 def get_uploaded_images_view(request: HttpRequest) -> JsonResponse:
-    """Получение списка загруженных изображений"""
+    """Получение списка загруженных изображений.
+
+    Список читается из индекса UploadedImage одним запросом по индексу (mtime, id) страницами
+    по ?limit= (по умолчанию GALLERY_PAGE_SIZE); следующая страница — ?after=<next>. С ?fields=light
+    отдаются только имя файла и относительный URL. Каталог при этом не сканируется, файлы,
+    загруженные в обход админки, заносятся командой backfill_uploaded_images.
+    """
     try:
-        images_dir = "theory/images"
-        images = []
-        
-        # Проверяем, существует ли директория
-        if not default_storage.exists(images_dir):
-            # Создаем директорию если её нет
-            images_full_dir = os.path.join(settings.MEDIA_ROOT, 'theory', 'images')
-            os.makedirs(images_full_dir, exist_ok=True)
-            
+        try:
+            limit = int(request.GET.get('limit', GALLERY_PAGE_SIZE))
+        except ValueError:
             return JsonResponse({
-                'success': True,
-                'images': [],
-                'count': 0,
-                'message': 'Директория создана, но изображений пока нет'
+                'success': False,
+                'error': 'Параметр limit должен быть целым числом'
             })
-        
+        limit = min(max(limit, 1), GALLERY_MAX_PAGE_SIZE)
+        light = request.GET.get('fields') == 'light'
+
+        queryset = UploadedImage.objects.all()
+        if light:
+            queryset = queryset.only('id', 'filename', 'mtime')
+        paginator = KeysetPaginator(queryset, limit, ('-mtime', '-id'))
         try:
-            # Получаем список файлов
-            directories, files = default_storage.listdir(images_dir)
-            
-            # Фильтруем только изображения
-            image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg'}
-            
-            for file in files:
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext not in image_extensions:
-                    continue  # Пропускаем не изображения
-                
-                file_path = f"{images_dir}/{file}"
-                
-                try:
-                    # Получаем информацию о файле
-                    file_url = request.build_absolute_uri(settings.MEDIA_URL + file_path)
-                    file_size = default_storage.size(file_path)
-                    
-                    # Пытаемся получить дату создания
-                    created_date = "Неизвестно"
-                    try:
-                        full_path = default_storage.path(file_path)
-                        created_time = os.path.getctime(full_path)
-                        created_date = datetime.fromtimestamp(created_time).strftime('%d.%m.%Y %H:%M')
-                    except:
-                        pass
-                    
-                    # Определяем размер в удобном формате
-                    if file_size < 1024:
-                        size_str = f"{file_size} Б"
-                    elif file_size < 1024 * 1024:
-                        size_str = f"{file_size // 1024} КБ"
-                    else:
-                        size_str = f"{file_size / (1024 * 1024):.1f} МБ"
-                    
-                    # Получаем оригинальное имя из имени файла (если возможно)
-                    original_name = file
-                    
-                    images.append({
-                        'filename': file,
-                        'url': file_url,
-                        'size': size_str,
-                        'created': created_date,
-                        'original_name': original_name,
-                        'markdown': f"![{original_name}]({file_url})"
-                    })
-                    
-                except Exception as file_error:
-                    # Логируем ошибку, но продолжаем обработку других файлов
-                    print(f"Ошибка обработки файла {file}: {file_error}")
-                    continue
-        
-        except Exception as listdir_error:
+            page = paginator.page(after=request.GET.get('after'))
+        except InvalidCursor as cursor_error:
             return JsonResponse({
                 'success': False,
-                'error': f'Ошибка чтения директории: {str(listdir_error)}'
+                'error': str(cursor_error)
             })
-        
-        # Сортируем по дате создания (новые сверху)
-        try:
-            images.sort(key=lambda x: datetime.strptime(x['created'], '%d.%m.%Y %H:%M') if x['created'] != "Неизвестно" else datetime.min, reverse=True)
-        except:
-            # Если сортировка по дате не удалась, сортируем по имени файла
-            images.sort(key=lambda x: x['filename'], reverse=True)
-        
+
+        if light:
+            images = [{'filename': image.filename, 'url': settings.MEDIA_URL + image.path} for image in page]
+        else:
+            images = [image_payload(image, request) for image in page]
         return JsonResponse({
             'success': True,
             'images': images,
-            'count': len(images)
+            'count': len(images),
+            'next': page.next_cursor
         })
-        
+
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -347,11 +464,22 @@ def delete_image_view(request: HttpRequest) -> JsonResponse:
                 'error': 'Недопустимое имя файла'
             })
         
-        file_path = f"theory/images/{filename}"
+        file_path = f"{IMAGES_DIR}/{filename}"
+        
+        # Файл может быть общим для нескольких загрузок: удаляем, только если статьи на него не ссылаются
+        articles = list(referencing_articles(filename).values_list('title', flat=True))
+        if articles:
+            return JsonResponse({
+                'success': False,
+                'error': f'Изображение используется в статьях: {", ".join(articles)}'
+            })
         
         if default_storage.exists(file_path):
             try:
                 default_storage.delete(file_path)
+                for image in UploadedImage.objects.filter(filename=filename):
+                    delete_variants(image)
+                    image.delete()
                 return JsonResponse({
                     'success': True,
                     'message': f'Изображение {filename} успешно удалено'
@@ -362,6 +490,8 @@ def delete_image_view(request: HttpRequest) -> JsonResponse:
                     'error': f'Ошибка при удалении файла: {str(delete_error)}'
                 })
         else:
+            # Файл удалён в обход админки — убираем и запись из индекса
+            UploadedImage.objects.filter(filename=filename).delete()
             return JsonResponse({
                 'success': False,
                 'error': 'Файл не найден или уже был удален'
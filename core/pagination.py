@@ -0,0 +1,130 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница KeysetPaginator: объекты и курсоры соседних страниц (None, если страницы нет)."""
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Пагинация по курсору (keyset) вместо OFFSET: без COUNT(*), и стоимость страницы не растёт с её номером.
+
+    ordering — поля сортировки, последнее должно быть уникальным (обычно '-id'), чтобы порядок был
+    полным. Курсор — непрозрачная строка со значениями этих полей у крайнего объекта страницы;
+    page(after=...) отдаёт следующую страницу, page(before=...) — предыдущую. Запрос страницы —
+    WHERE (поля) < (значения) ORDER BY ... LIMIT per_page + 1, который покрывается составным индексом
+    с тем же порядком полей. Номера страниц и общего числа нет — это плата за отсутствие COUNT.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        model = queryset.model
+        self._model_fields = [model._meta.get_field(name) for name in self.fields]
+
+    def encode_cursor(self, obj) -> str:
+        values = [field.value_to_string(obj) for field in self._model_fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> list:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self._model_fields, values)]
+        except Exception:
+            raise InvalidCursor('Некорректный курсор страницы')
+
+    def _after(self, values, reverse=False):
+        """Фильтр «строго после values» в порядке ordering (или в обратном при reverse=True).
+
+        Лексикографическое условие (a < x) OR (a = x AND b < y) дополняется избыточной границей a <= x:
+        без неё планировщик не видит диапазона по первому полю индекса и читает всю историю пользователя.
+        """
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, self.fields, values):
+            descending = name.startswith('-') != reverse
+            condition |= equal & Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+            equal &= Q(**{field: value})
+        first_descending = self.ordering[0].startswith('-') != reverse
+        return Q(**{f'{self.fields[0]}__{"lte" if first_descending else "gte"}': values[0]}) & condition
+
+    def page(self, after=None, before=None) -> KeysetPage:
+        if before:
+            values = self.decode_cursor(before)
+            reversed_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            rows = list(self.queryset.filter(self._after(values, reverse=True))
+                        .order_by(*reversed_ordering)[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if after:
+                queryset = queryset.filter(self._after(self.decode_cursor(after)))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after)
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0]) if has_previous and rows else None,
+        )
+
+
+def paginate(request, queryset, per_page, ordering=('-created_at', '-id')):
+    """Страница списка по настройке HISTORY_PAGINATION: 'keyset' (?after=/?before=) или 'offset' (?page=).
+
+    Некорректный курсор или номер страницы дают первую страницу, номер за концом — последнюю.
+    """
+    if settings.HISTORY_PAGINATION == 'keyset':
+        paginator = KeysetPaginator(queryset, per_page, ordering)
+        try:
+            return paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+        except InvalidCursor:
+            return paginator.page()
+
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    try:
+        return paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
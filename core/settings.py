@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -142,6 +143,111 @@ AUTHENTICATION_BACKENDS = [
 # URL for redirection if the user is not authenticated
 LOGIN_URL = 'users:login'
 
+# Cache
+# Redis уже есть в зависимостях: если задан REDIS_URL, кэш по умолчанию общий для всех воркеров.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Celery
+# Без брокера (локальная разработка, тесты) задачи выполняются синхронно прямо в запросе.
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL or "memory://")
+CELERY_TASK_ALWAYS_EAGER = os.getenv(
+    "CELERY_TASK_ALWAYS_EAGER", "False" if CELERY_BROKER_URL != "memory://" else "True"
+) == "True"
+CELERY_TASK_IGNORE_RESULT = True  # Результаты хранятся в CalculationJob, а не в backend Celery
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+
+
+# Калькулятор
+# Максимальное число строк в одном запросе к пакетному API (calculator:calculate_batch)
+CALCULATOR_BATCH_MAX_ROWS = int(os.getenv("CALCULATOR_BATCH_MAX_ROWS", "50000"))
+
+# Фоновые задачи: пакеты больше SYNC_MAX_ROWS строк уходят в очередь вместо синхронного расчёта
+CALCULATOR_JOBS = {
+    'SYNC_MAX_ROWS': int(os.getenv("CALCULATOR_JOBS_SYNC_MAX_ROWS", "5000")),
+    'POLL_INTERVAL': os.getenv("CALCULATOR_JOBS_POLL_INTERVAL", "1s"),
+}
+
+# Монте-Карло: размер блока ограничивает память, WORKERS > 1 включает пул процессов
+# (внутри prefork-воркера Celery пул процессов недоступен — там оставьте 1 или используйте --pool=threads)
+CALCULATOR_MONTE_CARLO = {
+    'MAX_SAMPLES': int(os.getenv("CALCULATOR_MONTE_CARLO_MAX_SAMPLES", "100000000")),
+    'CHUNK_SIZE': int(os.getenv("CALCULATOR_MONTE_CARLO_CHUNK_SIZE", "65536")),
+    'WORKERS': int(os.getenv("CALCULATOR_MONTE_CARLO_WORKERS", "1")),
+}
+
+# Планировщик объёма выборки: верхняя граница поиска n
+CALCULATOR_SAMPLE_SIZE_MAX_N = int(os.getenv("CALCULATOR_SAMPLE_SIZE_MAX_N", "100000000"))
+
+# График плотностей: 'adaptive' сгущает точки там, где плотности меняются, 'uniform' — равномерная сетка
+CALCULATOR_PLOT = {
+    'GRID': os.getenv("CALCULATOR_PLOT_GRID", "adaptive"),
+    'POINTS': int(os.getenv("CALCULATOR_PLOT_POINTS", "200")),
+}
+
+# Кэш результатов решателя: LRU в памяти воркера + необязательный общий уровень (алиас из CACHES)
+CALCULATOR_RESULT_CACHE = {
+    'MAX_ENTRIES': int(os.getenv("CALCULATOR_RESULT_CACHE_SIZE", "256")),
+    'TTL': int(os.getenv("CALCULATOR_RESULT_CACHE_TTL", "600")),
+    'SHARED_ALIAS': 'default' if REDIS_URL else None,
+}
+
+# История расчётов: 'sync' — INSERT в запросе, 'buffered' — пачки через bulk_create по размеру,
+# по таймеру и при остановке процесса. DEDUP не записывает повтор предыдущего расчёта пользователя.
+CALCULATOR_HISTORY = {
+    'MODE': os.getenv("CALCULATOR_HISTORY_MODE", "sync"),
+    'BATCH_SIZE': int(os.getenv("CALCULATOR_HISTORY_BATCH_SIZE", "100")),
+    'FLUSH_INTERVAL': float(os.getenv("CALCULATOR_HISTORY_FLUSH_INTERVAL", "2")),
+    'DEDUP': os.getenv("CALCULATOR_HISTORY_DEDUP", "False") == "True",
+}
+
+# Загрузка изображений статей по частям: части пишутся во временный файл в TEMP_DIR (не внутри MEDIA_ROOT —
+# его раздаёт nginx), CHUNK_SIZE — максимальный размер одной части, незавершённые загрузки удаляются
+# через EXPIRE_HOURS после последней части.
+THEORY_CHUNKED_UPLOAD = {
+    'TEMP_DIR': os.getenv("THEORY_CHUNKED_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), 'theory-uploads')),
+    'CHUNK_SIZE': int(os.getenv("THEORY_CHUNKED_UPLOAD_CHUNK_SIZE", str(1024 * 1024))),
+    'MAX_SIZE': int(os.getenv("THEORY_CHUNKED_UPLOAD_MAX_SIZE", str(100 * 1024 * 1024))),
+    'EXPIRE_HOURS': float(os.getenv("THEORY_CHUNKED_UPLOAD_EXPIRE_HOURS", "24")),
+}
+
+# Пагинация страниц истории (расчёты, тесты): 'keyset' — курсоры ?after=/?before= без COUNT и OFFSET,
+# 'offset' — номера страниц Django Paginator
+HISTORY_PAGINATION = os.getenv("HISTORY_PAGINATION", "keyset")
+
+# Прогрев решателя при загрузке core/wsgi.py: с gunicorn --preload выполняется один раз в мастер-процессе,
+# и воркеры наследуют прогретое состояние после fork. Celery и manage.py-команды его не выполняют.
+CALCULATOR_WARMUP = os.getenv("CALCULATOR_WARMUP", "False") == "True"
+
+# Журналирование приложений (прогрев, ошибки фоновых задач) в stdout контейнера
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'apps': {
+            'handlers': ['console'],
+            'level': os.getenv("APPS_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 # Media files (User uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Прогрев решателя только в веб-процессе: с gunicorn --preload — один раз в мастере до fork воркеров
+from apps.calculator.services.warmup import warm_up_web_process  # noqa: E402
+
+warm_up_web_process()
@@ -188,20 +188,82 @@
 
   // === Управление изображениями ===
 
-  window.loadUploadedImages = function () {
-    const grid = document.getElementById('uploadedImagesList');
-    if (!grid) return;
+  function renderImageCard(img) {
+    return `
+        <div class="img-card">
+          <div class="img-thumb">
+            <img src="${img.thumb || img.url}" alt="${img.filename}" loading="lazy">
+          </div>
+          <div class="img-meta" title="${img.filename}">
+            <div class="filename">${img.filename}</div>
+            <div class="created">${img.created}</div>
+          </div>
+          <div class="img-size">${img.size}</div>
+          <input class="img-md" value="${img.markdown}" readonly />
+          <div class="img-actions">
+            <button type="button" class="btn-small btn-copy" data-action="copy" title="Копировать markdown">
+              📋
+            </button>
+            <button type="button" class="btn-small btn-delete" data-action="delete" data-filename="${img.filename}" title="Удалить изображение">
+              🗑️
+            </button>
+          </div>
+        </div>
+      `;
+  }
 
-    grid.innerHTML = '<div class="loading-message">🔄 Загрузка каталога изображений...</div>';
+  // Галерея отдаётся страницами: следующая запрашивается по курсору data.next, когда
+  // в область видимости попадает «маяк» в конце сетки (бесконечная прокрутка)
+  const gallery = {
+    next: null,
+    loading: false,
+    generation: 0,
+    observer: null
+  };
 
-    const csrfToken = getCSRFToken();
-    if (!csrfToken) {
-      grid.innerHTML = '<div class="error">❌ Ошибка: CSRF токен не найден</div>';
+  function gallerySentinel(grid) {
+    let sentinel = grid.querySelector('.images-sentinel');
+    if (!sentinel) {
+      sentinel = document.createElement('div');
+      sentinel.className = 'images-sentinel';
+    }
+    grid.appendChild(sentinel);  // всегда последний элемент сетки
+    return sentinel;
+  }
+
+  function observeGallery(grid, csrfToken) {
+    if (gallery.observer) {
+      gallery.observer.disconnect();
+      gallery.observer = null;
+    }
+    if (!gallery.next) return;
+
+    const sentinel = gallerySentinel(grid);
+    const loadNext = () => loadImagesPage(grid, csrfToken, gallery.next)
+      .catch(error => console.error('Ошибка загрузки изображений:', error));
+
+    if (!('IntersectionObserver' in window)) {
+      loadNext();
       return;
     }
+    gallery.observer = new IntersectionObserver(entries => {
+      if (entries.some(entry => entry.isIntersecting) && !gallery.loading && gallery.next) {
+        loadNext();
+      }
+    }, { rootMargin: '400px' });
+    gallery.observer.observe(sentinel);
+  }
+
+  function loadImagesPage(grid, csrfToken, after) {
+    const url = after ? `/theory/admin/get-images/?after=${encodeURIComponent(after)}` : '/theory/admin/get-images/';
+    // Ответ устаревшей загрузки (после «Обновить») не должен попасть в сетку
+    const generation = gallery.generation;
+    gallery.loading = true;
 
-    fetch('/theory/admin/get-images/', {
+    // Повторное открытие галереи браузер подтверждает по ETag и получает 304 без выборки
+    return fetch(url, {
       method: 'GET',
+      cache: 'no-cache',
       headers: {
         'X-CSRFToken': csrfToken
       }
@@ -219,38 +281,49 @@
         return response.json();
       })
       .then(data => {
+        if (generation !== gallery.generation) return;
+
         if (!data.success) {
           grid.innerHTML = `<div class="error">Ошибка: ${data.error || 'Неизвестная ошибка'}</div>`;
           return;
         }
 
-        if (data.count === 0) {
-          grid.innerHTML = '<div class="empty">📷 Нет загруженных изображений</div>';
-          return;
+        if (!after) {
+          if (data.count === 0) {
+            grid.innerHTML = '<div class="empty">📷 Нет загруженных изображений</div>';
+            return;
+          }
+          grid.innerHTML = '';
         }
 
-        grid.innerHTML = data.images.map(img => `
-        <div class="img-card">
-          <div class="img-thumb">
-            <img src="${img.url}" alt="${img.filename}" loading="lazy">
-          </div>
-          <div class="img-meta" title="${img.filename}">
-            <div class="filename">${img.filename}</div>
-            <div class="created">${img.created}</div>
-          </div>
-          <div class="img-size">${img.size}</div>
-          <input class="img-md" value="${img.markdown}" readonly />
-          <div class="img-actions">
-            <button type="button" class="btn-small btn-copy" data-action="copy" title="Копировать markdown">
-              📋
-            </button>
-            <button type="button" class="btn-small btn-delete" data-action="delete" data-filename="${img.filename}" title="Удалить изображение">
-              🗑️
-            </button>
-          </div>
-        </div>
-      `).join('');
+        grid.insertAdjacentHTML('beforeend', data.images.map(renderImageCard).join(''));
+        gallery.next = data.next;
+        observeGallery(grid, csrfToken);
       })
+      .finally(() => {
+        if (generation === gallery.generation) {
+          gallery.loading = false;
+        }
+      });
+  }
+
+  window.loadUploadedImages = function () {
+    const grid = document.getElementById('uploadedImagesList');
+    if (!grid) return;
+
+    gallery.generation += 1;
+    gallery.next = null;
+    observeGallery(grid, null);
+
+    grid.innerHTML = '<div class="loading-message">🔄 Загрузка каталога изображений...</div>';
+
+    const csrfToken = getCSRFToken();
+    if (!csrfToken) {
+      grid.innerHTML = '<div class="error">❌ Ошибка: CSRF токен не найден</div>';
+      return;
+    }
+
+    loadImagesPage(grid, csrfToken, null)
       .catch(error => {
         console.error('Ошибка загрузки изображений:', error);
         grid.innerHTML = `<div class="error">Ошибка загрузки: ${error.message}</div>`;
@@ -490,6 +563,141 @@
     }
   }
 
+  // === Загрузка по частям ===
+
+  const CHUNKED_UPLOAD_THRESHOLD = 5 * 1024 * 1024;
+  const CHUNKED_UPLOAD_MAX_SIZE = 100 * 1024 * 1024;
+  const CHUNK_RETRIES = 3;
+
+  function parseJsonResponse(response) {
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    const contentType = response.headers.get('content-type');
+    if (!contentType || !contentType.includes('application/json')) {
+      throw new Error('Ответ сервера не является JSON');
+    }
+
+    return response.json();
+  }
+
+  function uploadMultipart(file, csrfToken) {
+    const formData = new FormData();
+    formData.append('image', file);
+
+    return fetch('/theory/admin/upload-image/', {
+      method: 'POST',
+      headers: {
+        'X-CSRFToken': csrfToken
+      },
+      body: formData
+    }).then(parseJsonResponse);
+  }
+
+  function postJson(url, payload, csrfToken) {
+    return fetch(url, {
+      method: 'POST',
+      headers: {
+        'X-CSRFToken': csrfToken,
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify(payload)
+    }).then(parseJsonResponse);
+  }
+
+  // SHA-256 части в hex; crypto.subtle есть только в защищённом контексте (HTTPS, localhost) —
+  // без него часть отправляется без контрольной суммы
+  async function sha256Hex(blob) {
+    if (!window.crypto || !window.crypto.subtle) return null;
+    const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+  }
+
+  function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+  }
+
+  // Незавершённая загрузка запоминается, чтобы продолжить её и после перезагрузки страницы
+  function resumeKey(file) {
+    return `theory-upload:${file.name}:${file.size}:${file.lastModified}`;
+  }
+
+  async function openChunkedUpload(file, csrfToken) {
+    const savedId = localStorage.getItem(resumeKey(file));
+    if (savedId) {
+      try {
+        const state = await fetch(`/theory/admin/uploads/${savedId}/`, {
+          headers: { 'X-CSRFToken': csrfToken }
+        }).then(parseJsonResponse);
+        if (state.success) return state;
+      } catch (error) {
+        console.warn('Не удалось продолжить загрузку, начинаем заново:', error);
+      }
+      localStorage.removeItem(resumeKey(file));
+    }
+
+    const state = await postJson('/theory/admin/uploads/', {
+      filename: file.name,
+      size: file.size,
+      content_type: file.type
+    }, csrfToken);
+    if (state.success) {
+      localStorage.setItem(resumeKey(file), state.upload_id);
+    }
+    return state;
+  }
+
+  async function uploadInChunks(file, csrfToken, progressFill) {
+    const state = await openChunkedUpload(file, csrfToken);
+    if (!state.success) return state;
+
+    const uploadUrl = `/theory/admin/uploads/${state.upload_id}/`;
+    let offset = state.offset;
+    let failures = 0;
+
+    while (offset < file.size) {
+      const chunk = file.slice(offset, offset + state.chunk_size);
+      const headers = {
+        'X-CSRFToken': csrfToken,
+        'Content-Type': 'application/octet-stream',
+        'Upload-Offset': String(offset)
+      };
+      const checksum = await sha256Hex(chunk);
+      if (checksum) headers['X-Chunk-SHA256'] = checksum;
+
+      let data;
+      try {
+        data = await fetch(uploadUrl, { method: 'PUT', headers, body: chunk }).then(parseJsonResponse);
+      } catch (error) {
+        // Сетевой сбой: узнаём у сервера, сколько он принял, и повторяем с этого места
+        if (++failures > CHUNK_RETRIES) throw error;
+        await sleep(1000 * failures);
+        data = await fetch(uploadUrl, { headers: { 'X-CSRFToken': csrfToken } }).then(parseJsonResponse);
+        if (!data.success) return data;
+        offset = data.offset;
+        continue;
+      }
+
+      if (data.success) {
+        failures = 0;
+      } else if (typeof data.offset !== 'number' || ++failures > CHUNK_RETRIES) {
+        return data;
+      }
+      offset = data.offset !== undefined ? data.offset : offset;
+
+      if (progressFill) {
+        progressFill.style.width = `${Math.round(offset / file.size * 95)}%`;
+      }
+    }
+
+    const result = await postJson(`${uploadUrl}finalize/`, {}, csrfToken);
+    if (result.success) {
+      localStorage.removeItem(resumeKey(file));
+    }
+    return result;
+  }
+
   function uploadFile(file) {
     console.log('Начинаю загрузку файла:', file.name, 'Размер:', file.size, 'Тип:', file.type);
 
@@ -522,10 +730,6 @@
     if (resultContainer) resultContainer.style.display = 'none';
     if (progressFill) progressFill.style.width = '0%';
 
-    // Создаем FormData
-    const formData = new FormData();
-    formData.append('image', file);
-
     // Проверяем CSRF токен
     const csrfToken = getCSRFToken();
     if (!csrfToken) {
@@ -535,26 +739,13 @@
       return;
     }
 
-    // Отправляем запрос
-    fetch('/theory/admin/upload-image/', {
-      method: 'POST',
-      headers: {
-        'X-CSRFToken': csrfToken
-      },
-      body: formData
-    })
-      .then(response => {
-        if (!response.ok) {
-          throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-        }
-        
-        const contentType = response.headers.get('content-type');
-        if (!contentType || !contentType.includes('application/json')) {
-          throw new Error('Ответ сервера не является JSON');
-        }
-        
-        return response.json();
-      })
+    // Крупные файлы отправляются частями: воркер сервера занят только на время одной части,
+    // а после обрыва загрузка продолжается с принятого сервером смещения
+    const request = file.size > CHUNKED_UPLOAD_THRESHOLD
+      ? uploadInChunks(file, csrfToken, progressFill)
+      : uploadMultipart(file, csrfToken);
+
+    request
       .then(data => {
         console.log('Ответ сервера:', data);
 
@@ -628,10 +819,10 @@
       return { valid: false, error: 'Файл не выбран' };
     }
 
-    // Проверяем размер (максимум 10MB)
-    const maxSize = 10 * 1024 * 1024;
+    // Проверяем размер: крупные файлы уходят частями, предел — как на сервере
+    const maxSize = CHUNKED_UPLOAD_MAX_SIZE;
     if (file.size > maxSize) {
-      return { valid: false, error: `Файл слишком большой (${(file.size / (1024 * 1024)).toFixed(1)} МБ). Максимум 10 МБ.` };
+      return { valid: false, error: `Файл слишком большой (${(file.size / (1024 * 1024)).toFixed(1)} МБ). Максимум ${maxSize / (1024 * 1024)} МБ.` };
     }
 
     // Проверяем тип файла
@@ -1,11 +1,33 @@
-// Глобальная функция инициализации графика Neyman-Pearson
-window.initNPChart = function initNPChart(){
-  const jsonNode = document.getElementById('plot-data');
-  const canvasEl = document.getElementById('distributionsChart');
-  if(!jsonNode || !canvasEl || !window.Chart){ return; }
-  const rawPlotData = JSON.parse(jsonNode.textContent);
+// Глобальная функция инициализации графика Neyman-Pearson.
+// Данные графика не встраиваются в partial: canvas несёт data-plot-url, а сами данные
+// приходят отдельным запросом в компактном формате (сетка start/step/n + base64 Float32).
+
+function decodeFloat32(b64){
+  const bin = atob(b64);
+  const bytes = new Uint8Array(bin.length);
+  for(let i = 0; i < bin.length; i++){ bytes[i] = bin.charCodeAt(i); }
+  return Array.from(new Float32Array(bytes.buffer));
+}
+
+// Компактный ответ calculator:plot -> {x, h0_pdf, h1_pdf, max_pdf}
+function expandPlotData(payload){
+  if(payload.encoding !== 'f32-b64'){ return payload; }
+  let x;
+  if(payload.grid){
+    const {start, step, n} = payload.grid;
+    x = Array.from({length: n}, (_, i) => start + i * step);
+  } else {
+    x = decodeFloat32(payload.x);
+  }
+  return {x, h0_pdf: decodeFloat32(payload.h0_pdf), h1_pdf: decodeFloat32(payload.h1_pdf), max_pdf: payload.max_pdf};
+}
+
+function drawNPChart(canvasEl, rawPlotData){
   const thresholdAttr = canvasEl.getAttribute('data-threshold');
   const threshold = thresholdAttr ? parseFloat(thresholdAttr) : null;
+  // Для критерия отношения правдоподобия область отвержения — список интервалов [a, b] (null = бесконечность)
+  const regionEl = document.getElementById('np-region');
+  const region = regionEl ? JSON.parse(regionEl.textContent) : [];
   const ctx = canvasEl.getContext('2d');
 
   if(window.neymanPearsonChart && typeof window.neymanPearsonChart.destroy === 'function'){
@@ -15,9 +37,20 @@ window.initNPChart = function initNPChart(){
   const drawThresholdPlugin = {
     id: 'drawThresholdPlugin',
     afterDraw(chart){
-      if(threshold === null) return;
       const xScale = chart.scales.x; const yScale = chart.scales.y;
       if(!xScale||!yScale) return;
+      if(region.length){
+        const c = chart.ctx; c.save(); c.fillStyle='rgba(54,162,235,0.15)';
+        region.forEach(([a, b]) => {
+          const left = Math.max(a === null ? xScale.min : a, xScale.min);
+          const right = Math.min(b === null ? xScale.max : b, xScale.max);
+          if(right <= left) return;
+          const x0 = xScale.getPixelForValue(left); const x1 = xScale.getPixelForValue(right);
+          c.fillRect(x0, yScale.top, x1 - x0, yScale.bottom - yScale.top);
+        });
+        c.restore();
+      }
+      if(threshold === null) return;
       if(threshold < xScale.min || threshold > xScale.max) return;
       const xPixel = xScale.getPixelForValue(threshold);
       const c = chart.ctx; c.save();
@@ -48,13 +81,69 @@ window.initNPChart = function initNPChart(){
     },
     plugins:[drawThresholdPlugin]
   });
+}
+
+window.initNPChart = function initNPChart(){
+  const canvasEl = document.getElementById('distributionsChart');
+  if(!canvasEl || !window.Chart){ return; }
+  const url = canvasEl.getAttribute('data-plot-url');
+  if(!url){ return; }
+
+  const load = () => fetch(url, {headers: {'Accept': 'application/json'}})
+    .then(resp => { if(!resp.ok){ throw new Error('HTTP ' + resp.status); } return resp.json(); })
+    .then(payload => { if(canvasEl.isConnected){ drawNPChart(canvasEl, expandPlotData(payload)); } })
+    .catch(e => console.error('Не удалось загрузить данные графика', e));
+
+  // Ленивая загрузка: данные запрашиваются, когда график попадает в область видимости
+  if('IntersectionObserver' in window){
+    const observer = new IntersectionObserver((entries) => {
+      if(entries.some(entry => entry.isIntersecting)){ observer.disconnect(); load(); }
+    });
+    observer.observe(canvasEl);
+  } else {
+    load();
+  }
 };
 
-// Автоматическая повторная инициализация после htmx swap
-if(window.htmx){
-  document.addEventListener('htmx:afterSwap', function(evt){
-     if(evt.target && evt.target.id === 'results-container'){
-       requestAnimationFrame(()=>{ if(typeof window.initNPChart === 'function'){ window.initNPChart(); } });
-     }
-  });
-}
+// ROC-кривая: один GET-запрос с параметрами гипотез из формы калькулятора
+window.loadROCChart = function loadROCChart(formEl, url){
+  const canvasEl = document.getElementById('rocChart');
+  if(!formEl || !canvasEl || !window.Chart){ return; }
+  const params = new URLSearchParams(new FormData(formEl));
+  params.delete('csrfmiddlewaretoken');
+  params.delete('alpha');
+  const summaryEl = document.getElementById('roc-summary');
+
+  fetch(url + '?' + params.toString(), {headers: {'Accept': 'application/json'}})
+    .then(resp => resp.json().then(payload => ({ok: resp.ok, payload})))
+    .then(({ok, payload}) => {
+      if(!ok){ if(summaryEl){ summaryEl.textContent = 'Ошибка: ' + JSON.stringify(payload.error); } return; }
+      const alphas = decodeFloat32(payload.alpha);
+      const power = decodeFloat32(payload.power);
+      const points = alphas.map((a, i) => ({x: a, y: power[i]}));
+
+      if(window.rocChart && typeof window.rocChart.destroy === 'function'){
+        try { window.rocChart.destroy(); } catch(e){ console.warn(e); }
+      }
+      window.rocChart = new Chart(canvasEl.getContext('2d'), {
+        type: 'line',
+        data: {
+          datasets: [
+            {label:'1-β(α)', data: points, borderColor:'rgb(153,102,255)', tension:0, pointRadius:0},
+            {label:'Случайный критерий', data: [{x:0, y:0}, {x:1, y:1}], borderColor:'rgb(201,203,207)', borderDash:[5,4], pointRadius:0}
+          ]
+        },
+        options: {
+          responsive:true, maintainAspectRatio:false, parsing:true,
+          interaction:{mode:'nearest', intersect:false},
+          plugins:{ title:{display:true, text:'ROC: мощность против уровня значимости'}, legend:{position:'bottom'}},
+          scales:{
+            x:{type:'linear', min:0, max:1, title:{display:true, text:'α'}},
+            y:{min:0, max:1, title:{display:true, text:'Мощность (1-β)'}}
+          }
+        }
+      });
+      if(summaryEl){ summaryEl.textContent = 'AUC = ' + payload.auc.toFixed(4) + ', точек: ' + payload.points; }
+    })
+    .catch(e => console.error('Не удалось построить ROC-кривую', e));
+};